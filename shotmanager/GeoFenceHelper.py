@@ -18,11 +18,278 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import math
+import numpy
 from vector2 import *
 import shotLogger
 logger = shotLogger.logger
 
 
+# cells along the longest side of a fence's bounding box, at most
+EDGE_GRID_MAX_CELLS = 256
+# below this many edges the scalar helpers beat the NumPy kernels' call overhead
+EDGE_KERNEL_MIN_EDGES = 24
+# closest point searches widen this many times before scanning every edge with the kernel
+EDGE_GRID_SEARCH_STEPS = 3
+
+
+class EdgeGrid:
+
+    def __init__(self, geometry):
+        """
+        Uniform grid spatial index over the edges of a FenceGeometry. Every edge is registered in each cell it
+        passes through, so a query only has to look at the edges in the cells it covers
+        :param geometry: FenceGeometry to index
+        """
+        edgeCount = len(geometry.edgeX)
+        extent = max(geometry.maxX - geometry.minX, geometry.maxY - geometry.minY, 0.0)
+
+        # cells about as big as an average edge, so each edge only covers a few of them
+        if edgeCount > 0:
+            meanEdgeLength = float(numpy.sqrt(geometry.edgeLength2).mean())
+        else:
+            meanEdgeLength = 0.0
+        self.cellSize = max(meanEdgeLength, extent / EDGE_GRID_MAX_CELLS, 1e-3)
+
+        cells = {}
+        rows = {}
+        polygon = geometry.polygon
+        for i in range(edgeCount):
+            for cell in self._edgeCells(polygon[i], polygon[i + 1]):
+                cells.setdefault(cell, []).append(i)
+                rows.setdefault(cell[1], set()).add(i)
+
+        self.cells = dict((cell, tuple(edges)) for cell, edges in cells.iteritems())
+        self.rows = dict((row, tuple(sorted(edges))) for row, edges in rows.iteritems())
+
+    def _cell(self, value):
+        return int(math.floor(value / self.cellSize))
+
+    def _edgeCells(self, a, b):
+        """
+        Walk the grid columns covered by the segment a-b, yielding every cell it passes through
+        """
+        # pad the covered rows a little so rounding can never drop a cell the segment touches
+        pad = self.cellSize * 1e-6
+        minX = min(a.x, b.x)
+        maxX = max(a.x, b.x)
+        for cx in range(self._cell(minX), self._cell(maxX) + 1):
+            if a.x == b.x:
+                ya = a.y
+                yb = b.y
+            else:
+                # y of the segment where it enters and leaves this column
+                xa = max(minX, cx * self.cellSize)
+                xb = min(maxX, (cx + 1) * self.cellSize)
+                ya = a.y + (xa - a.x) * (b.y - a.y) / (b.x - a.x)
+                yb = a.y + (xb - a.x) * (b.y - a.y) / (b.x - a.x)
+            for cy in range(self._cell(min(ya, yb) - pad), self._cell(max(ya, yb) + pad) + 1):
+                yield (cx, cy)
+
+    def edgesInBox(self, minX, maxX, minY, maxY):
+        """
+        :return: set of Int, indices of the edges registered in the cells overlapping the box
+        """
+        edges = set()
+        for cx in range(self._cell(minX), self._cell(maxX) + 1):
+            for cy in range(self._cell(minY), self._cell(maxY) + 1):
+                cellEdges = self.cells.get((cx, cy))
+                if cellEdges is not None:
+                    edges.update(cellEdges)
+        return edges
+
+    def edgesInRow(self, y):
+        """
+        :return: tuple of Int, indices of the edges that may cross the horizontal line at y
+        """
+        return self.rows.get(self._cell(y), ())
+
+
+class FenceGeometry:
+
+    def __init__(self, vertices):
+        """
+        Precomputed geometry of a closed polygon. Built once when a fence is set or updated and never modified
+        afterwards, so the per-tick checks only read from it
+        :param vertices: list of Vector2 or Vector3, with the first vertex repeated at the end
+        """
+        self.polygon = tuple(Vector2(v.x, v.y) for v in vertices)
+
+        # packed vertices, edge i runs from vertex i to vertex i + 1
+        self.xs = numpy.array([v.x for v in self.polygon], dtype=float)
+        self.ys = numpy.array([v.y for v in self.polygon], dtype=float)
+        self.edgeX = self.xs[1:] - self.xs[:-1]
+        self.edgeY = self.ys[1:] - self.ys[:-1]
+        self.edgeLength2 = self.edgeX * self.edgeX + self.edgeY * self.edgeY
+
+        # per edge bounding boxes
+        self.edgeMinX = numpy.minimum(self.xs[:-1], self.xs[1:])
+        self.edgeMaxX = numpy.maximum(self.xs[:-1], self.xs[1:])
+        self.edgeMinY = numpy.minimum(self.ys[:-1], self.ys[1:])
+        self.edgeMaxY = numpy.maximum(self.ys[:-1], self.ys[1:])
+
+        for array in (self.xs, self.ys, self.edgeX, self.edgeY, self.edgeLength2, self.edgeMinX, self.edgeMaxX, self.edgeMinY, self.edgeMaxY):
+            array.flags.writeable = False
+
+        # polygon bounding box
+        if len(self.polygon) > 0:
+            self.minX = float(self.xs.min())
+            self.maxX = float(self.xs.max())
+            self.minY = float(self.ys.min())
+            self.maxY = float(self.ys.max())
+        else:
+            self.minX = self.minY = float("inf")
+            self.maxX = self.maxY = -float("inf")
+
+        self.grid = EdgeGrid(self)
+
+    def __len__(self):
+        return len(self.polygon)
+
+    def boundingBoxContains(self, point, margin=0.0):
+        """
+        Test if a point is inside the bounding box of the polygon
+        :param point: Vector2
+        :param margin: Float, distance to grow the bounding box by on every side
+        :return: Bool
+        """
+        return self.minX - margin <= point.x <= self.maxX + margin and self.minY - margin <= point.y <= self.maxY + margin
+
+    def windingNumber(self, point):
+        """
+        Same as GeoFenceHelper.isPointInPolygon, only testing the edges in the grid row of the point
+        :param point: Vector2 denoting the point
+        :return: None if the polygon is illegal, otherwise winding number of point and polygon
+        """
+        if len(self.polygon) < 4:
+            logger.log("[GeoFenceHelper]: polygon must have 3 or more vertices, got %s" % len(self.polygon))
+            return None
+
+        # a point outside of the bounding box can't be wound around
+        if not self.boundingBoxContains(point):
+            return 0
+
+        # only edges crossing the horizontal line through the point can change the winding number
+        wn = 0
+        for i in self.grid.edgesInRow(point.y):
+            v1 = self.polygon[i]
+            v2 = self.polygon[i + 1]
+            if v1.y <= point.y:
+                if v2.y > point.y:
+                    if GeoFenceHelper.isLeft(v1, v2, point) > 0:
+                        wn += 1
+            else:
+                if v2.y <= point.y:
+                    if GeoFenceHelper.isLeft(v1, v2, point) < 0:
+                        wn -= 1
+        return wn
+
+    def windingNumbers(self, xs, ys):
+        """
+        Vectorized windingNumber, tests many points against the polygon at once, one edge at a time.
+        Gives the same results as the scalar test
+        :param xs: numpy array, x of the points
+        :param ys: numpy array, y of the points
+        :return: None if the polygon is illegal, otherwise numpy array of Int, winding number of each point
+        """
+        if len(self.polygon) < 4:
+            logger.log("[GeoFenceHelper]: polygon must have 3 or more vertices, got %s" % len(self.polygon))
+            return None
+
+        xs = numpy.asarray(xs, dtype=float)
+        ys = numpy.asarray(ys, dtype=float)
+        wn = numpy.zeros(len(xs), dtype=int)
+        for i in range(len(self.edgeX)):
+            x1 = self.xs[i]
+            y1 = self.ys[i]
+            y2 = self.ys[i + 1]
+            # same as GeoFenceHelper.isLeft for every point
+            left = self.edgeX[i] * (ys - y1) - (xs - x1) * self.edgeY[i]
+            wn += (y1 <= ys) & (y2 > ys) & (left > 0)
+            wn -= (y1 > ys) & (y2 <= ys) & (left < 0)
+        return wn
+
+    def edgesNear(self, point, radius):
+        """
+        Find the edges that could be within radius of a point, using the edge grid and bounding boxes
+        :param point: Vector2
+        :param radius: Float, search radius
+        :return: sorted list of Int, edge indices. May contain edges further than radius, never misses a closer one
+        """
+        if not self.boundingBoxContains(point, radius):
+            return []
+
+        near = []
+        for i in self.grid.edgesInBox(point.x - radius, point.x + radius, point.y - radius, point.y + radius):
+            if self.edgeMinX[i] - radius <= point.x <= self.edgeMaxX[i] + radius and \
+               self.edgeMinY[i] - radius <= point.y <= self.edgeMaxY[i] + radius:
+                near.append(i)
+        near.sort()
+        return near
+
+    def closestPoint(self, point):
+        """
+        Same as GeoFenceHelper.closestPointToPolygon, growing a grid search around the point until the closest
+        edge is found. Points far from every edge fall back to a full kernel scan
+        :param point: Vector2, source point
+        :return: None if the polygon is illegal, otherwise Vector2 denoting the closest point on the polygon
+        """
+        if len(self.polygon) < 4:
+            logger.log("[GeoFenceHelper]: Polygon need at least three vertices")
+            return None
+
+        # once the search covers the whole bounding box every edge is a candidate
+        farthest = math.hypot(max(point.x - self.minX, self.maxX - point.x), max(point.y - self.minY, self.maxY - point.y))
+        radius = self.grid.cellSize
+        for step in range(EDGE_GRID_SEARCH_STEPS + 1):
+            if radius >= farthest or step == EDGE_GRID_SEARCH_STEPS:
+                edges = None
+            else:
+                edges = self.edgesNear(point, radius)
+
+            intersect = None
+            distance = float("inf")
+            if edges is None or len(edges) >= EDGE_KERNEL_MIN_EDGES:
+                closest = GeoFenceHelper.closestPointToEdges(point, self.xs, self.ys, edges)
+                if closest is not None:
+                    (i, intersect, distance) = closest
+            else:
+                for i in edges:
+                    segIntersect, segDistance = GeoFenceHelper.closestPointToSegment(point, [self.polygon[i], self.polygon[i + 1]])
+                    if segDistance < distance:
+                        intersect = segIntersect
+                        distance = segDistance
+
+            # every edge closer than radius was a candidate, so a hit within radius is the closest one
+            if distance <= radius or edges is None:
+                return intersect
+            radius *= 2.0
+
+    def closestCollision(self, ray, edges=None):
+        """
+        Same as GeoFenceHelper.closestCollisionVectorToPolygon, optionally limited to a subset of edges
+        :param ray: Tuple of Vector2, origin and direction denoting a ray
+        :param edges: list of Int, edge indices to test. All edges if None
+        :return: None if ray is not intersecting with the edges, otherwise (Int, Double, Vector2)
+        """
+        if len(self.polygon) < 4:
+            logger.log("[GeoFenceHelper]: Illegal polygon, vertex count must be 3 or more, got %s" % len(self.polygon))
+            return None
+        if edges is None or len(edges) >= EDGE_KERNEL_MIN_EDGES:
+            return GeoFenceHelper.closestCollisionToEdges(ray, self.xs, self.ys, edges)
+
+        collidingPoint = (-1, float("inf"), None)
+        for i in edges:
+            t = GeoFenceHelper.closestCollisionVectorToSegment(ray, (self.polygon[i], self.polygon[i + 1]))
+            if t is not None and 0 < t < collidingPoint[1]:
+                intersection = Vector2(ray[0].x + t * (ray[1].x - ray[0].x), ray[0].y + t * (ray[1].y - ray[0].y))
+                collidingPoint = (i, t, intersection)
+
+        if collidingPoint[0] == -1:
+            return None
+        return collidingPoint
+
+
 class GeoFenceHelper:
 
     @staticmethod
@@ -132,6 +399,98 @@ class GeoFenceHelper:
             return None
         return collidingPoint
 
+    @staticmethod
+    def closestPointToEdges(point, xs, ys, edges=None):
+        """
+        Vectorized closestPointToPolygon, tests a point against every edge of a packed polygon in one call.
+        Gives the same results as the scalar helpers
+        :param point: Vector2, source point
+        :param xs: numpy array, x of the polygon vertices, first vertex repeated at the end
+        :param ys: numpy array, y of the polygon vertices, first vertex repeated at the end
+        :param edges: optional list of Int, only test these edge indices
+        :return: None if there are no edges to test
+                 (Int, Vector2, Float) edge index, closest point and its distance
+        """
+        ax = xs[:-1]
+        ay = ys[:-1]
+        bx = xs[1:]
+        by = ys[1:]
+        if edges is not None:
+            edges = numpy.asarray(edges, dtype=int)
+            ax = ax[edges]
+            ay = ay[edges]
+            bx = bx[edges]
+            by = by[edges]
+        if len(ax) == 0:
+            return None
+
+        aToBx = bx - ax
+        aToBy = by - ay
+        aToPx = point.x - ax
+        aToPy = point.y - ay
+        atb2 = aToBx * aToBx + aToBy * aToBy
+        # a and b infinitely close gives nan here, those edges are measured to a below
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            t = (aToPx * aToBx + aToPy * aToBy) / atb2
+
+        toA = (atb2 == 0) | (t < 0)
+        toB = (atb2 != 0) & (t > 1)
+        intersectX = numpy.where(toA, ax, numpy.where(toB, bx, ax + aToBx * t))
+        intersectY = numpy.where(toA, ay, numpy.where(toB, by, ay + aToBy * t))
+        dx = point.x - intersectX
+        dy = point.y - intersectY
+        distance = numpy.sqrt(dx * dx + dy * dy)
+
+        # argmin returns the first of equal distances, like the scalar loop
+        k = int(numpy.argmin(distance))
+        index = k if edges is None else int(edges[k])
+        return index, Vector2(float(intersectX[k]), float(intersectY[k])), float(distance[k])
+
+    @staticmethod
+    def closestCollisionToEdges(ray, xs, ys, edges=None):
+        """
+        Vectorized closestCollisionVectorToPolygon, tests a ray against every edge of a packed polygon in one call.
+        Gives the same results as the scalar helpers
+        :param ray: Tuple of Vector2, origin and direction denoting a ray
+        :param xs: numpy array, x of the polygon vertices, first vertex repeated at the end
+        :param ys: numpy array, y of the polygon vertices, first vertex repeated at the end
+        :param edges: optional list of Int, only test these edge indices
+        :return: None if ray is not intersecting with any edge
+                 (Int, Double, Vector2) edge index, position along the ray and collision point
+        """
+        s0x = xs[:-1]
+        s0y = ys[:-1]
+        s1x = xs[1:]
+        s1y = ys[1:]
+        if edges is not None:
+            edges = numpy.asarray(edges, dtype=int)
+            s0x = s0x[edges]
+            s0y = s0y[edges]
+            s1x = s1x[edges]
+            s1y = s1y[edges]
+        if len(s0x) == 0:
+            return None
+
+        rayX = ray[1].x - ray[0].x
+        rayY = ray[1].y - ray[0].y
+        segX = s1x - s0x
+        segY = s1y - s0y
+        fromX = ray[0].x - s0x
+        fromY = ray[0].y - s0y
+        denom = rayX * segY - rayY * segX
+        # parallel edges divide by zero, they are masked out below
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            r = (fromY * segX - fromX * segY) / denom
+            s = (fromY * rayX - fromX * rayY) / denom
+        hit = (denom != 0) & (r > 0) & (s >= 0) & (s <= 1)
+        if not hit.any():
+            return None
+
+        k = int(numpy.argmin(numpy.where(hit, r, numpy.inf)))
+        t = float(r[k])
+        index = k if edges is None else int(edges[k])
+        return index, t, Vector2(ray[0].x + t * (ray[1].x - ray[0].x), ray[0].y + t * (ray[1].y - ray[0].y))
+
     @staticmethod
     def isPointInPolygon(point, polygon):
         """
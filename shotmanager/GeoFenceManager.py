@@ -28,10 +28,17 @@ from GeoFenceHelper import *
 from math import sqrt
 import shots
 import json
+import monotonic
+import numpy
+from shotManagerConstants import UPDATE_TIME
 
 logger = shotLogger.logger
 
 GEO_FENCE_LATENCY_COEFF = 1.5 # seconds? not sure...
+# extra search distance around the latency distance when looking for nearby edges
+GEO_FENCE_EDGE_SEARCH_MARGIN = 1.0 # meters
+# distance between samples when checking a planned trajectory against the fences
+TRAJECTORY_CHECK_SPACING = 1.0 # meters
 
 # tuple of message types that we handle
 GEO_FENCE_MESSAGES = \
@@ -65,14 +72,112 @@ class GeoFence:
         :param stayOut: Bool
         """
         self.origin = origin
+        self.frame = location_helpers.LocalFrame(origin)
         self.vertices = verticesCart
         self.subVertices = subVerticesCart
         self.stayOut = stayOut
+        self.rebuildGeometry()
+
+    def rebuildGeometry(self):
+        """
+        Rebuild the precomputed polygon geometry, must be called after vertices or subVertices change
+        """
+        self.geometry = FenceGeometry(self.vertices)
+        self.subGeometry = FenceGeometry(self.subVertices)
+
+    def isBreached(self, point, useSubPolygon=False):
+        """
+        Test if a point is on the wrong side of this fence
+        :param point: Vector2 in the fence frame
+        :param useSubPolygon: Bool, test against the subpolygon rather than the fence itself
+        :return: Bool, True if point is outside an inclusive fence or inside an exclusive one
+        """
+        if useSubPolygon:
+            wn = self.subGeometry.windingNumber(point)
+        else:
+            wn = self.geometry.windingNumber(point)
+        if wn is None:
+            return False
+        if self.stayOut:
+            return wn != 0
+        return wn == 0
+
+    def breachedArray(self, xs, ys, useSubPolygon=False):
+        """
+        Vectorized isBreached, tests many points against this fence at once
+        :param xs: numpy array, x of the points in the fence frame
+        :param ys: numpy array, y of the points in the fence frame
+        :param useSubPolygon: Bool, test against the subpolygon rather than the fence itself
+        :return: numpy array of Bool, True for points on the wrong side of the fence
+        """
+        if useSubPolygon:
+            wn = self.subGeometry.windingNumbers(xs, ys)
+        else:
+            wn = self.geometry.windingNumbers(xs, ys)
+        if wn is None:
+            return numpy.zeros(len(xs), dtype=bool)
+        if self.stayOut:
+            return wn != 0
+        return wn == 0
 
     def __str__(self):
         return "<Fence origin: %s, vertices: %s, stayOut: %s>" % (self.origin, self.vertices, self.stayOut)
 
 
+class TrajectoryCheck:
+
+    def __init__(self, ps, breached, totalArcLength):
+        """
+        Result of checking a planned cable against the fences
+        :param ps: numpy array, arc length normalized parameter of each sample, increasing
+        :param breached: numpy array of Bool, True for the samples on the wrong side of a fence
+        :param totalArcLength: Float, length of the cable in meters
+        """
+        self.ps = ps
+        self.breached = breached
+        self.totalArcLength = totalArcLength
+        self.breachIndices = numpy.flatnonzero(breached)
+
+    def isClear(self):
+        return len(self.breachIndices) == 0
+
+    def firstBreachP(self):
+        """
+        :return: None if the whole cable is clear, otherwise p of the first sample on the wrong side of a fence
+        """
+        if self.isClear():
+            return None
+        return float(self.ps[self.breachIndices[0]])
+
+    def firstBreachArcLength(self):
+        """
+        :return: None if the whole cable is clear, otherwise distance along the cable of the first breach in meters
+        """
+        p = self.firstBreachP()
+        if p is None:
+            return None
+        return p * self.totalArcLength
+
+    def reachableRange(self, p):
+        """
+        Find the clear stretch of cable around p
+        :param p: Float, arc length normalized parameter
+        :return: None if p itself is breached, otherwise (minP, maxP) of the clear samples around p
+        """
+        index = min(int(numpy.searchsorted(self.ps, p)), len(self.ps) - 1)
+        # use whichever neighbouring sample is closest
+        if index > 0 and p - self.ps[index - 1] < self.ps[index] - p:
+            index -= 1
+        if self.breached[index]:
+            return None
+
+        before = self.breachIndices[self.breachIndices < index]
+        after = self.breachIndices[self.breachIndices > index]
+        minP = float(self.ps[before[-1] + 1]) if len(before) > 0 else 0.0
+        maxP = float(self.ps[after[0] - 1]) if len(after) > 0 else 1.0
+        return (minP, maxP)
+
+
 class GeoFenceManager:
     """
     This class manage the GeoFence on Solo
@@ -90,6 +195,12 @@ class GeoFenceManager:
         self.tetherLocation = None
         self.tetherState = _GeoFenceManagerTetherState.notActive
 
+        # bumped whenever the fences are set, updated or cleared, so shots know to check their cables again
+        self.fenceVersion = 0
+
+        # time of the last fence check, checks run at UPDATE_RATE
+        self.lastCheckTime = None
+
     def _reset(self):
         """
         Reset the states of GeoFence Manager. Will put copter into LOITER.
@@ -98,6 +209,7 @@ class GeoFenceManager:
 
         self.polygons = []
         self.state = _GeoFenceManagerState.notFenced
+        self.fenceVersion += 1
 
         self.tetherLocation = None
         self.tetherState = _GeoFenceManagerTetherState.notActive
@@ -131,31 +243,32 @@ class GeoFenceManager:
     def _checkGeoFenceDataValidity(coordArr, subCoordArr, fenceTypeArr):
         if len(coordArr) != len(subCoordArr) or len(coordArr) != len(fenceTypeArr):
             # Data inconsistency
-            logger.error("GeoFence data length mismatch: coord: %s, subCoord: %s, type: %s" % (len(coordArr), len(subCoordArr), len(fenceTypeArr)))
+            logger.log("[GeoFenceManager]: GeoFence data length mismatch: coord: %s, subCoord: %s, type: %s" % (len(coordArr), len(subCoordArr), len(fenceTypeArr)))
             return False
-        for i in range(len(coordArr) - 1):
+        for i in range(len(coordArr)):
             if len(coordArr[i]) < 3:
                 # Not a valid polygon
-                logger.error("Illegal polygon received, polygon edge count: %s" % len(coordArr[i]))
+                logger.log("[GeoFenceManager]: Illegal polygon received, polygon edge count: %s" % len(coordArr[i]))
                 return False
             if len(coordArr[i]) != len(subCoordArr[i]):
                 # Data inconsistency
-                logger.error("Polygon and subpolygon have different edge count, polygon: %s, subpolygon: %s" % (len(coordArr[i]), len(subCoordArr[i])))
+                logger.log("[GeoFenceManager]: Polygon and subpolygon have different edge count, polygon: %s, subpolygon: %s" % (len(coordArr[i]), len(subCoordArr[i])))
                 return False
             for pair in coordArr[i]:
                 if len(pair) != 2:
                     # Coord has length of 2
-                    logger.error("Coordinate must be of length 2, got: %s" % len(pair))
-                return False
+                    logger.log("[GeoFenceManager]: Coordinate must be of length 2, got: %s" % len(pair))
+                    return False
             for pair in subCoordArr[i]:
                 if len(pair) != 2:
-                    logger.error("Coordinate must be of length 2, got: %s" % len(pair))
+                    logger.log("[GeoFenceManager]: Coordinate must be of length 2, got: %s" % len(pair))
                     # Coord has length of 2
-                return False
+                    return False
         return True
 
     def _handleGeoFenceSetDataMessage(self, coordArr, subCoordArr, fenceTypeArr):
         self.polygons = []
+        self.fenceVersion += 1
 
         # Check if data is well formatted
         dataValid = self._checkGeoFenceDataValidity(coordArr, subCoordArr, fenceTypeArr)
@@ -168,13 +281,12 @@ class GeoFenceManager:
 
         # Data is good
         for i in range(len(coordArr)):
-            coords = map(lambda coord: LocationGlobalRelative(coord[0], coord[1], 0), coordArr[i])
-            subCoords = map(lambda coord: LocationGlobalRelative(coord[0], coord[1], 0), subCoordArr[i])
             fenceType = fenceTypeArr[i]
-            # coords[0] is guaranteed to exist because a polygon with less than 3 vertices won't pass the validation
-            origin = coords[0]
-            coordsCart = map(lambda coord: location_helpers.getVectorFromPoints(origin, coord), coords)
-            subCoordsCart = map(lambda coord: location_helpers.getVectorFromPoints(origin, coord), subCoords)
+            # coordArr[i][0] is guaranteed to exist because a polygon with less than 3 vertices won't pass the validation
+            origin = LocationGlobalRelative(coordArr[i][0][0], coordArr[i][0][1], 0)
+            frame = location_helpers.LocalFrame(origin)
+            coordsCart = self._verticesToCart(frame, coordArr[i])
+            subCoordsCart = self._verticesToCart(frame, subCoordArr[i])
 
             # Repeat first coordinate, first elements are guaranteed to exist or validation will fail
             coordsCart.append(coordsCart[0])
@@ -185,26 +297,39 @@ class GeoFenceManager:
             logger.log("[GeoFenceManager]: subCoords: %s" % subCoordsCart)
             self.polygons.append(newGeoFence)
 
+    @staticmethod
+    def _verticesToCart(frame, coords):
+        """
+        Convert a list of [lat, lng] pairs into the fence frame in one batch
+        :param frame: LocalFrame of the fence
+        :param coords: list of [lat, lng]
+        :return: [Vector3]
+        """
+        (north, east, down) = frame.toNEDArrays([coord[0] for coord in coords], [coord[1] for coord in coords], [0.0] * len(coords))
+        return [Vector3(north[i], east[i], down[i]) for i in range(len(coords))]
+
     def _handleGeoFenceUpdateMessage(self, polygonIndex, vertexIndex, coord, subCoord):
-        if polygonIndex < 0 or polygonIndex > len(self.polygons):
+        if polygonIndex < 0 or polygonIndex >= len(self.polygons):
             logger.log("[GeoFenceManager]: Illegal polygonIndex, polygon count: %s, polygonIndex: %s" % (len(self.polygons), polygonIndex))
             self._sendFenceSetAck(0, False)
             return
         # Need to take 1 from the polygon vertex count because the first vertex is repeated
-        if vertexIndex < 0 or vertexIndex > len(self.polygons[polygonIndex]) - 1:
-            logger.log("[GeoFenceManager]: Illegal vertexIndex, vertices count: %s, vertexIndex: %s" % (len(self.polygons[polygonIndex]) - 1, vertexIndex))
+        vertexCount = len(self.polygons[polygonIndex].vertices) - 1
+        if vertexIndex < 0 or vertexIndex >= vertexCount:
+            logger.log("[GeoFenceManager]: Illegal vertexIndex, vertices count: %s, vertexIndex: %s" % (vertexCount, vertexIndex))
             self._sendFenceSetAck(0, False)
             return
-        origin = self.polygons[polygonIndex].origin
-        coordCart = location_helpers.getVectorFromPoints(origin, coord)
-        subCoordCart = location_helpers.getVectorFromPoints(origin, subCoord)
+        frame = self.polygons[polygonIndex].frame
+        coordCart = frame.toNEDVector(coord)
+        subCoordCart = frame.toNEDVector(subCoord)
         self.polygons[polygonIndex].vertices[vertexIndex] = coordCart
         self.polygons[polygonIndex].subVertices[vertexIndex] = subCoordCart
         # Update extra vertex if the first vertex is being updated
         if vertexIndex == 0:
-            lastIndex = len(self.polygons[polygonIndex])
-            self.polygons[polygonIndex].vertices[lastIndex] = coordCart
-            self.polygons[polygonIndex].subVertices[lastIndex] = subCoordCart
+            self.polygons[polygonIndex].vertices[vertexCount] = coordCart
+            self.polygons[polygonIndex].subVertices[vertexCount] = subCoordCart
+        self.polygons[polygonIndex].rebuildGeometry()
+        self.fenceVersion += 1
         self._sendFenceSetAck(len(self.polygons), True)
 
     def clearGeoFence(self):
@@ -237,12 +362,49 @@ class GeoFenceManager:
         packet = struct.pack('<II', app_packet.GEOFENCE_ACTIVATED, 0)
         self.shotMgr.appMgr.sendPacket(packet)
 
+    def checkTrajectory(self, lats, lons):
+        """
+        Check a planned trajectory against every fence before it is flown. Samples are tested against the
+        subpolygons, so a clear trajectory never gets close enough to the fences to be tethered
+        :param lats: sequence of sample latitudes, in flight order
+        :param lons: sequence of sample longitudes, in flight order
+        :return: numpy array of Bool, True for samples on the wrong side of a fence
+        """
+        breached = numpy.zeros(len(lats), dtype=bool)
+        for fence in self.polygons:
+            (north, east, down) = fence.frame.toNEDArrays(lats, lons, [0.0] * len(lats))
+            breached |= fence.breachedArray(north, east, useSubPolygon=True)
+        return breached
+
+    def checkCable(self, cable, frame):
+        """
+        Sample a cable densely and check it against every fence
+        :param cable: CableController
+        :param frame: LocalFrame the cable positions are in
+        :return: None if no fence is set, otherwise TrajectoryCheck
+        """
+        if len(self.polygons) == 0:
+            return None
+
+        (ps, (north, east, down)) = cable.sampleTrajectory(TRAJECTORY_CHECK_SPACING)
+        (lats, lons, alts) = frame.fromNEDArrays(north, east, down)
+        check = TrajectoryCheck(ps, self.checkTrajectory(lats, lons), cable.spline.totalArcLength)
+        if not check.isClear():
+            logger.log("[GeoFenceManager]: Trajectory breaches geofence %.1f m along the cable" % check.firstBreachArcLength())
+        return check
+
     def activateGeoFenceIfNecessary(self):
         """
         Test if GeoFence is about to be breached, if so, put copter into GUIDED and guide the copter to the best
         location. If not, do nothing.
         """
 
+        # The select loop can wake up much faster than UPDATE_RATE, only check once per tick
+        now = monotonic.monotonic()
+        if self.lastCheckTime is not None and now - self.lastCheckTime < UPDATE_TIME:
+            return
+        self.lastCheckTime = now
+
         if not self.vehicle.armed:
             return
 
@@ -270,44 +432,51 @@ class GeoFenceManager:
             return
 
         velocityDirection = Vector2(velocity[0], velocity[1])
+        scalarSpeed = sqrt(velocity[0] * velocity[0] + velocity[1] * velocity[1])  # TODO: m/s ??
 
-        collidingPoint = (-1, -1, float("inf"), None)
+        # _stoppingSpeed(0, speed) == speed and grows with distance, so a collision can only trigger once it is
+        # within the latency distance. Only edges around that distance need to be tested.
+        searchRadius = scalarSpeed * GEO_FENCE_LATENCY_COEFF + GEO_FENCE_EDGE_SEARCH_MARGIN
 
-        # TODO: We are only supporting a single GeoFence right now, but it's subject to change in the future
-        fence = self.polygons[0]
-        if fence is None or fence.origin is None or fence.vertices is None:
-            logger.log("[GeoFenceManager]: something is not right, fence:%s" % fence)
-            return
+        collidingPoint = (-1, -1, float("inf"), None)
+        collidingRay = None
 
-        polygon = map(lambda coord: Vector2(coord.x, coord.y), fence.vertices)
-        subPolygon = map(lambda coord: Vector2(coord.x, coord.y), fence.subVertices)
-        v0_3d = location_helpers.getVectorFromPoints(fence.origin, vehicleLocation)
-        v0 = Vector2(v0_3d.x, v0_3d.y)
-        v1 = Vector2(v0.x + velocityDirection.x, v0.y + velocityDirection.y)
-
-        # If not in fence, pull copter back into fence and return
-        if GeoFenceHelper.isPointInPolygon(v0, polygon) == 0:
-            logger.log("[GeoFenceManager]: Not in Fence!! v:%s poly: %s" % (v0, polygon))
-            stopPoint2D = GeoFenceHelper.closestPointToPolygon(v0, subPolygon)
-            if stopPoint2D is not None:
-                # stopPoint2D can be None if an illegal polygon is passed
-                stopPoint3D = Vector3(stopPoint2D.x, stopPoint2D.y, 0)
-                stopCoordinate = location_helpers.addVectorToLocation(fence.origin, stopPoint3D)
-                stopCoordinate.alt = vehicleLocation.alt
-                self._stopAtCoord(stopCoordinate)
+        for fenceIndex, fence in enumerate(self.polygons):
+            if fence is None or fence.origin is None or fence.vertices is None:
+                logger.log("[GeoFenceManager]: something is not right, fence:%s" % fence)
                 return
 
-        # Test if is going to collide
-        currentCollidingPoint = GeoFenceHelper.closestCollisionVectorToPolygon(ray=(v0, v1), polygon=polygon)
-        if currentCollidingPoint is not None and currentCollidingPoint[2] < collidingPoint[2]:
-            collidingPoint = (0, currentCollidingPoint[0], currentCollidingPoint[1], currentCollidingPoint[2])
+            # every fence has its own frame
+            (north, east, down) = fence.frame.toNED(vehicleLocation)
+            v0 = Vector2(north, east)
+            v1 = Vector2(v0.x + velocityDirection.x, v0.y + velocityDirection.y)
+
+            # If on the wrong side of a fence, pull copter back across it and return
+            if fence.isBreached(v0):
+                logger.log("[GeoFenceManager]: Fence %d breached!! v:%s stayOut: %s" % (fenceIndex, v0, fence.stayOut))
+                stopPoint2D = fence.subGeometry.closestPoint(v0)
+                if stopPoint2D is not None:
+                    # stopPoint2D can be None if an illegal polygon is passed
+                    (lat, lon, alt) = fence.frame.fromNED(stopPoint2D.x, stopPoint2D.y, 0)
+                    stopCoordinate = LocationGlobalRelative(lat, lon, vehicleLocation.alt)
+                    self._stopAtCoord(stopCoordinate)
+                    return
+
+            nearEdges = fence.geometry.edgesNear(v0, searchRadius)
+            if len(nearEdges) == 0:
+                continue
+
+            # Test if is going to collide
+            currentCollidingPoint = fence.geometry.closestCollision(ray=(v0, v1), edges=nearEdges)
+            if currentCollidingPoint is not None and currentCollidingPoint[1] < collidingPoint[2]:
+                collidingPoint = (fenceIndex, currentCollidingPoint[0], currentCollidingPoint[1], currentCollidingPoint[2])
+                collidingRay = (v0, v1)
 
         if collidingPoint[0] != -1 and collidingPoint[1] != -1:
             fence = self.polygons[collidingPoint[0]]
-            scalarSpeed = sqrt(velocity[0] * velocity[0] + velocity[1] * velocity[1])  # TODO: m/s ??
-            currentCollidingPoint3D = Vector3(collidingPoint[3].x, collidingPoint[3].y, 0)
-            collidingPointCoord = location_helpers.addVectorToLocation(fence.origin, currentCollidingPoint3D)
-            scalarDistance = location_helpers.getDistanceFromPoints(vehicleLocation, collidingPointCoord)
+            (v0, v1) = collidingRay
+            # both points are in the fence frame, so the horizontal distance can be taken directly
+            scalarDistance = (collidingPoint[3] - v0).length()
             # Compensate for the latency
             scalarDistance -= scalarSpeed * GEO_FENCE_LATENCY_COEFF
             scalarDistance = max(scalarDistance, 0.0)
@@ -316,9 +485,9 @@ class GeoFenceManager:
             if scalarDistance < 0 or scalarSpeed >= maximumStoppingSpeed:
                 # If collision is None, that means copter has breached the subPolygon, tether to closest point on subpolygon,
                 # otherwise, tether to the collision point on subpolygon
-                collision = GeoFenceHelper.closestCollisionVectorToPolygon(ray=(v0, v1), polygon=subPolygon)
+                collision = fence.subGeometry.closestCollision(ray=(v0, v1))
                 if collision is None:
-                    targetStopPoint2D = GeoFenceHelper.closestPointToPolygon(v0, subPolygon)
+                    targetStopPoint2D = fence.subGeometry.closestPoint(v0)
                 else:
                     targetStopPoint2D = collision[2]
 
@@ -332,9 +501,8 @@ class GeoFenceManager:
                 if self.shotMgr.currentShot != shots.APP_SHOT_NONE:
                     self.shotMgr.enterShot(shots.APP_SHOT_NONE)
 
-                targetStopPoint3D = Vector3(targetStopPoint2D.x, targetStopPoint2D.y, 0)
-                targetStopCoordinate = location_helpers.addVectorToLocation(fence.origin, targetStopPoint3D)
-                targetStopCoordinate.alt = vehicleLocation.alt
+                (lat, lon, alt) = fence.frame.fromNED(targetStopPoint2D.x, targetStopPoint2D.y, 0)
+                targetStopCoordinate = LocationGlobalRelative(lat, lon, vehicleLocation.alt)
                 self._stopAtCoord(targetStopCoordinate)
 
     def _stopAtCoord(self, coordinate):
@@ -343,6 +511,7 @@ class GeoFenceManager:
         :param coordinate: LocationGlobalRelative, target coordinate
         """
         self._sendActivated()
+        self.shotMgr.journal.geofence(coordinate.lat, coordinate.lon)
         self.vehicle.mode = VehicleMode("GUIDED")
         posVelMsg = self.vehicle.message_factory.set_position_target_global_int_encode(
             0,       # time_boot_ms (not used)
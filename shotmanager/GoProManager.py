@@ -2,7 +2,6 @@
 # This file handles GoPro commands and holds GoPro state
 #
 import os
-import Queue
 import sys
 import threading
 import time
@@ -13,6 +12,8 @@ from pymavlink import mavutil
 sys.path.append(os.path.realpath(''))
 import app_packet
 from GoProConstants import *
+import GoProScheduler
+import photoLog
 import settings
 import shotLogger
 import struct
@@ -26,7 +27,8 @@ GOPROMESSAGES = \
     app_packet.GOPRO_SET_REQUEST,
     app_packet.GOPRO_RECORD,
     app_packet.GOPRO_REQUEST_STATE,
-    app_packet.GOPRO_SET_EXTENDED_REQUEST
+    app_packet.GOPRO_SET_EXTENDED_REQUEST,
+    app_packet.GOPRO_SET_DELTA_ENABLED
 )
 
 # see https://docs.google.com/document/d/1CcYOCZRw9C4sIQu4xDXjPMkxZYROmTLB0EtpZamnq74/edit#heading=h.y6z65lvic5q5
@@ -110,11 +112,13 @@ class GoProManager():
         self.shotMgr = shotMgr
         # This exists because we can't seem to send multiple messages in a stream to the gopro.
         # Instead, we'll queue up all our messages and wait for a response before sending the next message
-        self.msgQueue = Queue.Queue()
-        # is the GoPro currently handling a message?
-        self.isGoproBusy = False
-        # when the last message was sent
-        self.lastRequestSent = 0.0
+        self.scheduler = GoProScheduler.GoProScheduler(self.sendMsg)
+        # geotags of the photos we've taken
+        self.photoLog = photoLog.PhotoLog()
+        # does the app want only the changed fields of our state?
+        self.deltasEnabled = False
+        # the V2 state fields the app last heard about
+        self.lastStateSent = None
         # lock access to shot manager state
         self.lock = threading.Lock()
 
@@ -153,8 +157,8 @@ class GoProManager():
 
             # right now, query status when we initially connect
             if self.status == mavutil.mavlink.GOPRO_HEARTBEAT_STATUS_CONNECTED:
-                self.isGoproBusy = False
-                self.msgQueue = Queue.Queue()
+                logger.log("[gopro]: request queue: %s"%(self.scheduler.summary()))
+                self.scheduler.reset()
                 self.sendGoProRequest(mavutil.mavlink.GOPRO_COMMAND_CAPTURE_MODE)
                 self.sendGoProRequest(mavutil.mavlink.GOPRO_COMMAND_BATTERY)
                 self.sendGoProRequest(mavutil.mavlink.GOPRO_COMMAND_MODEL)
@@ -201,7 +205,7 @@ class GoProManager():
 
         if status != mavutil.mavlink.GOPRO_REQUEST_SUCCESS:
             logger.log("[gopro]: Gopro get request for command %d failed with status %d"%(command, status))
-            self.processMsgQueue()
+            self.processMsgQueue(command, False)
             return
 
         if command == mavutil.mavlink.GOPRO_COMMAND_CAPTURE_MODE:
@@ -303,7 +307,7 @@ class GoProManager():
         if sendState:
             self.sendState()
 
-        self.processMsgQueue()
+        self.processMsgQueue(command, False)
 
     def set_response_callback(self, vehicle, name, message):
         self.lock.acquire()
@@ -321,9 +325,9 @@ class GoProManager():
         logger.log("[gopro]: Got Gopro set response for command %d with status %d"%(command, status))
         if status != mavutil.mavlink.GOPRO_REQUEST_SUCCESS:
             # if a set request failed, return current state to resynchronize client
-            self.sendState()
+            self.sendState(full = True)
 
-        self.processMsgQueue()
+        self.processMsgQueue(command, True)
 
     # wrapper to create a gopro_get_request mavlink message with the given command
     def sendGoProRequest(self, command):
@@ -336,7 +340,7 @@ class GoProManager():
                                     command
                                     )
 
-        self.queueMsg(msg)
+        self.queueMsg(msg, command)
 
     # wrapper to create a gopro_set_request mavlink message with the given command and value
     def sendGoProCommand(self, command, value):
@@ -352,7 +356,7 @@ class GoProManager():
                                     command, value
                                     )
 
-        self.queueMsg(msg)
+        self.queueMsg(msg, command, True)
 
         if self.captureMode == CAPTURE_MODE_PHOTO:
             if command == mavutil.mavlink.GOPRO_COMMAND_SHUTTER:
@@ -448,31 +452,39 @@ class GoProManager():
 
     # since the gopro can't handle multiple messages at once, we wait for a response before sending
     # each subsequent message.  This is how we queue up messages
-    def queueMsg(self, msg):
-        if self.isGoproBusy and monotonic.monotonic() > self.lastRequestSent + 2.0:
-            self.isGoproBusy = False
-            self.msgQueue = Queue.Queue()
+    def queueMsg(self, msg, command = None, isSet = False):
+        now = monotonic.monotonic()
+        self.checkTimeout(now)
+        self.scheduler.put(msg, now, command, isSet)
+
+    # called whenever the gopro answers a get or set request for command,
+    # so the message queue is ready to send another message.
+    def processMsgQueue(self, command = None, isSet = None):
+        self.scheduler.complete(monotonic.monotonic(), command, isSet)
+        if self.scheduler.busy():
+            logger.log("[gopro]: sending message from the queue.  Size is now %d"%(len(self.scheduler)))
+
+    # resend or give up on a request the gopro hasn't answered
+    def checkTimeout(self, now):
+        dropped = self.scheduler.poll(now)
+        if dropped is not None:
+            logger.log("[gopro]: no response to command %s after %d attempts"%(dropped.command, dropped.attempts))
             # return current state to resynchronize client
-            self.sendState()
+            self.sendState(full = True)
 
-        if self.isGoproBusy:
-            self.msgQueue.put(msg)
-        else:
-            self.isGoproBusy = True
-            self.lastRequestSent = monotonic.monotonic()
-            # Need to send False for fix_targeting so our message gets routed to the gimbal
-            self.shotMgr.vehicle.send_mavlink(msg)
-
-    # called whenever the message queue is ready to send another message.
-    def processMsgQueue(self):
-        if self.msgQueue.empty():
-            self.isGoproBusy = False
-        else:
-            msg = self.msgQueue.get_nowait()
-            self.lastRequestSent = monotonic.monotonic()
-            # Need to send False for fix_targeting so our message gets routed to the gimbal
-            self.shotMgr.vehicle.send_mavlink(msg)
-            logger.log("[gopro]: sending message from the queue.  Size is now %d"%(self.msgQueue.qsize()))
+    # called by shotManager every tick
+    def Tick(self):
+        self.lock.acquire()
+        try:
+            now = monotonic.monotonic()
+            self.checkTimeout(now)
+            self.photoLog.poll(now)
+        finally:
+            self.lock.release()
+
+    def sendMsg(self, msg):
+        # Need to send False for fix_targeting so our message gets routed to the gimbal
+        self.shotMgr.vehicle.send_mavlink(msg)
 
     # shotManager receives this gopro control packet and passes it here
     def handlePacket(self, type, data):
@@ -493,10 +505,25 @@ class GoProManager():
             (startstop, ) = struct.unpack('<I', data)
             self.handleRecordCommand(self.captureMode, startstop)
         elif type == app_packet.GOPRO_REQUEST_STATE:
-            self.sendState()
+            self.sendState(full = True)
         elif type == app_packet.GOPRO_SET_EXTENDED_REQUEST:
             (command, value1, value2, value3, value4, ) = struct.unpack("<HBBBB", data)
             self.sendGoProCommand(command, (value1, value2, value3, value4))
+        elif type == app_packet.GOPRO_SET_DELTA_ENABLED:
+            (enabled, ) = struct.unpack('<I', data)
+            self.deltasEnabled = enabled > 0
+            logger.log("[gopro]: app %s state deltas"%("accepts" if self.deltasEnabled else "declines"))
+            # deltas apply to the last full state the app received
+            self.sendState(full = True)
+
+    # a new app connected.  It may not understand deltas, so start it off with our full state
+    def appConnected(self):
+        self.lock.acquire()
+        try:
+            self.deltasEnabled = False
+            self.sendState(full = True)
+        finally:
+            self.lock.release()
 
     # Send a photo event with current time and location.
     def sendPhotoEvent(self): 
@@ -521,14 +548,61 @@ class GoProManager():
         self.shotMgr.appMgr.sendPacket(pkt)
 
     # Add an entry to /log/photo.log
-    def addPhotoLog(self, lat, lon, alt, time):
-        f = open("/log/photo.log", "a")
-        f.write("%.6f,%.6f,%.3f,%d\n" % (lat, lon, alt, time))
-        f.close();
+    def addPhotoLog(self, lat, lon, alt, timestamp):
+        self.photoLog.add(lat, lon, alt, timestamp, time.time())
+
+    # write photos logged so far through to disk
+    def syncPhotoLog(self):
+        self.lock.acquire()
+        try:
+            self.photoLog.sync()
+        finally:
+            self.lock.release()
+
+
+    # the byte fields of a version 2 state packet
+    def stateFields(self):
+        return (GOPRO_V2_SPEC_VERSION,
+            self.model,
+            self.status,
+            self.isRecording,
+            self.captureMode,
+            self.videoFormat,
+            self.videoResolution,
+            self.videoFrameRate,
+            self.videoFieldOfView,
+            self.videoLowLight,
+            self.photoResolution,
+            self.photoBurstRate,
+            self.videoProtune,
+            self.videoProtuneWhiteBalance,
+            self.videoProtuneColor,
+            self.videoProtuneGain,
+            self.videoProtuneSharpness,
+            self.videoProtuneExposure,
+            self.enabled)
+
+    # sends our current state to the app.  If the app accepts deltas, only the fields
+    # that changed since the last state it was sent go out, unless full is set
+    def sendState(self, full = False):
+        fields = self.stateFields()
+
+        if full or not self.deltasEnabled or self.lastStateSent is None:
+            self.sendFullState(fields)
+        else:
+            # (index into the V2 state's byte fields, new value) for each change
+            changes = [(i, int(value)) for (i, value) in enumerate(fields) if value != self.lastStateSent[i]]
+            if not changes:
+                return
+            logger.log("[gopro]: sending %d changed Gopro state fields to app"%(len(changes)))
+            pkt = struct.pack('<II', app_packet.GOPRO_STATE_DELTA, 2 * len(changes))
+            pkt += ''.join(struct.pack('<BB', i, value) for (i, value) in changes)
+            self.shotMgr.appMgr.sendPacket(pkt)
 
+        self.lastStateSent = fields
 
     # packages up our entire current state and sends it to the app
-    def sendState(self):
+    def sendFullState(self, fields):
         logger.log("[gopro]: sending Gopro state to app")
 
         # Because of a bug in version 1.2 and below of the iOS app, the
@@ -550,28 +624,10 @@ class GoProManager():
         # Now also send a version 2 packet to include the additional GoPro settings
         # 2 unsigned shorts for a header, 26 unsigned bytes, then 5 unsigned shorts
         pkt = struct.pack('<IIBBBBBBBBBBBBBBBBBBBBBBBBBBHHHHH', app_packet.GOPRO_V2_STATE, 36, \
-            GOPRO_V2_SPEC_VERSION,
-            self.model,
-            self.status,
-            self.isRecording,
-            self.captureMode,
-            self.videoFormat,
-            self.videoResolution,
-            self.videoFrameRate,
-            self.videoFieldOfView,
-            self.videoLowLight,
-            self.photoResolution,
-            self.photoBurstRate,
-            self.videoProtune,
-            self.videoProtuneWhiteBalance,
-            self.videoProtuneColor,
-            self.videoProtuneGain,
-            self.videoProtuneSharpness,
-            self.videoProtuneExposure,
-            self.enabled,
+            *(fields + (
             # for now, all the rest is yet to be defined
             0, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0
+            0, 0, 0, 0, 0))
             )
         self.shotMgr.appMgr.sendPacket(pkt)
 
@@ -0,0 +1,201 @@
+#  GoProScheduler.py
+#  shotmanager
+#
+#  Orders, coalesces and retries requests to the GoPro.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+from pymavlink import mavutil
+
+# seconds to wait for a response before resending a request
+GOPRO_REQUEST_TIMEOUT = 1.0
+# commands the GoPro takes longer to carry out
+GOPRO_REQUEST_TIMEOUTS = \
+{
+    mavutil.mavlink.GOPRO_COMMAND_POWER : 3.0,
+    mavutil.mavlink.GOPRO_COMMAND_CAPTURE_MODE : 2.0,
+}
+# times a request is resent before it is given up on
+GOPRO_REQUEST_RETRIES = 2
+# set requests that are never resent: if only the response was lost, a second
+# shutter would take a photo we have no event or geotag for
+GOPRO_NO_RETRY_COMMANDS = \
+(
+    mavutil.mavlink.GOPRO_COMMAND_SHUTTER,
+)
+
+# request priorities, highest first
+PRIORITY_RECORD = 0
+PRIORITY_SET = 1
+PRIORITY_GET = 2
+
+# set requests that take or frame a picture. These keep their order and are
+# never coalesced, since a mode switch around the shutter is part of the shot
+RECORD_COMMANDS = \
+(
+    mavutil.mavlink.GOPRO_COMMAND_SHUTTER,
+    mavutil.mavlink.GOPRO_COMMAND_CAPTURE_MODE,
+)
+
+
+class GoProRequest():
+    def __init__(self, msg, command, isSet, priority, queuedAt):
+        self.msg = msg
+        self.command = command
+        self.isSet = isSet
+        self.priority = priority
+        self.queuedAt = queuedAt
+        self.sentAt = None
+        self.attempts = 0
+
+
+class GoProScheduler():
+    '''Feeds requests to the GoPro one at a time, since it can't handle more
+    than one outstanding request.
+
+    Record requests go ahead of settings, and settings ahead of queries.
+    A set or get for a command that is already waiting replaces the waiting
+    one's message (last write wins) rather than queuing behind it. A request
+    that isn't answered within its timeout is resent up to
+    GOPRO_REQUEST_RETRIES times and then dropped on its own, so one lost
+    response no longer costs everything queued behind it. Shutter commands
+    are dropped without being resent. A response only completes the
+    outstanding request if it is for the same command.
+    '''
+
+    def __init__(self, send):
+        # called with each mavlink message to transmit
+        self.send = send
+        self.reset()
+
+        # statistics
+        self.sent = 0
+        self.answered = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.timedOut = 0
+        self.stale = 0
+        self.waitTotal = 0.0
+        self.waitMax = 0.0
+        self.responseTotal = 0.0
+        self.responseMax = 0.0
+        self.depthMax = 0
+
+    def reset(self):
+        '''Forgets every waiting and outstanding request'''
+        self.queues = ([], [], [])
+        # (isSet, command) -> waiting request, for coalescing
+        self.waiting = {}
+        self.inFlight = None
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.queues)
+
+    def busy(self):
+        return self.inFlight is not None
+
+    def put(self, msg, now, command = None, isSet = False):
+        '''Queues msg, a request for command, and sends it straight away if
+        nothing is outstanding. Requests without a command are never coalesced.'''
+        if not isSet:
+            priority = PRIORITY_GET
+        elif command in RECORD_COMMANDS:
+            priority = PRIORITY_RECORD
+        else:
+            priority = PRIORITY_SET
+
+        key = (isSet, command)
+        coalesce = command is not None and priority != PRIORITY_RECORD
+        if coalesce and key in self.waiting:
+            self.waiting[key].msg = msg
+            self.coalesced += 1
+            return
+
+        request = GoProRequest(msg, command, isSet, priority, now)
+        self.queues[priority].append(request)
+        if coalesce:
+            self.waiting[key] = request
+        self.depthMax = max(self.depthMax, len(self))
+
+        if self.inFlight is None:
+            self.sendNext(now)
+
+    def complete(self, now, command = None, isSet = None):
+        '''Called when the GoPro answers a get (isSet False) or set (isSet
+        True) for command; sends the next request. A response for anything
+        but the outstanding request, e.g. a late one to a request that was
+        dropped, is ignored. None matches any command or kind of request.'''
+        request = self.inFlight
+        if request is not None:
+            if (command is not None and request.command is not None and command != request.command) or \
+               (isSet is not None and isSet != request.isSet):
+                self.stale += 1
+                return
+            response = now - request.sentAt
+            self.answered += 1
+            self.responseTotal += response
+            self.responseMax = max(self.responseMax, response)
+            self.inFlight = None
+
+        self.sendNext(now)
+
+    def poll(self, now):
+        '''Resends or drops the outstanding request if it has timed out.
+        Returns the request if it was dropped, otherwise None.'''
+        request = self.inFlight
+        if request is None:
+            return None
+        if now - request.sentAt < GOPRO_REQUEST_TIMEOUTS.get(request.command, GOPRO_REQUEST_TIMEOUT):
+            return None
+
+        retries = GOPRO_REQUEST_RETRIES
+        if request.isSet and request.command in GOPRO_NO_RETRY_COMMANDS:
+            retries = 0
+        if request.attempts <= retries:
+            self.retried += 1
+            self.transmit(request, now)
+            return None
+
+        self.timedOut += 1
+        self.inFlight = None
+        self.sendNext(now)
+        return request
+
+    def sendNext(self, now):
+        for queue in self.queues:
+            if queue:
+                request = queue.pop(0)
+                key = (request.isSet, request.command)
+                if self.waiting.get(key) is request:
+                    del self.waiting[key]
+
+                wait = now - request.queuedAt
+                self.waitTotal += wait
+                self.waitMax = max(self.waitMax, wait)
+                self.transmit(request, now)
+                return
+
+    def transmit(self, request, now):
+        request.sentAt = now
+        request.attempts += 1
+        self.inFlight = request
+        self.sent += 1
+        self.send(request.msg)
+
+    def summary(self):
+        dequeued = self.sent - self.retried
+        meanWait = self.waitTotal / dequeued if dequeued else 0.0
+        meanResponse = self.responseTotal / self.answered if self.answered else 0.0
+        return "%d sent, %d answered, %d stale, %d coalesced, %d retried, %d timed out, wait %.3f s mean %.3f s max, response %.3f s mean %.3f s max, depth %d max" % \
+            (self.sent, self.answered, self.stale, self.coalesced, self.retried, self.timedOut, meanWait, self.waitMax, meanResponse, self.responseMax, self.depthMax)
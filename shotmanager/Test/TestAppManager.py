@@ -132,7 +132,7 @@ class TestConnectClient(unittest.TestCase):
         self.assertTrue( self.client in self.mgr.inputs )
         self.assertTrue( self.mgr.appMgr.clientQueue != None )
         self.mgr.buttonManager.setButtonMappings.assert_called_with()
-        self.mgr.goproManager.sendState.assert_called_with()
+        self.mgr.goproManager.appConnected.assert_called_with()
 
     def testAlreadyHaveDifferentClient(self):
         """ If we're already connected to a client, we should accept and then close it """
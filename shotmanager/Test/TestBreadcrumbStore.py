@@ -0,0 +1,122 @@
+#  TestBreadcrumbStore.py
+#  shotmanager
+#
+#  Unit tests for the memory-mapped breadcrumb store.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from breadcrumbStore import BreadcrumbStore
+from breadcrumbTrail import BreadcrumbTrail
+from location_helpers import LATLON_TO_M
+
+# roughly ten meters of latitude
+STEP = 10.0 / LATLON_TO_M
+
+
+class TestBreadcrumbStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'rewind.trail')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def zigzag(self, trail, n):
+        for i in range(n):
+            trail.append(37.0 + i * STEP, -122.0 + (i % 2) * STEP, 10.0 + i, float(i))
+
+    def recorded(self, trail):
+        store = BreadcrumbStore(self.path, trail.capacity)
+        trail.store = store
+        return store
+
+    def testFileSize(self):
+        store = BreadcrumbStore(self.path, 16)
+        store.close()
+        self.assertEqual(os.path.getsize(self.path), store.size)
+
+    def testRestoreWrapped(self):
+        trail = BreadcrumbTrail(8, 0.5, 1.0e6)
+        store = self.recorded(trail)
+        self.zigzag(trail, 13)
+        trail.pop()
+        store.close()
+
+        restored = BreadcrumbTrail(8, 0.5, 10.0)
+        store = BreadcrumbStore(self.path, 8)
+        self.assertTrue(store.restore(restored))
+        store.close()
+
+        self.assertEqual(len(restored), len(trail))
+        self.assertEqual(restored.maxLength, 1.0e6)
+        self.assertEqual(restored.pathLength, trail.pathLength)
+        for i in range(len(trail)):
+            self.assertEqual(restored.point(i), trail.point(i))
+
+    def testRestoreMatchesLiveTrail(self):
+        ''' a restored trail keeps recording like the original '''
+        trail = BreadcrumbTrail(16, 0.5, 1.0e6)
+        store = self.recorded(trail)
+        self.zigzag(trail, 5)
+        store.close()
+        trail.store = None
+
+        restored = BreadcrumbTrail(16, 0.5, 1.0e6)
+        self.recorded(restored).restore(restored)
+        restored.append(38.0, -122.0, 10.0, 99.0)
+        trail.append(38.0, -122.0, 10.0, 99.0)
+        self.assertEqual(restored.newest(), trail.newest())
+        self.assertEqual(len(restored), len(trail))
+
+    def testCleared(self):
+        trail = BreadcrumbTrail(8, 0.5, 1.0e6)
+        store = self.recorded(trail)
+        self.zigzag(trail, 5)
+        trail.clear()
+        store.close()
+
+        restored = BreadcrumbTrail(8, 0.5, 1.0e6)
+        self.assertTrue(BreadcrumbStore(self.path, 8).restore(restored))
+        self.assertEqual(len(restored), 0)
+
+    def testEmptyFile(self):
+        restored = BreadcrumbTrail(8, 0.5, 1.0e6)
+        self.assertFalse(BreadcrumbStore(self.path, 8).restore(restored))
+
+    def testCapacityMismatch(self):
+        trail = BreadcrumbTrail(8, 0.5, 1.0e6)
+        store = self.recorded(trail)
+        self.zigzag(trail, 5)
+        store.close()
+        trail.store = None
+
+        restored = BreadcrumbTrail(16, 0.5, 1.0e6)
+        self.assertFalse(BreadcrumbStore(self.path, 16).restore(restored))
+        self.assertEqual(len(restored), 0)
+
+    def testHome(self):
+        store = BreadcrumbStore(self.path, 8)
+        self.assertEqual(store.readHome(), None)
+        store.writeHome((37.5, -122.5, 12.0))
+        store.close()
+
+        store = BreadcrumbStore(self.path, 8)
+        self.assertEqual(store.readHome(), (37.5, -122.5, 12.0))
+        store.writeHome(None)
+        self.assertEqual(store.readHome(), None)
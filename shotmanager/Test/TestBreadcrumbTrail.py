@@ -0,0 +1,130 @@
+#  TestBreadcrumbTrail.py
+#  shotmanager
+#
+#  Unit tests for the breadcrumb ring buffer.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import math
+import unittest
+
+import breadcrumbTrail
+from breadcrumbTrail import BreadcrumbTrail
+from location_helpers import LATLON_TO_M
+
+# roughly one meter of latitude
+STEP = 1.0 / LATLON_TO_M
+
+
+class TestAppend(unittest.TestCase):
+    def setUp(self):
+        self.trail = BreadcrumbTrail(8, 0.5, 1000.0)
+
+    def testBadCapacity(self):
+        self.assertRaises(ValueError, BreadcrumbTrail, 1, 0.5, 10.0)
+
+    def testEmpty(self):
+        self.assertEqual(len(self.trail), 0)
+        self.assertEqual(self.trail.newest(), None)
+        self.assertEqual(self.trail.pop(), None)
+
+    def testStraightLineCollapses(self):
+        ''' a straight trail keeps only its ends '''
+        for i in range(30):
+            self.trail.append(37.0 + i * STEP, -122.0, 10.0, float(i))
+
+        self.assertEqual(len(self.trail), 2)
+        self.assertEqual(self.trail.point(0), (37.0, -122.0, 10.0, 0.0))
+        self.assertEqual(self.trail.newest(), (37.0 + 29 * STEP, -122.0, 10.0, 29.0))
+        self.assertAlmostEqual(self.trail.pathLength, 29.0, 3)
+
+    def testWindowLimit(self):
+        ''' the tip is committed after SIMPLIFY_WINDOW samples '''
+        trail = BreadcrumbTrail(64, 0.5, 1000.0)
+        for i in range(2 * breadcrumbTrail.SIMPLIFY_WINDOW + 2):
+            trail.append(37.0 + i * STEP, -122.0, 10.0, float(i))
+        self.assertEqual(len(trail), 4)
+
+    def testCornerKept(self):
+        for i in range(10):
+            self.trail.append(37.0 + i * STEP, -122.0, 10.0, float(i))
+        for i in range(1, 10):
+            self.trail.append(37.0 + 9 * STEP, -122.0 + i * STEP, 10.0, float(9 + i))
+
+        self.assertEqual(len(self.trail), 3)
+        (lat, lon, alt, t) = self.trail.point(1)
+        self.assertEqual((lat, lon, t), (37.0 + 9 * STEP, -122.0, 9.0))
+
+    def testClimbKept(self):
+        ''' altitude changes count as deviation '''
+        for i in range(10):
+            self.trail.append(37.0 + i * STEP, -122.0, 10.0, float(i))
+        for i in range(1, 10):
+            self.trail.append(37.0 + (9 + i) * STEP, -122.0, 10.0 + i, float(9 + i))
+
+        self.assertEqual(len(self.trail), 3)
+        self.assertEqual(self.trail.point(1)[2], 10.0)
+
+    def testDistanceToNewest(self):
+        self.trail.append(37.0, -122.0, 10.0, 0.0)
+        self.assertAlmostEqual(self.trail.distanceToNewest(37.0 + 10 * STEP, -122.0, 10.0), 10.0, 6)
+        self.assertAlmostEqual(self.trail.distanceToNewest(37.0, -122.0, 13.0), 3.0, 6)
+
+
+class TestRing(unittest.TestCase):
+    def zigzag(self, trail, n):
+        ''' 10m zigzag legs, every point is a corner '''
+        for i in range(n):
+            trail.append(37.0 + i * 10 * STEP, -122.0 + (i % 2) * 10 * STEP, 10.0, float(i))
+
+    def testWrap(self):
+        trail = BreadcrumbTrail(8, 0.5, 1.0e6)
+        self.zigzag(trail, 20)
+        self.assertEqual(len(trail), 8)
+        self.assertEqual([trail.point(i)[3] for i in range(8)], [float(i) for i in range(12, 20)])
+
+    def testMaxLength(self):
+        ''' oldest points go once the rest covers maxLength '''
+        trail = BreadcrumbTrail(64, 0.5, 50.0)
+        self.zigzag(trail, 20)
+        covered = trail.pathLength - trail.lengths[trail._index(0)]
+        self.assertTrue(covered >= 50.0)
+        covered = trail.pathLength - trail.lengths[trail._index(1)]
+        self.assertTrue(covered < 50.0)
+
+    def testPopNewestFirst(self):
+        trail = BreadcrumbTrail(8, 0.5, 1.0e6)
+        self.zigzag(trail, 12)
+        times = []
+        point = trail.pop()
+        while point is not None:
+            times.append(point[3])
+            point = trail.pop()
+        self.assertEqual(times, [float(i) for i in range(11, 3, -1)])
+        self.assertEqual(len(trail), 0)
+
+    def testAppendAfterPop(self):
+        trail = BreadcrumbTrail(8, 0.5, 1.0e6)
+        self.zigzag(trail, 4)
+        trail.pop()
+        trail.append(37.0 + 50 * STEP, -122.0, 10.0, 10.0)
+        self.assertEqual(len(trail), 4)
+        self.assertEqual(trail.newest()[3], 10.0)
+
+    def testClear(self):
+        trail = BreadcrumbTrail(8, 0.5, 1.0e6)
+        self.zigzag(trail, 4)
+        trail.clear()
+        self.assertEqual(len(trail), 0)
+        self.assertEqual(trail.pathLength, 0.0)
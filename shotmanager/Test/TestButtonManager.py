@@ -4,6 +4,7 @@ from mock import call
 from mock import Mock
 from mock import patch
 import os
+import socket
 from os import sys, path
 
 import unittest
@@ -11,6 +12,7 @@ import unittest
 sys.path.append(os.path.realpath('..'))
 import buttonManager
 import GeoFenceManager
+import settings
 import shots
 from dronekit import Vehicle
 
@@ -254,6 +256,10 @@ class TestSetFreeButtonMappings(unittest.TestCase):
             self.mgr.freeButtonMappings = [(-1, -1), (-1, -1)]
             self.mgr.setButtonMappings = Mock()
 
+    def tearDown(self):
+        # don't let the mappings queued here be written to the config at exit
+        settings.writerThread = None
+        settings.pendingSettings.clear()
 
     def testSetACableCam(self, mockThread):
         """ Set A to cable cam """
@@ -285,3 +291,123 @@ class TestSetFreeButtonMappings(unittest.TestCase):
         self.assertFalse( self.mgr.setButtonMappings.called )
         self.assertEqual( self.mgr.freeButtonMappings, [(-1, -1), (-1, -1)])
 
+
+class TestReadFreeButtonMappings(unittest.TestCase):
+    @patch('buttonManager.buttonManager.connect')
+    def testReadInOneCall(self, mockConnect):
+        """ A and B mappings are read from the settings in one go """
+        with patch('settings.readSettings', return_value = {"a" : "5, -1", "b" : "-1, 2"}) as mockRead:
+            mgr = buttonManager.buttonManager(Mock())
+        mockRead.assert_called_once_with()
+        self.assertEqual(mgr.freeButtonMappings, [(5, -1), (-1, 2)])
+
+    @patch('buttonManager.buttonManager.connect')
+    def testMissingMapping(self, mockConnect):
+        """ A missing mapping leaves the buttons unmapped """
+        with patch('settings.readSettings', return_value = {"a" : "5, -1"}):
+            mgr = buttonManager.buttonManager(Mock())
+        self.assertEqual(mgr.freeButtonMappings[1], (-1, -1))
+
+
+class TestParse(unittest.TestCase):
+    def setUp(self):
+        with patch('buttonManager.buttonManager.connect') as mock:
+            shotmgr = Mock()
+            self.mgr = buttonManager.buttonManager(shotmgr)
+        (self.mgr.client, self.artoo) = socket.socketpair()
+        self.mgr.framer = btn_msg.framer(self.mgr.client)
+        self.mgr.handleButtons = Mock()
+        self.mgr.disconnect = Mock()
+
+    def tearDown(self):
+        self.mgr.client.close()
+        self.artoo.close()
+
+    def testBurst(self):
+        """ Every event in one read is handled """
+        self.artoo.sendall(struct.pack("<QBBH", 1, btn_msg.ButtonA, btn_msg.ClickRelease, 0) +
+                           struct.pack("<QBBH", 2, btn_msg.ButtonB, btn_msg.Press, 0) +
+                           struct.pack("<QBBH", 3, btn_msg.ButtonB, btn_msg.Release, 0))
+        self.mgr.parse()
+        self.mgr.handleButtons.assert_has_calls([call((btn_msg.ButtonA, btn_msg.ClickRelease)),
+                                                 call((btn_msg.ButtonB, btn_msg.Press)),
+                                                 call((btn_msg.ButtonB, btn_msg.Release))])
+        self.assertFalse(self.mgr.disconnect.called)
+
+    def testSplitEvent(self):
+        """ An event split across reads is handled once it is complete """
+        msg = struct.pack("<QBBH", 1, btn_msg.ButtonA, btn_msg.ClickRelease, 0)
+        self.artoo.sendall(msg[:5])
+        self.mgr.parse()
+        self.assertFalse(self.mgr.handleButtons.called)
+        self.artoo.sendall(msg[5:])
+        self.mgr.parse()
+        self.mgr.handleButtons.assert_called_once_with((btn_msg.ButtonA, btn_msg.ClickRelease))
+        self.assertFalse(self.mgr.disconnect.called)
+
+    def testClosed(self):
+        """ Disconnect when Artoo closes the socket """
+        self.artoo.close()
+        self.mgr.parse()
+        self.mgr.disconnect.assert_called_with()
+
+
+class TestArtooButtons(unittest.TestCase):
+    def setUp(self):
+        with patch('buttonManager.buttonManager.connect') as mock:
+            shotmgr = Mock()
+            self.v = Mock()
+            shotmgr.vehicle = self.v
+            self.mgr = buttonManager.buttonManager(shotmgr)
+        self.mgr.client = Mock()
+        self.mgr.connected = True
+        self.mgr.shotMgr.appMgr.isAppConnected.return_value = True
+        self.mgr.shotMgr.currentShot = shots.APP_SHOT_NONE
+        self.v.ekf_ok = True
+        self.v.armed = False
+        self.mgr.freeButtonMappings = [(shots.APP_SHOT_SELFIE, -1), (shots.APP_SHOT_CABLECAM, -1)]
+
+    def testBatched(self):
+        """ All button strings go to Artoo in one write """
+        self.mgr.setButtonMappings()
+        pkt = btn_msg.packArtooString(btn_msg.ButtonLoiter, shots.APP_SHOT_NONE, 0, "\0") + \
+              btn_msg.packArtooString(btn_msg.ButtonA, shots.APP_SHOT_SELFIE, btn_msg.ARTOO_BITMASK_ENABLED, "Selfie\0") + \
+              btn_msg.packArtooString(btn_msg.ButtonB, shots.APP_SHOT_CABLECAM, btn_msg.ARTOO_BITMASK_ENABLED, "Cable Cam\0")
+        self.mgr.client.sendall.assert_called_once_with(pkt)
+
+    def testUnchanged(self):
+        """ Nothing is sent if no button changed """
+        self.mgr.setButtonMappings()
+        self.mgr.client.sendall.reset_mock()
+        self.mgr.setButtonMappings()
+        self.assertFalse(self.mgr.client.sendall.called)
+        self.mgr.setArtooButton(btn_msg.ButtonA, shots.APP_SHOT_SELFIE, btn_msg.ARTOO_BITMASK_ENABLED, "Selfie\0")
+        self.assertFalse(self.mgr.client.sendall.called)
+
+    def testChanged(self):
+        """ Only the buttons that changed are sent """
+        self.mgr.setButtonMappings()
+        self.mgr.client.sendall.reset_mock()
+        self.v.armed = True
+        self.mgr.setButtonMappings()
+        pkt = btn_msg.packArtooString(btn_msg.ButtonLoiter, shots.APP_SHOT_NONE, btn_msg.ARTOO_BITMASK_ENABLED, "\0")
+        self.mgr.client.sendall.assert_called_once_with(pkt)
+
+    def testResentAfterDisconnect(self):
+        """ Everything is sent again after reconnecting to Artoo """
+        self.mgr.setButtonMappings()
+        self.mgr.client.sendall.reset_mock()
+        self.mgr.disconnect()
+        self.mgr.connected = True
+        self.mgr.setButtonMappings()
+        self.assertEqual(len(self.mgr.client.sendall.call_args[0][0]),
+                         len(btn_msg.packArtooString(btn_msg.ButtonLoiter, shots.APP_SHOT_NONE, 0, "\0") +
+                             btn_msg.packArtooString(btn_msg.ButtonA, shots.APP_SHOT_SELFIE, btn_msg.ARTOO_BITMASK_ENABLED, "Selfie\0") +
+                             btn_msg.packArtooString(btn_msg.ButtonB, shots.APP_SHOT_CABLECAM, btn_msg.ARTOO_BITMASK_ENABLED, "Cable Cam\0")))
+
+    def testSendError(self):
+        """ A failed write disconnects and isn't remembered """
+        self.mgr.client.sendall.side_effect = socket.error()
+        self.mgr.setButtonMappings()
+        self.assertFalse(self.mgr.connected)
+        self.assertEqual(self.mgr.artooButtons, {})
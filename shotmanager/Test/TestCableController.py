@@ -59,6 +59,25 @@ class TestPublicInterface(unittest.TestCase):
         self.controller.setTargetP(.3)
         self.assertEqual(self.controller.targetP, .3)
 
+    def testSetReachableRange(self):
+        '''Targets are clamped to the reachable range'''
+
+        self.controller.setReachableRange(.2, .6)
+        self.assertEqual(self.controller.targetP, .6)
+        self.controller.setTargetP(0.)
+        self.assertEqual(self.controller.targetP, .2)
+        self.controller.setTargetP(.3)
+        self.assertEqual(self.controller.targetP, .3)
+
+    def testSampleTrajectory(self):
+        '''The cable is sampled end to end'''
+
+        (ps, (north, east, down)) = self.controller.sampleTrajectory(0.25)
+        self.assertEqual(ps[0], 0.)
+        self.assertAlmostEqual(ps[-1], 1.)
+        self.assertAlmostEqual(north[-1], 3.)
+        self.assertEqual(len(ps), 13)
+
     def testTrackSpeed(self):
         '''Test that trackSpeed works'''
 
@@ -575,3 +594,74 @@ class Test_getNegSpeedLimit(unittest.TestCase):
 
 
 
+
+
+class TestGetPathPreview(unittest.TestCase):
+    def setUp(self):
+        points = [Vector3(0, 0, 0), Vector3(10, 0, 0), Vector3(10, 10, 0), Vector3(20, 10, -5)]
+        maxSpeed = MAX_SPEED
+        minSpeed = MIN_CRUISE_SPEED
+        tanAccelLim = TANGENT_ACCEL_LIMIT
+        normAccelLim = NORM_ACCEL_LIMIT
+        smoothStopP = 0.7
+        maxAlt = 50
+        self.controller = cableController.CableController(points, maxSpeed, minSpeed, tanAccelLim, normAccelLim, smoothStopP, maxAlt)
+        self.controller.killCurvatureMapThread() #send thread poison pill
+        self.controller.curvatureMapThread.join() #wait for thread to die
+
+    def testEndpoints(self):
+        '''Preview starts and ends at the ends of the cable'''
+
+        preview = self.controller.getPathPreview()
+        self.assertEqual(preview[0][0], 0.)
+        self.assertEqual(preview[-1][0], 1.)
+        self.assertAlmostEqual((preview[-1][1] - Vector3(20, 10, -5)).length(), 0., places = 2)
+
+    def testDecimated(self):
+        '''Preview has fewer samples than the dense sampling and stays within tolerance'''
+
+        preview = self.controller.getPathPreview(0.5)
+        self.assertTrue(2 <= len(preview) < self.controller.curvatureMapNumJoints)
+        previewPoints = [sample[1] for sample in preview]
+        for (p, pos, speedLimit) in self.controller._samplePath():
+            dist = min(pathSimplifier.distanceToSegment(pos, a, b)[0] for a, b in zip(previewPoints[:-1], previewPoints[1:]))
+            self.assertTrue(dist <= 0.5)
+
+    def testSpeedLimits(self):
+        '''Preview speed limits come from the curvature map'''
+
+        preview = self.controller.getPathPreview()
+        for (p, pos, speedLimit) in preview:
+            self.assertTrue(speedLimit >= MIN_CRUISE_SPEED)
+
+    def testCached(self):
+        '''The last preview is cached and the dense samples are kept once complete'''
+
+        for mapSeg in range(self.controller.curvatureMapNumSegments):
+            self.controller._getCurvatureMapSpeedLimit(mapSeg)
+        preview = self.controller.getPathPreview(1.)
+        self.controller._samplePath = Mock()
+        self.assertIs(self.controller.getPathPreview(1.), preview)
+        self.controller.getPathPreview(2.)
+        self.assertFalse(self.controller._samplePath.called)
+
+    def testUsesCachedSpeedLimits(self):
+        '''Speed limits the curvature map hasn't computed yet are not computed for the preview'''
+
+        self.controller.curvatureMapSpeedLimits = [None] * self.controller.curvatureMapNumSegments
+        self.controller.curvatureMapSegmentsComputed = 0
+        self.controller._computeCurvatureMapSpeedLimit = Mock()
+        preview = self.controller.getPathPreview()
+        self.assertFalse(self.controller._computeCurvatureMapSpeedLimit.called)
+        for (p, pos, speedLimit) in preview:
+            self.assertEqual(speedLimit, MAX_SPEED)
+        self.assertIsNone(self.controller.pathPreviewSamples)
+
+    def testZeroLength(self):
+        '''A cable with no curvature map segments still gets a preview'''
+
+        self.controller.curvatureMapNumSegments = 0
+        self.controller.curvatureMapSpeedLimits = []
+        preview = self.controller.getPathPreview()
+        for (p, pos, speedLimit) in preview:
+            self.assertEqual(speedLimit, 0.)
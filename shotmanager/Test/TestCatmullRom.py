@@ -18,6 +18,7 @@
 #  limitations under the License.
 
 import unittest
+import numpy
 from catmullRom import CatmullRom
 from vector3 import Vector3
 
@@ -311,3 +312,36 @@ class TestNonDimensionalToArclength(unittest.TestCase):
         p, dp = self.spline.nonDimensionalToArclength(seg, u, v)
         self.assertAlmostEqual(p, 0.66666666)
         self.assertAlmostEqual(dp, 0.66666666)
+
+
+class TestArrays(unittest.TestCase):
+    def setUp(self):
+        self.spline = CatmullRom([Vector3(0, 0, 0), Vector3(1, 0, 0), Vector3(2, 3, 1), Vector3(4, 0, 2), Vector3(5, -1, 0)])
+
+    def testPositionArrays(self):
+        '''Batched positions match position()'''
+        us = numpy.linspace(0., 1., 11)
+        (xs, ys, zs) = self.spline.positionArrays(1, us)
+        for i in range(len(us)):
+            pos = self.spline.position(1, us[i])
+            self.assertAlmostEqual(xs[i], pos.x)
+            self.assertAlmostEqual(ys[i], pos.y)
+            self.assertAlmostEqual(zs[i], pos.z)
+
+    def testArcLengthArrays(self):
+        '''Batched arc lengths match arcLength()'''
+        us = numpy.linspace(0., 1., 11)
+        lengths = self.spline.arcLengthArrays(0, us)
+        for i in range(len(us)):
+            self.assertAlmostEqual(lengths[i], self.spline.arcLength(0, 0, us[i]))
+
+    def testSampleArrays(self):
+        '''Samples cover the spline in increasing p with about the requested spacing'''
+        (ps, (xs, ys, zs)) = self.spline.sampleArrays(0.5)
+        self.assertEqual(ps[0], 0.)
+        self.assertAlmostEqual(ps[-1], 1.)
+        self.assertTrue((numpy.diff(ps) > 0).all())
+        steps = numpy.sqrt(numpy.diff(xs) ** 2 + numpy.diff(ys) ** 2 + numpy.diff(zs) ** 2)
+        self.assertTrue(steps.max() < 1.0)
+        end = self.spline.position(1, 1.)
+        self.assertAlmostEqual(xs[-1], end.x)
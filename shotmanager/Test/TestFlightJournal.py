@@ -0,0 +1,146 @@
+#  TestFlightJournal.py
+#  shotmanager
+#
+#  Unit tests for the flight event journal.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock, patch
+
+import flightJournal
+from flightJournal import FlightJournal
+
+
+class TestFlightJournal(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'shotmanager.journal')
+        self.journal = FlightJournal(self.path)
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.dir)
+
+    def read(self):
+        self.journal.close()
+        return list(flightJournal.readJournal(self.path))
+
+    def testRoundTrip(self):
+        self.journal.shot(-1, 2)
+        self.journal.mode(u"GUIDED")
+        self.journal.rc(True, range(1000, 1008))
+        self.journal.geofence(37.5, -122.25)
+        records = self.read()
+        self.assertEqual([r[0] for r in records], [flightJournal.JOURNAL_SHOT, flightJournal.JOURNAL_MODE,
+            flightJournal.JOURNAL_RC, flightJournal.JOURNAL_GEOFENCE])
+        self.assertEqual(records[0][2], (-1, 2))
+        self.assertEqual(records[1][2][0].rstrip('\0'), "GUIDED")
+        self.assertEqual(records[2][2], (1,) + tuple(range(1000, 1008)))
+        self.assertEqual(records[3][2], (37.5, -122.25))
+
+    def testSentMessages(self):
+        msg = Mock()
+        msg.get_type.return_value = 'MOUNT_CONTROL'
+        msg.input_a = -4500
+        msg.input_b = 0
+        msg.input_c = 9000
+        self.journal.sent(msg)
+        heartbeat = Mock()
+        heartbeat.get_type.return_value = 'HEARTBEAT'
+        self.journal.sent(heartbeat)
+        records = self.read()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0][0], flightJournal.JOURNAL_MOUNT)
+        self.assertEqual(records[0][2], (-4500, 0, 9000))
+
+    def testBufferedUntilPoll(self):
+        size = os.path.getsize(self.path)
+        self.journal.shot(-1, 2)
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.journal.poll(10.0)
+        self.assertTrue(os.path.getsize(self.path) > size)
+        self.journal.shot(2, -1)
+        self.journal.poll(10.0 + flightJournal.JOURNAL_FLUSH_INTERVAL / 2)
+        self.assertEqual(len(self.journal.buffer), 1)
+
+    def testBadValuesIgnored(self):
+        self.journal.rc(Mock(), Mock())
+        self.journal.shot("a", "b")
+        self.assertEqual(self.journal.errors, 2)
+        self.assertEqual(self.read(), [])
+
+    def testRotateOnStart(self):
+        self.journal.shot(-1, 2)
+        self.journal.close()
+        self.journal = FlightJournal(self.path)
+        self.journal.shot(2, 3)
+        self.assertEqual(list(flightJournal.readJournal(self.path + ".1"))[0][2], (-1, 2))
+        self.assertEqual(self.read()[0][2], (2, 3))
+
+    def testRotateOnSize(self):
+        with patch('flightJournal.JOURNAL_MAX_SIZE', 200):
+            for i in range(20):
+                self.journal.rc(False, [1500] * 8)
+                self.journal.poll(i * flightJournal.JOURNAL_FLUSH_INTERVAL)
+        self.assertTrue(os.path.exists(self.path + ".1"))
+        self.assertTrue(os.path.getsize(self.path + ".1") >= 200)
+
+    def testRotationsKept(self):
+        for i in range(flightJournal.JOURNAL_ROTATIONS + 2):
+            self.journal.close()
+            self.journal = FlightJournal(self.path)
+        self.assertTrue(os.path.exists("%s.%d" % (self.path, flightJournal.JOURNAL_ROTATIONS)))
+        self.assertFalse(os.path.exists("%s.%d" % (self.path, flightJournal.JOURNAL_ROTATIONS + 1)))
+
+    def testTruncatedRecordIgnored(self):
+        self.journal.shot(-1, 2)
+        self.journal.shot(2, -1)
+        self.journal.close()
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 1)
+        self.assertEqual(len(list(flightJournal.readJournal(self.path))), 1)
+
+    def testNotAJournal(self):
+        with open(self.path, 'wb') as f:
+            f.write("hello")
+        self.assertRaises(ValueError, list, flightJournal.readJournal(self.path))
+
+    def testWriteCSV(self):
+        self.journal.shot(-1, 2)
+        self.journal.mode("LOITER")
+        self.journal.close()
+        flightJournal.writeCSV(self.path, self.dir)
+        with open(os.path.join(self.dir, "mode.csv")) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], "time,mode")
+        self.assertTrue(lines[1].endswith(",LOITER"))
+
+    def testLoadJournal(self):
+        if flightJournal.numpy is None:
+            return
+        for i in range(3):
+            self.journal.rc(False, [1500 + i] * 8)
+        self.journal.close()
+        arrays = flightJournal.loadJournal(self.path)
+        self.assertEqual(len(arrays["rc"]), 3)
+        self.assertEqual(list(arrays["rc"]["ch3"]), [1500, 1501, 1502])
+        self.assertEqual(len(arrays["shot"]), 0)
+
+    def testFieldCodes(self):
+        self.assertEqual(flightJournal.fieldCodes('<B2H16s'), ['B', 'H', 'H', 'S16'])
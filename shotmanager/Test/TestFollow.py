@@ -42,6 +42,7 @@ class TestFollowShotInit(unittest.TestCase):
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
         shotmgr.rcMgr = Mock(specs=['remapper'])
+        shotmgr.inputs = []
         shotmgr.getParam.return_value = 0 # so mock doesn't do lazy binds
 
         #Run the shot constructor
@@ -66,11 +67,9 @@ class TestFollowShotInit(unittest.TestCase):
         self.assertEqual(self.shot.filteredROI, None)
         self.assertEqual(self.shot.rawROI, None)
 
-        # rawROI queue should be created
-        assert self.shot.rawROIQueue is not None
-
-        # filteredROI queue should be created
-        assert self.shot.filteredROIQueue is not None
+        # roi filter should be created and not yet started
+        assert self.shot.roiFilter is not None
+        self.assertEqual(self.shot.roiFilter.updates, 0)
 
         # roiVelocity should be initialized to None
         self.assertEqual(self.shot.roiVelocity, None)
@@ -106,6 +105,7 @@ class TestHandleRCs(unittest.TestCase):
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
         shotmgr.rcMgr = Mock(specs=['remapper'])
+        shotmgr.inputs = []
         shotmgr.getParam.return_value = 0 # so mock doesn't do lazy binds
 
         #Run the shot constructor
@@ -117,6 +117,7 @@ class TestHandleRCs(unittest.TestCase):
 
         # Mock Attributes
         self.shot.rawROI = LocationGlobalRelative(37.873168,-122.302062, 0)
+        self.shot.previousROItime = monotonic.monotonic()
 
         self.shot.filteredROI = LocationGlobalRelative(37.873168,-122.302062, 0)
 
@@ -143,11 +144,19 @@ class TestHandleRCs(unittest.TestCase):
         yaw = 0.0 
         self.channels = [throttle, roll, pitch, yaw, 0.0, 0.0, 0.0, 0.0]
 
-    def testCallcheckSocket(self):
-        '''Test that we call checkSocket()'''
+    def testDontCallcheckSocket(self):
+        '''The socket is read by shotManager, not every tick'''
+
+        self.shot.handleRCs(self.channels)
+        assert not self.shot.checkSocket.called
+
+    @mock.patch('monotonic.monotonic', return_value = 333)
+    def testROIAge(self, monotonic_monotonic):
+        '''Test that we track how old the newest ROI is'''
 
+        self.shot.previousROItime = 332.5
         self.shot.handleRCs(self.channels)
-        self.shot.checkSocket.assert_called_with()
+        self.assertEqual(self.shot.roiAge, 0.5)
 
     def testNoRawROI(self):
         '''If raw ROI is not set then do NOT continue'''
@@ -256,6 +265,7 @@ class TestUpdateROIAltOffset(unittest.TestCase):
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
         shotmgr.rcMgr = Mock(specs=['remapper'])
+        shotmgr.inputs = []
 
         #Run the shot constructor
         self.shot = follow.FollowShot(vehicle, shotmgr)
@@ -301,6 +311,7 @@ class TestInitState(unittest.TestCase):
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
         shotmgr.rcMgr = Mock(specs=['remapper'])
+        shotmgr.inputs = []
 
         #Run the shot constructor
         self.shot = follow.FollowShot(vehicle, shotmgr)
@@ -359,6 +370,7 @@ class TestSetupSocket(unittest.TestCase):
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
         shotmgr.rcMgr = Mock(specs=['remapper'])
+        shotmgr.inputs = []
 
         #Run the shot constructor
         self.shot = follow.FollowShot(vehicle, shotmgr)
@@ -393,11 +405,19 @@ class TestSetupSocket(unittest.TestCase):
         self.shot.socket.bind.assert_called_with(("",FOLLOW_PORT))
 
     @mock.patch('socket.socket', return_value = Mock())
-    def testSocketTimeout(self, socket_socket):
-        '''Test that socket sets a timeout'''
+    def testSocketRegistered(self, socket_socket):
+        '''Test that socket is handed to shotManager's select loop and not given a timeout'''
 
         self.shot.setupSocket()
-        self.shot.socket.settimeout.assert_called_with(SOCKET_TIMEOUT)
+        self.assertTrue(self.shot.socket in self.shot.shotmgr.inputs)
+        assert not self.shot.socket.settimeout.called
+
+    def testCloseSocket(self):
+        '''Test that closing the socket takes it out of the select loop'''
+
+        sock = self.shot.socket
+        self.shot.closeSocket()
+        self.assertFalse(sock in self.shot.shotmgr.inputs)
 
 class TestCheckSocket(unittest.TestCase):
     def setUp(self):
@@ -407,18 +427,68 @@ class TestCheckSocket(unittest.TestCase):
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
         shotmgr.rcMgr = Mock(specs=['remapper'])
+        shotmgr.inputs = []
 
         #Run the shot constructor
         self.shot = follow.FollowShot(vehicle, shotmgr)
 
         sampleData = struct.pack('<IIddf', app_packet.SOLO_MESSAGE_LOCATION, 20, 37.873168,-122.302062, 0)
-        self.shot.socket.recvfrom = Mock(side_effect = [(sampleData,'127.0.0.1'), socket.timeout])
+        self.shot.socket = Mock()
+        self.shot.socket.recvfrom = Mock(side_effect = [(sampleData,'127.0.0.1'), socket.error(errno.EAGAIN, "Resource temporarily unavailable")])
 
     def testRecvFrom(self):
         '''Test recvFrom functionality'''
 
         self.shot.checkSocket()
-        self.shot.socket.recvfrom.assert_called_with(28)
+        self.shot.socket.recvfrom.assert_called_with(ROI_PACKET_V2_SIZE)
+
+    @mock.patch('monotonic.monotonic', return_value = 333)
+    def testBurst(self, monotonic_monotonic):
+        '''Test that a burst of ROIs is drained and only the newest is used'''
+
+        packets = [struct.pack('<IIddf', app_packet.SOLO_MESSAGE_LOCATION, 20, 37.0 + i, -122.0, 0) for i in range(3)]
+        self.shot.socket.recvfrom = Mock(side_effect = [(p, '127.0.0.1') for p in packets] + [socket.error(errno.EWOULDBLOCK, "Resource temporarily unavailable")])
+
+        self.shot.checkSocket()
+        self.assertEqual(self.shot.rawROI.lat, 39.0)
+        self.assertEqual(self.shot.roiPacketsReceived, 3)
+        self.assertEqual(self.shot.roiPacketsSkipped, 2)
+        self.assertEqual(self.shot.roiAge, 0.0)
+
+    def testTimestampedROI(self):
+        '''Test that timestamped ROIs go through the jitter buffer and come out on a later tick'''
+
+        packets = [struct.pack('<IIddfdI', app_packet.SOLO_MESSAGE_LOCATION_V2, 32, 37.0 + i * 0.0001, -122.0, 0, 500.0 + i * 0.2, i) for i in (1, 0)]
+        self.shot.socket.recvfrom = Mock(side_effect = [(p, '127.0.0.1') for p in packets] + [socket.error(errno.EAGAIN, "Resource temporarily unavailable")])
+
+        with mock.patch('monotonic.monotonic', return_value = 100.0):
+            self.shot.checkSocket()
+        self.assertEqual(self.shot.rawROI, None)
+        self.assertEqual(self.shot.jitterBuffer.received, 2)
+        self.assertEqual(self.shot.jitterBuffer.reordered, 1)
+
+        # both are due after the playout delay, the newest wins and is stamped with its capture time
+        self.shot.filterROI = Mock()
+        with mock.patch('monotonic.monotonic', return_value = 100.01 + ROI_JITTER_DELAY):
+            self.shot.handleRCs([0.0] * 8)
+        self.assertEqual(self.shot.rawROI.lat, 37.0001)
+        self.assertAlmostEqual(self.shot.previousROItime, 100.0, 9)
+        self.assertAlmostEqual(self.shot.roiAge, ROI_JITTER_DELAY + 0.01, 9)
+
+    def testNothingToRead(self):
+        '''Test that an empty socket leaves the ROI alone'''
+
+        self.shot.socket.recvfrom = Mock(side_effect = socket.error(errno.EAGAIN, "Resource temporarily unavailable"))
+        self.shot.checkSocket()
+        self.assertEqual(self.shot.rawROI, None)
+        self.assertEqual(self.shot.roiPacketsReceived, 0)
+
+    def testShortPacket(self):
+        '''Test that a truncated packet is ignored'''
+
+        self.shot.socket.recvfrom = Mock(side_effect = [('\x00' * 8, '127.0.0.1'), socket.error(errno.EAGAIN, "Resource temporarily unavailable")])
+        self.shot.checkSocket()
+        self.assertEqual(self.shot.rawROI, None)
 
     @mock.patch('monotonic.monotonic', return_value = 333)
     def testWhenROIisNone(self, monotonic_monotonic):
@@ -454,6 +524,7 @@ class TestFilterROI(unittest.TestCase):
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
         shotmgr.rcMgr = Mock(specs=['remapper'])
+        shotmgr.inputs = []
         shotmgr.buttonManager = Mock()
         #Run the shot constructor
         self.shot = follow.FollowShot(vehicle, shotmgr)
@@ -467,45 +538,48 @@ class TestFilterROI(unittest.TestCase):
         location_helpers.calcYawPitchFromLocations = Mock()
         location_helpers.calcYawPitchFromLocations.return_value = (0.0,0.0)
 
-        #roiDeltaTime
-        self.shot.roiDeltaTime = 0.04 # 25Hz (guess)
+        #roiAge
+        self.shot.roiAge = 0.0
 
         #init vars
         self.shot.roiVelocity = Vector3() 
 
-    def testFilteredROIQueueGreaterThanZero(self):
-        '''Test that beginFollow is called if roiVelocity is None and the filteredROIQueue is long enough'''
+    def testFirstROI(self):
+        '''Test that the first ROI is passed straight through and starts Look At Me'''
 
         self.shot.filterROI()
-        self.assertEqual(self.shot.filteredROI, self.shot.rawROI)
+        self.assertAlmostEqual(self.shot.filteredROI.lat, self.ROI.lat, 9)
+        self.assertAlmostEqual(self.shot.filteredROI.lon, self.ROI.lon, 9)
+        self.assertEqual(self.shot.filteredROI.alt, self.ROI.alt)
         self.assertEqual(self.shot.roiVelocity, Vector3(0,0,0))
-        assert self.shot.initState.called
-
+        self.shot.initState.assert_called_with(FOLLOW_LOOKAT)
+        assert not location_helpers.calcYawPitchFromLocations.called
 
-    def testNoQueue(self):
-        '''run through the method with empty queues (First item will be added in this queue)'''
-        # Filter gets skipped b/c queues are empty
-        # initialization block executes because queue now has 1 item
-        # end of method executes
+    def testFollowingROIs(self):
+        '''Test that later ROIs update velocity and pointing without re-initializing'''
 
-        self.shot.roiDeltaTime = None
-        self.shot.rawROIQueue = collections.deque(maxlen=MIN_RAW_ROI_QUEUE_LENGTH)
-        self.shot.filteredROIQueue = collections.deque(maxlen=MIN_FILT_ROI_QUEUE_LENGTH)
         self.shot.filterROI()
-        self.assertEqual(self.shot.filteredROI, self.shot.rawROI)
-        assert not location_helpers.calcYawPitchFromLocations.called
+        self.shot.initState.reset_mock()
+        self.shot.rawROI = LocationGlobalRelative(37.873268,-122.302062, 0)
+        self.shot.filterROI()
+        assert not self.shot.initState.called
+        assert location_helpers.calcYawPitchFromLocations.called
+        # moving north
+        self.assertTrue(self.shot.roiVelocity.x > 0.0)
 
+    def testROIIsLed(self):
+        '''Test that a moving ROI is led by its age'''
 
-    def testFilterFullQueue(self):
-        '''run through the method with a pre-filled queue'''
-        # filter executes because queues are full
-        # init is skipped. len(queue) > 1
-        # else block executes. len(queue) > 1 AND roiDeltaTime exists.
-        for i in range(5):
-            self.shot.rawROIQueue.append(self.ROI)
-            self.shot.filteredROIQueue.append(self.ROI)
         self.shot.filterROI()
-        assert location_helpers.calcYawPitchFromLocations.called
+        for i in range(1, 50):
+            self.shot.rawROI = LocationGlobalRelative(self.ROI.lat + i * 0.00001, self.ROI.lon, 0)
+            self.shot.roiAge = 0.0
+            self.shot.filterROI()
+        current = self.shot.filteredROI.lat
+
+        self.shot.roiAge = 1.0
+        self.shot.filterROI()
+        self.assertTrue(self.shot.filteredROI.lat > current)
 
     def testAccelerationLimitVariations_x(self):
         '''For different combinations of roiVeloctiy, translateVel, and components X,Y,Z: Verify that the code is executed and that the values are as expected.'''
@@ -568,19 +642,6 @@ class TestFilterROI(unittest.TestCase):
         assert self.shot.translateVel.z == 1.0 - ACCEL_PER_TICK
 
 
-    def testQueueLengthsAreNotTooLong(self):
-        '''make sure (at steady state) the length of the queue is correct.'''
-        # should be defined as
-        #   MIN_RAW_ROI_QUEUE_LENGTH = 5, MIN_FILT_ROI_QUEUE_LENGTH = 4
-
-        for i in range(10):
-            self.shot.rawROIQueue.append(self.ROI)
-            self.shot.filteredROIQueue.append(self.ROI)
-        self.shot.filterROI()
-        self.assertEqual(len(self.shot.rawROIQueue),5)
-        self.assertEqual(len(self.shot.filteredROIQueue),4)
-
-
 class TestInitControllersParent(unittest.TestCase):
     '''
     Parent class to enable testing of multiple methods
@@ -592,6 +653,7 @@ class TestInitControllersParent(unittest.TestCase):
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
         shotmgr.rcMgr = Mock(specs=['remapper'])
+        shotmgr.inputs = []
         
         #Run the shot constructor
         self.shot = follow.FollowShot(vehicle, shotmgr)
@@ -662,6 +724,7 @@ class TestUpdateMountStatus(unittest.TestCase):
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
         shotmgr.rcMgr = Mock(specs=['remapper'])
+        shotmgr.inputs = []
         
         #Run the shot constructor
         self.shot = follow.FollowShot(vehicle, shotmgr)
@@ -702,6 +765,7 @@ class TestManualPitch(unittest.TestCase):
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
         shotmgr.rcMgr = Mock(specs=['remapper'])
+        shotmgr.inputs = []
         
         #Run the shot constructor
         self.shot = follow.FollowShot(vehicle, shotmgr)
@@ -747,6 +811,7 @@ class TestManualYaw(unittest.TestCase):
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
         shotmgr.rcMgr = Mock(specs=['remapper'])
+        shotmgr.inputs = []
         
         #Run the shot constructor
         self.shot = follow.FollowShot(vehicle, shotmgr)
@@ -800,6 +865,7 @@ class TestHandleFreeLookPointing(unittest.TestCase):
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
         shotmgr.rcMgr = Mock(specs=['remapper'])
+        shotmgr.inputs = []
 
         #Run the shot constructor
         self.shot = follow.FollowShot(vehicle, shotmgr)
@@ -849,6 +915,7 @@ class testHandleLookAtMePointing(unittest.TestCase):
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
         shotmgr.rcMgr = Mock(specs=['remapper'])
+        shotmgr.inputs = []
 
         #Run the shot constructor
         self.shot = follow.FollowShot(vehicle, shotmgr)
@@ -0,0 +1,277 @@
+#  TestGeoFenceHelper.py
+#  shotmanager
+#
+#  Unit tests for the GeoFence math helpers.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import math
+import random
+import unittest
+
+from GeoFenceHelper import *
+from vector2 import Vector2
+
+# concave "U" shaped fence, first vertex repeated
+U_FENCE = [Vector2(0, 0), Vector2(30, 0), Vector2(30, 30), Vector2(20, 30), Vector2(20, 10),
+           Vector2(10, 10), Vector2(10, 30), Vector2(0, 30), Vector2(0, 0)]
+
+
+def noisyCircle(vertexCount, radius, seed):
+    '''Returns a closed, jagged, roughly circular polygon'''
+    rand = random.Random(seed)
+    polygon = []
+    for i in range(vertexCount):
+        angle = 2.0 * math.pi * i / vertexCount
+        r = radius * rand.uniform(0.8, 1.0)
+        polygon.append(Vector2(r * math.cos(angle), r * math.sin(angle)))
+    polygon.append(polygon[0])
+    return polygon
+
+
+class TestFenceGeometry(unittest.TestCase):
+    def setUp(self):
+        random.seed(1234)
+        self.geometry = FenceGeometry(U_FENCE)
+
+    def testPackedEdges(self):
+        '''Edges and squared lengths are precomputed'''
+        self.assertEqual(len(self.geometry.edgeX), len(U_FENCE) - 1)
+        self.assertEqual(self.geometry.edgeX[0], 30.)
+        self.assertEqual(self.geometry.edgeY[1], 30.)
+        self.assertEqual(self.geometry.edgeLength2[3], 400.)
+
+    def testBoundingBox(self):
+        self.assertEqual((self.geometry.minX, self.geometry.maxX, self.geometry.minY, self.geometry.maxY), (0., 30., 0., 30.))
+        self.assertTrue(self.geometry.boundingBoxContains(Vector2(15, 15)))
+        self.assertFalse(self.geometry.boundingBoxContains(Vector2(-1, 15)))
+        self.assertTrue(self.geometry.boundingBoxContains(Vector2(-1, 15), margin = 2.0))
+
+    def testImmutable(self):
+        '''Packed arrays can't be modified after they are built'''
+        with self.assertRaises(ValueError):
+            self.geometry.xs[0] = 5.
+
+    def testWindingNumberMatchesHelper(self):
+        '''Vectorized winding number agrees with isPointInPolygon'''
+        for i in range(500):
+            point = Vector2(random.uniform(-10, 40), random.uniform(-10, 40))
+            self.assertEqual(self.geometry.windingNumber(point), GeoFenceHelper.isPointInPolygon(point, U_FENCE))
+
+    def testWindingNumberIllegalPolygon(self):
+        geometry = FenceGeometry([Vector2(0, 0), Vector2(1, 0), Vector2(0, 0)])
+        self.assertIsNone(geometry.windingNumber(Vector2(0, 0)))
+        self.assertIsNone(geometry.windingNumbers([0.], [0.]))
+
+    def testWindingNumbersMatchHelper(self):
+        '''Array winding numbers agree with isPointInPolygon'''
+        points = [Vector2(random.uniform(-10, 40), random.uniform(-10, 40)) for i in range(500)]
+        # points on the vertex rows and edges too
+        points += [Vector2(v.x - 1.0, v.y) for v in U_FENCE] + [Vector2(15, 10), Vector2(30, 15)]
+        wns = self.geometry.windingNumbers([p.x for p in points], [p.y for p in points])
+        self.assertEqual(list(wns), [GeoFenceHelper.isPointInPolygon(p, U_FENCE) for p in points])
+
+    def testEdgesNearNeverMisses(self):
+        '''Every edge within the radius is returned'''
+        for i in range(200):
+            point = Vector2(random.uniform(-10, 40), random.uniform(-10, 40))
+            radius = random.uniform(0, 10)
+            near = self.geometry.edgesNear(point, radius)
+            for j in range(len(U_FENCE) - 1):
+                intersect, distance = GeoFenceHelper.closestPointToSegment(point, [U_FENCE[j], U_FENCE[j + 1]])
+                if distance <= radius:
+                    self.assertIn(j, near)
+
+    def testEdgesNearFarAway(self):
+        '''Nothing is returned well away from the fence'''
+        self.assertEqual(self.geometry.edgesNear(Vector2(100, 100), 5.), [])
+        self.assertEqual(self.geometry.edgesNear(Vector2(5, 20), 1.), [])
+
+    def testClosestCollisionMatchesHelper(self):
+        '''closestCollision over all edges agrees with closestCollisionVectorToPolygon'''
+        for i in range(200):
+            origin = Vector2(random.uniform(0, 30), random.uniform(0, 30))
+            ray = (origin, Vector2(origin.x + random.uniform(-5, 5), origin.y + random.uniform(-5, 5)))
+            expected = GeoFenceHelper.closestCollisionVectorToPolygon(ray, U_FENCE)
+            result = self.geometry.closestCollision(ray)
+            if expected is None:
+                self.assertIsNone(result)
+            else:
+                self.assertEqual(result[0], expected[0])
+                self.assertEqual(result[1], expected[1])
+
+    def testClosestCollisionSubset(self):
+        '''Only the requested edges are tested'''
+        ray = (Vector2(5, 5), Vector2(4, 5))
+        self.assertEqual(self.geometry.closestCollision(ray)[0], 7)
+        self.assertIsNone(self.geometry.closestCollision(ray, edges = [1, 2]))
+
+
+class TestEdgeGrid(unittest.TestCase):
+    def setUp(self):
+        random.seed(4321)
+        self.polygon = noisyCircle(1000, 500., 99)
+        self.geometry = FenceGeometry(self.polygon)
+
+    def testEveryEdgeIndexed(self):
+        '''Every edge is registered in the cells of both of its end points'''
+        grid = self.geometry.grid
+        for i in range(len(self.polygon) - 1):
+            for v in (self.polygon[i], self.polygon[i + 1]):
+                cell = (int(math.floor(v.x / grid.cellSize)), int(math.floor(v.y / grid.cellSize)))
+                self.assertIn(i, grid.cells[cell])
+
+    def testWindingNumberMatchesHelper(self):
+        '''Grid winding number agrees with isPointInPolygon on a 1000 vertex fence'''
+        for i in range(300):
+            point = Vector2(random.uniform(-550, 550), random.uniform(-550, 550))
+            self.assertEqual(self.geometry.windingNumber(point), GeoFenceHelper.isPointInPolygon(point, self.polygon))
+
+    def testWindingNumbersMatchHelper(self):
+        '''Array winding numbers agree with isPointInPolygon on a 1000 vertex fence'''
+        points = [Vector2(random.uniform(-550, 550), random.uniform(-550, 550)) for i in range(300)]
+        points += [Vector2(v.x - 1.0, v.y) for v in self.polygon[:100]]
+        wns = self.geometry.windingNumbers([p.x for p in points], [p.y for p in points])
+        self.assertEqual(list(wns), [GeoFenceHelper.isPointInPolygon(p, self.polygon) for p in points])
+
+    def testWindingNumberOnVertexRows(self):
+        '''Points level with vertices, where rounding matters most'''
+        for v in self.polygon[:100]:
+            point = Vector2(v.x - 1.0, v.y)
+            self.assertEqual(self.geometry.windingNumber(point), GeoFenceHelper.isPointInPolygon(point, self.polygon))
+
+    def testClosestPointMatchesHelper(self):
+        '''Grid closest point agrees with closestPointToPolygon, inside and outside the fence'''
+        for i in range(100):
+            point = Vector2(random.uniform(-1000, 1000), random.uniform(-1000, 1000))
+            expected = GeoFenceHelper.closestPointToPolygon(point, self.polygon)
+            result = self.geometry.closestPoint(point)
+            self.assertEqual((result.x, result.y), (expected.x, expected.y))
+
+    def testEdgesNearNeverMisses(self):
+        for i in range(50):
+            point = Vector2(random.uniform(-550, 550), random.uniform(-550, 550))
+            radius = random.uniform(0, 30)
+            near = self.geometry.edgesNear(point, radius)
+            for j in range(len(self.polygon) - 1):
+                intersect, distance = GeoFenceHelper.closestPointToSegment(point, [self.polygon[j], self.polygon[j + 1]])
+                if distance <= radius:
+                    self.assertIn(j, near)
+
+    def testLongEdges(self):
+        '''Long diagonal edges next to short ones are walked through every cell they cross'''
+        polygon = [Vector2(0, 0), Vector2(0.5, 0.1), Vector2(1, 0), Vector2(1000, 700), Vector2(0, 900), Vector2(0, 0)]
+        geometry = FenceGeometry(polygon)
+        for i in range(300):
+            point = Vector2(random.uniform(-10, 1010), random.uniform(-10, 910))
+            self.assertEqual(geometry.windingNumber(point), GeoFenceHelper.isPointInPolygon(point, polygon))
+            expected = GeoFenceHelper.closestPointToPolygon(point, polygon)
+            result = geometry.closestPoint(point)
+            self.assertEqual((result.x, result.y), (expected.x, expected.y))
+
+
+class TestEdgeKernels(unittest.TestCase):
+    '''The NumPy kernels must agree exactly with the scalar reference helpers'''
+
+    def setUp(self):
+        self.rand = random.Random(2468)
+
+    def randomPolygon(self):
+        '''Random closed polygon, snapped to a coarse grid so it has repeated vertices, parallel edges and ties'''
+        vertexCount = self.rand.randint(3, 40)
+        polygon = [Vector2(float(self.rand.randint(-10, 10)), float(self.rand.randint(-10, 10))) for i in range(vertexCount)]
+        polygon.append(polygon[0])
+        return polygon
+
+    def randomPoint(self):
+        if self.rand.random() < 0.3:
+            return Vector2(float(self.rand.randint(-12, 12)), float(self.rand.randint(-12, 12)))
+        return Vector2(self.rand.uniform(-12, 12), self.rand.uniform(-12, 12))
+
+    def packed(self, polygon):
+        return numpy.array([v.x for v in polygon]), numpy.array([v.y for v in polygon])
+
+    def scalarClosestPoint(self, point, polygon, edges):
+        best = None
+        for i in edges:
+            segIntersect, segDistance = GeoFenceHelper.closestPointToSegment(point, [polygon[i], polygon[i + 1]])
+            if best is None or segDistance < best[2]:
+                best = (i, segIntersect, segDistance)
+        return best
+
+    def testClosestPointAgrees(self):
+        for trial in range(300):
+            polygon = self.randomPolygon()
+            (xs, ys) = self.packed(polygon)
+            point = self.randomPoint()
+            expected = self.scalarClosestPoint(point, polygon, range(len(polygon) - 1))
+            result = GeoFenceHelper.closestPointToEdges(point, xs, ys)
+            self.assertEqual(result[0], expected[0])
+            self.assertEqual((result[1].x, result[1].y), (expected[1].x, expected[1].y))
+            self.assertEqual(result[2], expected[2])
+            closest = GeoFenceHelper.closestPointToPolygon(point, polygon)
+            self.assertEqual((result[1].x, result[1].y), (closest.x, closest.y))
+
+    def testClosestPointSubsetAgrees(self):
+        for trial in range(200):
+            polygon = self.randomPolygon()
+            (xs, ys) = self.packed(polygon)
+            point = self.randomPoint()
+            edges = sorted(self.rand.sample(range(len(polygon) - 1), self.rand.randint(1, len(polygon) - 1)))
+            expected = self.scalarClosestPoint(point, polygon, edges)
+            result = GeoFenceHelper.closestPointToEdges(point, xs, ys, edges)
+            self.assertEqual(result[0], expected[0])
+            self.assertEqual(result[2], expected[2])
+
+    def testClosestPointNoEdges(self):
+        (xs, ys) = self.packed(U_FENCE)
+        self.assertIsNone(GeoFenceHelper.closestPointToEdges(Vector2(0, 0), xs, ys, []))
+
+    def testCollisionAgrees(self):
+        for trial in range(500):
+            polygon = self.randomPolygon()
+            (xs, ys) = self.packed(polygon)
+            origin = self.randomPoint()
+            ray = (origin, self.randomPoint())
+            expected = GeoFenceHelper.closestCollisionVectorToPolygon(ray, polygon)
+            result = GeoFenceHelper.closestCollisionToEdges(ray, xs, ys)
+            if expected is None:
+                self.assertIsNone(result)
+            else:
+                self.assertEqual(result[0], expected[0])
+                self.assertEqual(result[1], expected[1])
+                self.assertEqual((result[2].x, result[2].y), (expected[2].x, expected[2].y))
+
+    def testCollisionSubsetAgrees(self):
+        for trial in range(200):
+            polygon = self.randomPolygon()
+            (xs, ys) = self.packed(polygon)
+            ray = (self.randomPoint(), self.randomPoint())
+            edges = sorted(self.rand.sample(range(len(polygon) - 1), self.rand.randint(1, len(polygon) - 1)))
+            expected = FenceGeometry(polygon).closestCollision(ray, edges[:EDGE_KERNEL_MIN_EDGES - 1])
+            result = GeoFenceHelper.closestCollisionToEdges(ray, xs, ys, edges[:EDGE_KERNEL_MIN_EDGES - 1])
+            if expected is None:
+                self.assertIsNone(result)
+            else:
+                self.assertEqual(result[:2], expected[:2])
+
+    def testFenceGeometryUsesKernels(self):
+        '''Large fences go through the kernels and still match the linear scans'''
+        polygon = noisyCircle(200, 100., 7)
+        geometry = FenceGeometry(polygon)
+        for trial in range(50):
+            ray = (Vector2(self.rand.uniform(-50, 50), self.rand.uniform(-50, 50)), Vector2(self.rand.uniform(-50, 50), self.rand.uniform(-50, 50)))
+            expected = GeoFenceHelper.closestCollisionVectorToPolygon(ray, polygon)
+            result = geometry.closestCollision(ray)
+            self.assertEqual(result[:2], expected[:2])
@@ -0,0 +1,268 @@
+#  TestGeoFenceManager.py
+#  shotmanager
+#
+#  Unit tests for the GeoFence manager.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+
+from dronekit import LocationGlobalRelative
+import mock
+from mock import Mock, patch
+
+from vector3 import Vector3
+
+import struct
+
+import numpy
+
+import GeoFenceManager
+import app_packet
+from cableController import CableController
+import location_helpers
+from shotManagerConstants import UPDATE_TIME
+import shots
+
+ORIGIN = LocationGlobalRelative(37.873168, -122.302062, 0)
+
+
+def squareCoords(frame, size, offset = 0.0):
+    '''Returns [lat, lng] pairs of a square with its corner at the frame origin'''
+    coords = []
+    for (north, east) in [(offset, offset), (size - offset, offset), (size - offset, size - offset), (offset, size - offset)]:
+        (lat, lon, alt) = frame.fromNED(north, east, 0)
+        coords.append([lat, lon])
+    return coords
+
+
+class GeoFenceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.shotMgr = Mock()
+        self.shotMgr.currentShot = shots.APP_SHOT_NONE
+        self.vehicle = self.shotMgr.vehicle
+        self.vehicle.armed = True
+        self.vehicle.system_status = 'ACTIVE'
+        self.vehicle.velocity = [0.0, 0.0, 0.0]
+        self.mgr = GeoFenceManager.GeoFenceManager(self.shotMgr)
+        self.mgr._stopAtCoord = Mock()
+
+        self.frame = location_helpers.LocalFrame(ORIGIN)
+        self.mgr._handleGeoFenceSetDataMessage([squareCoords(self.frame, 100.)], [squareCoords(self.frame, 100., 5.)], [0])
+
+    def addExclusiveZone(self):
+        # 100m inclusive fence with a 20m exclusive zone in the middle, grown by 5m for its subpolygon
+        zone = [[self.frame.fromNED(n, e, 0)[0], self.frame.fromNED(n, e, 0)[1]] for (n, e) in [(40, 40), (60, 40), (60, 60), (40, 60)]]
+        subZone = [[self.frame.fromNED(n, e, 0)[0], self.frame.fromNED(n, e, 0)[1]] for (n, e) in [(35, 35), (65, 35), (65, 65), (35, 65)]]
+        self.shotMgr.appMgr.sendPacket.reset_mock()
+        self.mgr._handleGeoFenceSetDataMessage([squareCoords(self.frame, 100.), zone], [squareCoords(self.frame, 100., 5.), subZone], [0, 1])
+
+    def setVehicle(self, north, east, velocity = (0.0, 0.0)):
+        (lat, lon, alt) = self.frame.fromNED(north, east, -10.)
+        self.vehicle.location.global_relative_frame = LocationGlobalRelative(lat, lon, alt)
+        self.vehicle.velocity = [velocity[0], velocity[1], 0.0]
+
+
+class TestSetData(GeoFenceTestCase):
+    def testGeometryBuilt(self):
+        '''Fence geometry is precomputed when the fence is set'''
+        fence = self.mgr.polygons[0]
+        self.assertEqual(len(fence.geometry), 5)
+        self.assertAlmostEqual(fence.geometry.maxX, 100., places = 3)
+        self.assertAlmostEqual(fence.subGeometry.minX, 5., places = 3)
+
+    def testUpdateFirstVertex(self):
+        '''Updating the first vertex also moves the repeated last vertex and rebuilds the geometry'''
+        (lat, lon, alt) = self.frame.fromNED(-20., 0., 0)
+        (subLat, subLon, alt) = self.frame.fromNED(-15., 5., 0)
+        oldGeometry = self.mgr.polygons[0].geometry
+        self.mgr._handleGeoFenceUpdateMessage(0, 0, LocationGlobalRelative(lat, lon, 0), LocationGlobalRelative(subLat, subLon, 0))
+        fence = self.mgr.polygons[0]
+        self.assertIsNot(fence.geometry, oldGeometry)
+        self.assertAlmostEqual(fence.geometry.polygon[0].x, -20., places = 3)
+        self.assertAlmostEqual(fence.geometry.polygon[-1].x, -20., places = 3)
+        self.assertAlmostEqual(fence.geometry.minX, -20., places = 3)
+
+    def testFenceVersion(self):
+        '''Setting, updating and clearing the fences each bump the version'''
+        version = self.mgr.fenceVersion
+        (lat, lon, alt) = self.frame.fromNED(-20., 0., 0)
+        self.mgr._handleGeoFenceUpdateMessage(0, 1, LocationGlobalRelative(lat, lon, 0), LocationGlobalRelative(lat, lon, 0))
+        self.assertEqual(self.mgr.fenceVersion, version + 1)
+        self.addExclusiveZone()
+        self.assertEqual(self.mgr.fenceVersion, version + 2)
+        self.mgr.clearGeoFence()
+        self.assertEqual(self.mgr.fenceVersion, version + 3)
+
+    def testUpdateIllegalVertex(self):
+        '''Updating a vertex that doesn't exist is rejected'''
+        self.shotMgr.appMgr.sendPacket.reset_mock()
+        self.mgr._handleGeoFenceUpdateMessage(0, 4, ORIGIN, ORIGIN)
+        self.shotMgr.appMgr.sendPacket.assert_called_with(struct.pack('<IIH?', app_packet.GEOFENCE_SET_ACK, 3, 0, False))
+
+    def testUpdateIllegalPolygon(self):
+        self.shotMgr.appMgr.sendPacket.reset_mock()
+        self.mgr._handleGeoFenceUpdateMessage(1, 0, ORIGIN, ORIGIN)
+        self.shotMgr.appMgr.sendPacket.assert_called_with(struct.pack('<IIH?', app_packet.GEOFENCE_SET_ACK, 3, 0, False))
+
+
+class TestActivateGeoFence(GeoFenceTestCase):
+    @patch('monotonic.monotonic', return_value = 10.0)
+    def testOutsideFence(self, mockMonotonic):
+        '''Vehicle outside of the fence is pulled back in'''
+        self.setVehicle(-10., 50.)
+        self.mgr.activateGeoFenceIfNecessary()
+        self.assertEqual(self.mgr._stopAtCoord.call_count, 1)
+
+    @patch('monotonic.monotonic')
+    def testRateLimited(self, mockMonotonic):
+        '''Checks run at most once per UPDATE_TIME'''
+        self.setVehicle(-10., 50.)
+        mockMonotonic.return_value = 10.0
+        self.mgr.activateGeoFenceIfNecessary()
+        mockMonotonic.return_value = 10.0 + UPDATE_TIME / 2.
+        self.mgr.activateGeoFenceIfNecessary()
+        self.assertEqual(self.mgr._stopAtCoord.call_count, 1)
+        mockMonotonic.return_value = 10.0 + UPDATE_TIME * 1.5
+        self.mgr.activateGeoFenceIfNecessary()
+        self.assertEqual(self.mgr._stopAtCoord.call_count, 2)
+
+    @patch('monotonic.monotonic', return_value = 10.0)
+    def testFarFromEdgesSkipsRayCast(self, mockMonotonic):
+        '''No collision test is run when no edge is within reach'''
+        self.setVehicle(50., 50., (3.0, 0.0))
+        fence = self.mgr.polygons[0]
+        fence.geometry.closestCollision = Mock()
+        self.mgr.activateGeoFenceIfNecessary()
+        self.assertFalse(fence.geometry.closestCollision.called)
+        self.assertFalse(self.mgr._stopAtCoord.called)
+
+    @patch('monotonic.monotonic', return_value = 10.0)
+    def testAboutToCollide(self, mockMonotonic):
+        '''Vehicle flying fast at a nearby edge is stopped'''
+        self.setVehicle(95., 50., (8.0, 0.0))
+        self.mgr.activateGeoFenceIfNecessary()
+        self.assertEqual(self.mgr._stopAtCoord.call_count, 1)
+        target = self.mgr._stopAtCoord.call_args[0][0]
+        (north, east, down) = self.frame.toNED(target)
+        self.assertAlmostEqual(north, 95., places = 3)
+
+    @patch('monotonic.monotonic', return_value = 10.0)
+    def testNearEdgeSlow(self, mockMonotonic):
+        '''Vehicle creeping towards a nearby edge is left alone'''
+        self.setVehicle(90., 50., (1.0, 0.0))
+        self.mgr.activateGeoFenceIfNecessary()
+        self.assertFalse(self.mgr._stopAtCoord.called)
+
+
+class TestMultipleFences(GeoFenceTestCase):
+    def setUp(self):
+        super(TestMultipleFences, self).setUp()
+        self.addExclusiveZone()
+
+    def testAllFencesAccepted(self):
+        self.assertEqual(len(self.mgr.polygons), 2)
+        self.shotMgr.appMgr.sendPacket.assert_called_with(struct.pack('<IIH?', app_packet.GEOFENCE_SET_ACK, 3, 2, True))
+
+    def testIllegalSecondFenceRejected(self):
+        '''Every polygon is validated, not just the first'''
+        self.mgr._handleGeoFenceSetDataMessage([squareCoords(self.frame, 100.), [[37.0, -122.0]]], [squareCoords(self.frame, 100., 5.), [[37.0, -122.0]]], [0, 1])
+        self.assertEqual(len(self.mgr.polygons), 0)
+
+    @patch('monotonic.monotonic', return_value = 10.0)
+    def testInsideExclusiveZone(self, mockMonotonic):
+        '''Vehicle inside a stay out zone is pushed out to its subpolygon'''
+        self.setVehicle(50., 42.)
+        self.mgr.activateGeoFenceIfNecessary()
+        self.assertEqual(self.mgr._stopAtCoord.call_count, 1)
+        (north, east, down) = self.frame.toNED(self.mgr._stopAtCoord.call_args[0][0])
+        self.assertAlmostEqual(north, 50., places = 3)
+        self.assertAlmostEqual(east, 35., places = 3)
+
+    @patch('monotonic.monotonic', return_value = 10.0)
+    def testBetweenFences(self, mockMonotonic):
+        '''Vehicle hovering between the zone and the outer fence is left alone'''
+        self.setVehicle(20., 20.)
+        self.mgr.activateGeoFenceIfNecessary()
+        self.assertFalse(self.mgr._stopAtCoord.called)
+
+    @patch('monotonic.monotonic', return_value = 10.0)
+    def testAboutToCollideWithZone(self, mockMonotonic):
+        '''Vehicle flying fast at the exclusive zone is stopped on its subpolygon'''
+        self.setVehicle(30., 50., (8.0, 0.0))
+        self.mgr.activateGeoFenceIfNecessary()
+        self.assertEqual(self.mgr._stopAtCoord.call_count, 1)
+        (north, east, down) = self.frame.toNED(self.mgr._stopAtCoord.call_args[0][0])
+        self.assertAlmostEqual(north, 35., places = 3)
+        self.assertAlmostEqual(east, 50., places = 3)
+
+
+class TestTrajectoryCheck(unittest.TestCase):
+    def setUp(self):
+        ps = numpy.linspace(0., 1., 11)
+        breached = numpy.array([False, False, False, True, True, False, False, False, True, False, False])
+        self.check = GeoFenceManager.TrajectoryCheck(ps, breached, 200.)
+
+    def testFirstBreach(self):
+        self.assertAlmostEqual(self.check.firstBreachP(), 0.3)
+        self.assertAlmostEqual(self.check.firstBreachArcLength(), 60.)
+
+    def testClear(self):
+        check = GeoFenceManager.TrajectoryCheck(numpy.linspace(0., 1., 11), numpy.zeros(11, dtype = bool), 200.)
+        self.assertTrue(check.isClear())
+        self.assertIsNone(check.firstBreachArcLength())
+        self.assertEqual(check.reachableRange(0.5), (0., 1.))
+
+    def testReachableRange(self):
+        '''The clear stretch around p is bounded by the neighbouring breaches'''
+        self.assertEqual(self.check.reachableRange(0.), (0., 0.2))
+        (minP, maxP) = self.check.reachableRange(0.61)
+        self.assertAlmostEqual(minP, 0.5)
+        self.assertAlmostEqual(maxP, 0.7)
+        self.assertEqual(self.check.reachableRange(1.)[1], 1.)
+
+    def testReachableRangeBreached(self):
+        self.assertIsNone(self.check.reachableRange(0.38))
+
+
+class TestCheckCable(GeoFenceTestCase):
+    def setUp(self):
+        super(TestCheckCable, self).setUp()
+        self.addExclusiveZone()
+
+    def makeCable(self, points):
+        cable = CableController(points, 8., 1., 1., 1., 0.7, None)
+        cable.killCurvatureMapThread()
+        cable.curvatureMapThread.join()
+        return cable
+
+    def testNoFences(self):
+        self.mgr._reset()
+        self.assertIsNone(self.mgr.checkCable(Mock(), self.frame))
+
+    def testCableThroughZone(self):
+        '''A cable crossing the exclusive zone breaches at its subpolygon'''
+        cable = self.makeCable([Vector3(50., 10., -10.), Vector3(50., 50., -10.), Vector3(50., 90., -10.)])
+        check = self.mgr.checkCable(cable, self.frame)
+        # subpolygon edge is 25 m along the 80 m cable
+        self.assertAlmostEqual(check.firstBreachArcLength(), 25., delta = 1.0)
+        (minP, maxP) = check.reachableRange(0.)
+        self.assertEqual(minP, 0.)
+        self.assertAlmostEqual(maxP * 80., 25., delta = 1.0)
+        (minP, maxP) = check.reachableRange(1.)
+        self.assertAlmostEqual(minP * 80., 55., delta = 1.0)
+
+    def testClearCable(self):
+        cable = self.makeCable([Vector3(20., 10., -10.), Vector3(20., 50., -10.), Vector3(20., 90., -10.)])
+        self.assertTrue(self.mgr.checkCable(cable, self.frame).isClear())
@@ -58,7 +58,7 @@ class TestGetResponseCallback(unittest.TestCase):
         message = (mavutil.mavlink.GOPRO_COMMAND_CAPTURE_MODE, mavutil.mavlink.GOPRO_REQUEST_SUCCESS, (CAPTURE_MODE_BURST, 0, 0, 0))
         self.mgr.get_response_callback('vehicle','name', message)
         self.assertEqual( self.mgr.captureMode, CAPTURE_MODE_BURST)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_CAPTURE_MODE, False)
         self.mgr.sendState.assert_called_with()
 
     def testBatteryResponse(self):
@@ -66,14 +66,14 @@ class TestGetResponseCallback(unittest.TestCase):
         message = (mavutil.mavlink.GOPRO_COMMAND_BATTERY, mavutil.mavlink.GOPRO_REQUEST_SUCCESS, (72, 0, 0, 0))
         self.mgr.get_response_callback('vehicle','name', message)
         self.assertEqual( self.mgr.battery, 72)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_BATTERY, False)
 
     def testModelResponse(self):
         """ Test that model response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_MODEL, mavutil.mavlink.GOPRO_REQUEST_SUCCESS, (MODEL_HERO3PLUS_BLACK, 0, 0, 0))
         self.mgr.get_response_callback('vehicle','name', message)
         self.assertEqual( self.mgr.model, MODEL_HERO3PLUS_BLACK)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_MODEL, False)
         self.mgr.sendState.assert_called_with()
 
     def testVideoSettingsResponse(self):
@@ -84,7 +84,7 @@ class TestGetResponseCallback(unittest.TestCase):
         self.assertEqual(self.mgr.videoFrameRate, mavutil.mavlink.GOPRO_FRAME_RATE_60)
         self.assertEqual(self.mgr.videoFieldOfView, mavutil.mavlink.GOPRO_FIELD_OF_VIEW_WIDE)
         self.assertEqual(self.mgr.videoFormat, VIDEO_FORMAT_NTSC)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_VIDEO_SETTINGS, False)
         self.mgr.sendState.assert_called_with()
 
 class TestSetResponseCallback(unittest.TestCase):
@@ -99,87 +99,87 @@ class TestSetResponseCallback(unittest.TestCase):
         """ Test that power on response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_POWER, mavutil.mavlink.GOPRO_REQUEST_SUCCESS)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_POWER, True)
 
     def testCaptureModeResponse(self):
         """ Test that capture mode response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_CAPTURE_MODE, mavutil.mavlink.GOPRO_REQUEST_SUCCESS)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_CAPTURE_MODE, True)
 
     def testShutterResponse(self):
         """ Test that shutter response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_SHUTTER, mavutil.mavlink.GOPRO_REQUEST_SUCCESS)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_SHUTTER, True)
 
     def testVideoSettingsResponse(self):
         """ Test that video settings response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_VIDEO_SETTINGS, mavutil.mavlink.GOPRO_REQUEST_SUCCESS)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_VIDEO_SETTINGS, True)
 
     def testVideoLowLightResponse(self):
         """ Test that video protune response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_LOW_LIGHT, mavutil.mavlink.GOPRO_REQUEST_SUCCESS)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_LOW_LIGHT, True)
 
     def testPhotoResolutionResponse(self):
         """ Test that photo resolution response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_PHOTO_RESOLUTION, mavutil.mavlink.GOPRO_REQUEST_SUCCESS)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PHOTO_RESOLUTION, True)
 
     def testPhotoBurstRateResponse(self):
         """ Test that photo burst rate response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_PHOTO_BURST_RATE, mavutil.mavlink.GOPRO_REQUEST_SUCCESS)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PHOTO_BURST_RATE, True)
 
     def testVideoProtuneResponse(self):
         """ Test that video protune response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_PROTUNE, mavutil.mavlink.GOPRO_REQUEST_SUCCESS)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PROTUNE, True)
 
     def testVideoProtuneWhiteBalanceResponse(self):
         """ Test that video protune white balance response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_PROTUNE_WHITE_BALANCE, mavutil.mavlink.GOPRO_REQUEST_SUCCESS)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PROTUNE_WHITE_BALANCE, True)
 
     def testVideoProtuneColorResponse(self):
         """ Test that video protune color response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_PROTUNE_COLOUR, mavutil.mavlink.GOPRO_REQUEST_SUCCESS)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PROTUNE_COLOUR, True)
 
     def testVideoProtuneGainResponse(self):
         """ Test that video protune gain response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_PROTUNE_GAIN, mavutil.mavlink.GOPRO_REQUEST_SUCCESS)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PROTUNE_GAIN, True)
 
     def testVideoProtuneSharpnessResponse(self):
         """ Test that video protune sharpness response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_PROTUNE_SHARPNESS, mavutil.mavlink.GOPRO_REQUEST_SUCCESS)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PROTUNE_SHARPNESS, True)
 
     def testVideoProtuneExposureResponse(self):
         """ Test that video protune exposure response works """
         message = (mavutil.mavlink.GOPRO_COMMAND_PROTUNE_EXPOSURE, mavutil.mavlink.GOPRO_REQUEST_SUCCESS)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PROTUNE_EXPOSURE, True)
 
     def testFailedResponse(self):
         """ Test that failed request sends state back to client """
         self.mgr.sendState = Mock()
         message = (mavutil.mavlink.GOPRO_COMMAND_VIDEO_SETTINGS, mavutil.mavlink.GOPRO_REQUEST_FAILED)
         self.mgr.set_response_callback('vehicle','name', message)
-        self.mgr.sendState.assert_called_with()
-        self.mgr.processMsgQueue.assert_called_with()
+        self.mgr.sendState.assert_called_with(full = True)
+        self.mgr.processMsgQueue.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_VIDEO_SETTINGS, True)
 
 
 class TestSendGoProRequest(unittest.TestCase):
@@ -198,7 +198,7 @@ class TestSendGoProRequest(unittest.TestCase):
 
         self.v.message_factory.gopro_get_request_encode.assert_called_with(0, mavutil.mavlink.MAV_COMP_ID_GIMBAL,
                             mavutil.mavlink.GOPRO_COMMAND_BATTERY)
-        self.mgr.queueMsg.assert_called_with(7)
+        self.mgr.queueMsg.assert_called_with(7, mavutil.mavlink.GOPRO_COMMAND_BATTERY)
 
     def testInvalidRequest(self):
         """ Test sending an invalid request """
@@ -223,7 +223,7 @@ class TestSendGoProCommand(unittest.TestCase):
 
         self.v.message_factory.gopro_set_request_encode.assert_called_with(0, mavutil.mavlink.MAV_COMP_ID_GIMBAL,
                             mavutil.mavlink.GOPRO_COMMAND_CAPTURE_MODE, (1, 0, 0, 0))
-        self.mgr.queueMsg.assert_called_with(3)
+        self.mgr.queueMsg.assert_called_with(3, mavutil.mavlink.GOPRO_COMMAND_CAPTURE_MODE, True)
 
     def testSendShutterTo1(self):
         """ Test sending a shutter command with value 1 """
@@ -232,7 +232,7 @@ class TestSendGoProCommand(unittest.TestCase):
 
         self.v.message_factory.gopro_set_request_encode.assert_called_with(0, mavutil.mavlink.MAV_COMP_ID_GIMBAL,
                             mavutil.mavlink.GOPRO_COMMAND_SHUTTER, (1, 0, 0, 0))
-        self.mgr.queueMsg.assert_called_with(3)
+        self.mgr.queueMsg.assert_called_with(3, mavutil.mavlink.GOPRO_COMMAND_SHUTTER, True)
 
     def testSendVideoSettingsChange(self):
         """ Test sending a video settings command """
@@ -242,7 +242,7 @@ class TestSendGoProCommand(unittest.TestCase):
 
         self.v.message_factory.gopro_set_request_encode.assert_called_with(0, mavutil.mavlink.MAV_COMP_ID_GIMBAL,
                             mavutil.mavlink.GOPRO_COMMAND_VIDEO_SETTINGS, (0, 3, 7, 1))
-        self.mgr.queueMsg.assert_called_with(3)
+        self.mgr.queueMsg.assert_called_with(3, mavutil.mavlink.GOPRO_COMMAND_VIDEO_SETTINGS, True)
         self.mgr.sendGoProRequest.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_VIDEO_SETTINGS)
 
     def testSendVideoLowLight(self):
@@ -253,7 +253,7 @@ class TestSendGoProCommand(unittest.TestCase):
 
         self.v.message_factory.gopro_set_request_encode.assert_called_with(0, mavutil.mavlink.MAV_COMP_ID_GIMBAL,
                             mavutil.mavlink.GOPRO_COMMAND_LOW_LIGHT, (1, 0, 0, 0))
-        self.mgr.queueMsg.assert_called_with(3)
+        self.mgr.queueMsg.assert_called_with(3, mavutil.mavlink.GOPRO_COMMAND_LOW_LIGHT, True)
         self.mgr.sendGoProRequest.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_LOW_LIGHT)
 
     def testSendPhotoResolution(self):
@@ -264,7 +264,7 @@ class TestSendGoProCommand(unittest.TestCase):
 
         self.v.message_factory.gopro_set_request_encode.assert_called_with(0, mavutil.mavlink.MAV_COMP_ID_GIMBAL,
                             mavutil.mavlink.GOPRO_COMMAND_PHOTO_RESOLUTION, (1, 0, 0, 0))
-        self.mgr.queueMsg.assert_called_with(3)
+        self.mgr.queueMsg.assert_called_with(3, mavutil.mavlink.GOPRO_COMMAND_PHOTO_RESOLUTION, True)
         self.mgr.sendGoProRequest.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PHOTO_RESOLUTION)
 
     def testSendPhotoBurstRate(self):
@@ -276,7 +276,7 @@ class TestSendGoProCommand(unittest.TestCase):
 
         self.v.message_factory.gopro_set_request_encode.assert_called_with(0, mavutil.mavlink.MAV_COMP_ID_GIMBAL,
                             mavutil.mavlink.GOPRO_COMMAND_PHOTO_BURST_RATE, (1, 0, 0, 0))
-        self.mgr.queueMsg.assert_called_with(3)
+        self.mgr.queueMsg.assert_called_with(3, mavutil.mavlink.GOPRO_COMMAND_PHOTO_BURST_RATE, True)
         self.mgr.sendGoProRequest.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PHOTO_BURST_RATE)
 
     def testSendVideoProtune(self):
@@ -287,7 +287,7 @@ class TestSendGoProCommand(unittest.TestCase):
 
         self.v.message_factory.gopro_set_request_encode.assert_called_with(0, mavutil.mavlink.MAV_COMP_ID_GIMBAL,
                             mavutil.mavlink.GOPRO_COMMAND_PROTUNE, (1, 0, 0, 0))
-        self.mgr.queueMsg.assert_called_with(3)
+        self.mgr.queueMsg.assert_called_with(3, mavutil.mavlink.GOPRO_COMMAND_PROTUNE, True)
         self.mgr.sendGoProRequest.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PROTUNE)
 
 
@@ -299,7 +299,7 @@ class TestSendGoProCommand(unittest.TestCase):
 
         self.v.message_factory.gopro_set_request_encode.assert_called_with(0, mavutil.mavlink.MAV_COMP_ID_GIMBAL,
                             mavutil.mavlink.GOPRO_COMMAND_PROTUNE_WHITE_BALANCE, (1, 0, 0, 0))
-        self.mgr.queueMsg.assert_called_with(3)
+        self.mgr.queueMsg.assert_called_with(3, mavutil.mavlink.GOPRO_COMMAND_PROTUNE_WHITE_BALANCE, True)
         self.mgr.sendGoProRequest.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PROTUNE_WHITE_BALANCE)
 
 
@@ -311,7 +311,7 @@ class TestSendGoProCommand(unittest.TestCase):
 
         self.v.message_factory.gopro_set_request_encode.assert_called_with(0, mavutil.mavlink.MAV_COMP_ID_GIMBAL,
                             mavutil.mavlink.GOPRO_COMMAND_PROTUNE_COLOUR, (1, 0, 0, 0))
-        self.mgr.queueMsg.assert_called_with(3)
+        self.mgr.queueMsg.assert_called_with(3, mavutil.mavlink.GOPRO_COMMAND_PROTUNE_COLOUR, True)
         self.mgr.sendGoProRequest.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PROTUNE_COLOUR)
 
 
@@ -323,7 +323,7 @@ class TestSendGoProCommand(unittest.TestCase):
 
         self.v.message_factory.gopro_set_request_encode.assert_called_with(0, mavutil.mavlink.MAV_COMP_ID_GIMBAL,
                             mavutil.mavlink.GOPRO_COMMAND_PROTUNE_GAIN, (1, 0, 0, 0))
-        self.mgr.queueMsg.assert_called_with(3)
+        self.mgr.queueMsg.assert_called_with(3, mavutil.mavlink.GOPRO_COMMAND_PROTUNE_GAIN, True)
         self.mgr.sendGoProRequest.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PROTUNE_GAIN)
 
     def testSendVideoProtuneSharpness(self):
@@ -334,7 +334,7 @@ class TestSendGoProCommand(unittest.TestCase):
 
         self.v.message_factory.gopro_set_request_encode.assert_called_with(0, mavutil.mavlink.MAV_COMP_ID_GIMBAL,
                             mavutil.mavlink.GOPRO_COMMAND_PROTUNE_SHARPNESS, (1, 0, 0, 0))
-        self.mgr.queueMsg.assert_called_with(3)
+        self.mgr.queueMsg.assert_called_with(3, mavutil.mavlink.GOPRO_COMMAND_PROTUNE_SHARPNESS, True)
         self.mgr.sendGoProRequest.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PROTUNE_SHARPNESS)
 
 
@@ -346,7 +346,7 @@ class TestSendGoProCommand(unittest.TestCase):
 
         self.v.message_factory.gopro_set_request_encode.assert_called_with(0, mavutil.mavlink.MAV_COMP_ID_GIMBAL,
                             mavutil.mavlink.GOPRO_COMMAND_PROTUNE_EXPOSURE, (1, 0, 0, 0))
-        self.mgr.queueMsg.assert_called_with(3)
+        self.mgr.queueMsg.assert_called_with(3, mavutil.mavlink.GOPRO_COMMAND_PROTUNE_EXPOSURE, True)
         self.mgr.sendGoProRequest.assert_called_with(mavutil.mavlink.GOPRO_COMMAND_PROTUNE_EXPOSURE)
 
     def testInvalidCommand(self):
@@ -423,37 +423,59 @@ class TestQueueMsg(unittest.TestCase):
 
     def testQueueMsg(self):
         """ Test queuing up a message """
-        self.mgr.isGoproBusy = True
-        self.mgr.lastRequestSent = monotonic.monotonic()
+        self.mgr.queueMsg(3)
         self.mgr.queueMsg(4)
-        self.assertFalse( self.mgr.msgQueue.empty() )
-        self.assertTrue(self.mgr.isGoproBusy)
+        self.assertEqual( len(self.mgr.scheduler), 1 )
+        self.assertTrue(self.mgr.scheduler.busy())
 
     def testQueueMultiMsg(self):
         """ Test queuing up multiple messages """
         for i in range(10):
             self.mgr.queueMsg(i)
 
-        self.assertEqual( self.mgr.msgQueue.qsize(), 9)
+        self.assertEqual( len(self.mgr.scheduler), 9)
 
     def testQueueSend(self):
         """ if the queue is not busy, we start sending a message instead of queuing up """
         self.mgr.queueMsg(37)
-        self.assertTrue( self.mgr.msgQueue.empty() )
+        self.assertEqual( len(self.mgr.scheduler), 0 )
         self.v.send_mavlink.assert_called_with(37)
 
-    def testQueueFlushQueue(self):
-        """ Test queue is flushed with outstanding message sent more than 2 seconds ago """
+    def testCoalesceSets(self):
+        """ A newer set for a waiting command replaces it """
+        self.mgr.queueMsg(1, mavutil.mavlink.GOPRO_COMMAND_BATTERY)
+        self.mgr.queueMsg(2, mavutil.mavlink.GOPRO_COMMAND_PROTUNE, True)
+        self.mgr.queueMsg(3, mavutil.mavlink.GOPRO_COMMAND_PROTUNE, True)
+        self.assertEqual( len(self.mgr.scheduler), 1 )
+        self.mgr.processMsgQueue()
+        self.v.send_mavlink.assert_called_with(3)
+
+    def testShutterFirst(self):
+        """ The shutter goes ahead of waiting settings """
+        self.mgr.queueMsg(1, mavutil.mavlink.GOPRO_COMMAND_BATTERY)
+        self.mgr.queueMsg(2, mavutil.mavlink.GOPRO_COMMAND_PROTUNE, True)
+        self.mgr.queueMsg(3, mavutil.mavlink.GOPRO_COMMAND_SHUTTER, True)
+        self.mgr.processMsgQueue()
+        self.v.send_mavlink.assert_called_with(3)
+
+    def testQueueTimeoutDropsOneRequest(self):
+        """ An unanswered request is resent, then dropped without flushing the rest of the queue """
         self.mgr.sendState = Mock()
-        self.mgr.isGoproBusy = True
-        self.mgr.lastRequestSent = monotonic.monotonic()
         self.mgr.queueMsg(1)
         self.mgr.queueMsg(2)
-        self.assertEqual(self.mgr.msgQueue.qsize(), 2)
-        self.mgr.lastRequestSent = monotonic.monotonic() - 3.0
         self.mgr.queueMsg(3)
-        self.assertTrue(self.mgr.msgQueue.empty)
-        self.mgr.sendState.assert_called_with()
+        start = monotonic.monotonic()
+        for attempt in range(GoProManager.GoProScheduler.GOPRO_REQUEST_RETRIES):
+            with patch('monotonic.monotonic', return_value = start + (attempt + 1) * 1.5):
+                self.mgr.Tick()
+            self.v.send_mavlink.assert_called_with(1)
+        self.assertFalse(self.mgr.sendState.called)
+
+        with patch('monotonic.monotonic', return_value = start + 10.0):
+            self.mgr.Tick()
+        self.v.send_mavlink.assert_called_with(2)
+        self.assertEqual( len(self.mgr.scheduler), 1 )
+        self.mgr.sendState.assert_called_with(full = True)
 
 class TestProcessMsgQueue(unittest.TestCase):
     def setUp(self):
@@ -464,20 +486,19 @@ class TestProcessMsgQueue(unittest.TestCase):
 
     def testSendNextMessage(self):
         """ send the next message in the queue """
-        self.mgr.isGoproBusy = True
-        self.mgr.lastRequestSent = monotonic.monotonic()
+        self.mgr.queueMsg(4)
         self.mgr.queueMsg(3)
         self.mgr.queueMsg(2)
         self.mgr.queueMsg(1)
         self.mgr.processMsgQueue()
         self.v.send_mavlink.assert_called_with(3)
-        self.assertEqual( self.mgr.msgQueue.qsize(), 2)
+        self.assertEqual( len(self.mgr.scheduler), 2)
 
     def testQueueisEmpty(self):
         """ if our queue is empty, set ourselves to not busy """
-        self.mgr.isGoproBusy = True
+        self.mgr.queueMsg(1)
         self.mgr.processMsgQueue()
-        self.assertFalse( self.mgr.isGoproBusy )
+        self.assertFalse( self.mgr.scheduler.busy() )
 
 class TestHandlePacket(unittest.TestCase):
     def setUp(self):
@@ -511,7 +532,7 @@ class TestHandlePacket(unittest.TestCase):
         pkt = struct.pack('<')
         self.mgr.sendState = Mock()
         self.mgr.handlePacket(app_packet.GOPRO_REQUEST_STATE, pkt)
-        self.mgr.sendState.assert_called_with()
+        self.mgr.sendState.assert_called_with(full = True)
 
     def testSetExtendedRequest(self):
         """ Handle extended payload settings request """
@@ -589,6 +610,57 @@ class TestSendState(unittest.TestCase):
         call2 = call(pkt2)
         self.mgr.shotMgr.appMgr.sendPacket.assert_has_calls([call1, call2])
 
+    def testSendStateWithoutDeltas(self):
+        """ Apps that haven't asked for deltas always get the full state """
+        self.mgr.sendState()
+        self.mgr.shotMgr.appMgr.sendPacket.reset_mock()
+        self.mgr.sendState()
+        self.assertEqual(self.mgr.shotMgr.appMgr.sendPacket.call_count, 2)
+
+    def testSendDelta(self):
+        """ Only the changed fields are sent once the app accepts deltas """
+        self.mgr.deltasEnabled = True
+        self.mgr.sendState()
+        self.assertEqual(self.mgr.shotMgr.appMgr.sendPacket.call_count, 2)
+        self.mgr.shotMgr.appMgr.sendPacket.reset_mock()
+
+        self.mgr.isRecording = True
+        self.mgr.videoProtuneGain = 3
+        self.mgr.sendState()
+        pkt = struct.pack('<IIBBBB', app_packet.GOPRO_STATE_DELTA, 4, 3, 1, 15, 3)
+        self.mgr.shotMgr.appMgr.sendPacket.assert_called_once_with(pkt)
+
+    def testNoChangeNoDelta(self):
+        """ Nothing is sent if nothing changed """
+        self.mgr.deltasEnabled = True
+        self.mgr.sendState()
+        self.mgr.shotMgr.appMgr.sendPacket.reset_mock()
+        self.mgr.sendState()
+        self.assertFalse(self.mgr.shotMgr.appMgr.sendPacket.called)
+
+    def testFullOnRequest(self):
+        """ A full snapshot can be forced """
+        self.mgr.deltasEnabled = True
+        self.mgr.sendState()
+        self.mgr.shotMgr.appMgr.sendPacket.reset_mock()
+        self.mgr.sendState(full = True)
+        self.assertEqual(self.mgr.shotMgr.appMgr.sendPacket.call_count, 2)
+
+    def testEnableDeltas(self):
+        """ Enabling deltas sends the full state they will apply to """
+        self.mgr.handlePacket(app_packet.GOPRO_SET_DELTA_ENABLED, struct.pack('<I', 1))
+        self.assertTrue(self.mgr.deltasEnabled)
+        self.assertEqual(self.mgr.shotMgr.appMgr.sendPacket.call_count, 2)
+
+    def testAppConnected(self):
+        """ A newly connected app gets the full state and no deltas until it asks """
+        self.mgr.deltasEnabled = True
+        self.mgr.sendState()
+        self.mgr.shotMgr.appMgr.sendPacket.reset_mock()
+        self.mgr.appConnected()
+        self.assertFalse(self.mgr.deltasEnabled)
+        self.assertEqual(self.mgr.shotMgr.appMgr.sendPacket.call_count, 2)
+
 class TestSetGimbalEnabledParam(unittest.TestCase):
     def setUp(self):
         shotmgr = Mock()
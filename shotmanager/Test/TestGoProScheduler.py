@@ -0,0 +1,167 @@
+#  TestGoProScheduler.py
+#  shotmanager
+#
+#  Unit tests for the GoPro request scheduler.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+
+from pymavlink import mavutil
+
+import GoProScheduler
+
+SHUTTER = mavutil.mavlink.GOPRO_COMMAND_SHUTTER
+CAPTURE_MODE = mavutil.mavlink.GOPRO_COMMAND_CAPTURE_MODE
+PROTUNE = mavutil.mavlink.GOPRO_COMMAND_PROTUNE
+BATTERY = mavutil.mavlink.GOPRO_COMMAND_BATTERY
+
+
+class TestGoProScheduler(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        self.scheduler = GoProScheduler.GoProScheduler(self.sent.append)
+
+    def testSendsWhenIdle(self):
+        self.scheduler.put('a', 0.0, BATTERY)
+        self.assertEqual(self.sent, ['a'])
+        self.assertTrue(self.scheduler.busy())
+        self.assertEqual(len(self.scheduler), 0)
+
+    def testOneOutstanding(self):
+        self.scheduler.put('a', 0.0, BATTERY)
+        self.scheduler.put('b', 0.0, PROTUNE)
+        self.assertEqual(self.sent, ['a'])
+        self.scheduler.complete(0.1)
+        self.assertEqual(self.sent, ['a', 'b'])
+        self.scheduler.complete(0.2)
+        self.assertFalse(self.scheduler.busy())
+
+    def testCoalesceSets(self):
+        self.scheduler.put('first', 0.0, BATTERY)
+        self.scheduler.put('protune 0', 0.0, PROTUNE, True)
+        self.scheduler.put('protune 1', 0.1, PROTUNE, True)
+        self.scheduler.put('protune 0', 0.2, PROTUNE, True)
+        self.assertEqual(len(self.scheduler), 1)
+        self.assertEqual(self.scheduler.coalesced, 2)
+        self.scheduler.complete(0.3)
+        self.assertEqual(self.sent, ['first', 'protune 0'])
+
+    def testCoalesceGets(self):
+        self.scheduler.put('first', 0.0, BATTERY, True)
+        self.scheduler.put('get', 0.0, PROTUNE)
+        self.scheduler.put('get', 0.0, PROTUNE)
+        self.assertEqual(len(self.scheduler), 1)
+
+    def testSetAndGetNotCoalesced(self):
+        self.scheduler.put('first', 0.0, BATTERY)
+        self.scheduler.put('set', 0.0, PROTUNE, True)
+        self.scheduler.put('get', 0.0, PROTUNE)
+        self.assertEqual(len(self.scheduler), 2)
+
+    def testOutstandingNotCoalesced(self):
+        ''' a new set for the command in flight must still be sent '''
+        self.scheduler.put('protune 0', 0.0, PROTUNE, True)
+        self.scheduler.put('protune 1', 0.0, PROTUNE, True)
+        self.scheduler.complete(0.1)
+        self.assertEqual(self.sent, ['protune 0', 'protune 1'])
+
+    def testPriorities(self):
+        self.scheduler.put('first', 0.0, BATTERY)
+        self.scheduler.put('get', 0.0, BATTERY)
+        self.scheduler.put('set', 0.0, PROTUNE, True)
+        self.scheduler.put('shutter', 0.0, SHUTTER, True)
+        for i in range(4):
+            self.scheduler.complete(0.1)
+        self.assertEqual(self.sent, ['first', 'shutter', 'set', 'get'])
+
+    def testRecordKeepsOrder(self):
+        ''' switching to photo, taking a still and switching back must not be reordered or merged '''
+        self.scheduler.put('first', 0.0, BATTERY)
+        self.scheduler.put('set', 0.0, PROTUNE, True)
+        self.scheduler.put('photo mode', 0.0, CAPTURE_MODE, True)
+        self.scheduler.put('shutter', 0.0, SHUTTER, True)
+        self.scheduler.put('video mode', 0.0, CAPTURE_MODE, True)
+        for i in range(5):
+            self.scheduler.complete(0.1)
+        self.assertEqual(self.sent, ['first', 'photo mode', 'shutter', 'video mode', 'set'])
+        self.assertEqual(self.scheduler.coalesced, 0)
+
+    def testRetryThenDrop(self):
+        self.scheduler.put('a', 0.0, BATTERY)
+        self.scheduler.put('b', 0.0, PROTUNE)
+        self.assertEqual(self.scheduler.poll(0.5), None)
+        self.assertEqual(self.sent, ['a'])
+
+        now = 0.0
+        for i in range(GoProScheduler.GOPRO_REQUEST_RETRIES):
+            now += GoProScheduler.GOPRO_REQUEST_TIMEOUT
+            self.assertEqual(self.scheduler.poll(now), None)
+        self.assertEqual(self.sent, ['a'] * (GoProScheduler.GOPRO_REQUEST_RETRIES + 1))
+
+        now += GoProScheduler.GOPRO_REQUEST_TIMEOUT
+        dropped = self.scheduler.poll(now)
+        self.assertEqual(dropped.msg, 'a')
+        self.assertEqual(self.sent[-1], 'b')
+        self.assertEqual(self.scheduler.timedOut, 1)
+        self.assertEqual(self.scheduler.retried, GoProScheduler.GOPRO_REQUEST_RETRIES)
+
+    def testPerCommandTimeout(self):
+        self.scheduler.put('mode', 0.0, CAPTURE_MODE, True)
+        self.scheduler.poll(GoProScheduler.GOPRO_REQUEST_TIMEOUT)
+        self.assertEqual(self.sent, ['mode'])
+        self.scheduler.poll(GoProScheduler.GOPRO_REQUEST_TIMEOUTS[CAPTURE_MODE])
+        self.assertEqual(self.sent, ['mode', 'mode'])
+
+    def testReset(self):
+        self.scheduler.put('a', 0.0, BATTERY)
+        self.scheduler.put('b', 0.0, PROTUNE, True)
+        self.scheduler.reset()
+        self.assertFalse(self.scheduler.busy())
+        self.assertEqual(len(self.scheduler), 0)
+        self.scheduler.put('c', 0.0, PROTUNE, True)
+        self.assertEqual(self.sent, ['a', 'c'])
+
+    def testLatency(self):
+        self.scheduler.put('a', 0.0, BATTERY)
+        self.scheduler.put('b', 0.0, PROTUNE)
+        self.scheduler.complete(0.25)
+        self.scheduler.complete(0.5)
+        self.assertEqual(self.scheduler.answered, 2)
+        self.assertAlmostEqual(self.scheduler.waitMax, 0.25)
+        self.assertAlmostEqual(self.scheduler.responseMax, 0.25)
+        self.assertAlmostEqual(self.scheduler.responseTotal, 0.5)
+        self.assertEqual(self.scheduler.depthMax, 1)
+        self.assertTrue(self.scheduler.summary().startswith("2 sent, 2 answered"))
+
+    def testStaleResponseIgnored(self):
+        ''' a late answer to a dropped request must not release the next one '''
+        self.scheduler.put('a', 0.0, BATTERY)
+        self.scheduler.put('b', 0.0, PROTUNE, True)
+        self.scheduler.complete(0.1, PROTUNE, True)
+        self.scheduler.complete(0.1, BATTERY, True)
+        self.assertEqual(self.sent, ['a'])
+        self.assertEqual(self.scheduler.stale, 2)
+        self.scheduler.complete(0.2, BATTERY, False)
+        self.assertEqual(self.sent, ['a', 'b'])
+        self.assertEqual(self.scheduler.answered, 1)
+
+    def testShutterNotRetried(self):
+        self.scheduler.put('shutter', 0.0, SHUTTER, True)
+        self.scheduler.put('b', 0.0, PROTUNE)
+        dropped = self.scheduler.poll(GoProScheduler.GOPRO_REQUEST_TIMEOUT)
+        self.assertEqual(dropped.msg, 'shutter')
+        self.assertEqual(self.sent, ['shutter', 'b'])
+        self.assertEqual(self.scheduler.retried, 0)
+        self.assertEqual(self.scheduler.timedOut, 1)
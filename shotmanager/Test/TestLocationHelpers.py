@@ -3,6 +3,7 @@ import math
 import mock
 import os
 from os import sys, path
+import random
 import unittest
 
 from dronekit import LocationGlobalRelative
@@ -198,6 +199,112 @@ class TestAddVectorToLocation(unittest.TestCase):
         dist = location_helpers.getDistanceFromPoints3d(loc, newloc)
         self.assertTrue( abs(dist) < ERROR )
         
+class TestArrayFunctions(unittest.TestCase):
+    def setUp(self):
+        random.seed(94739473)
+        self.starts = [LocationGlobalRelative(random.uniform(-70, 70), random.uniform(-180, 180), random.uniform(0, 100)) for i in range(200)]
+        self.ends = [LocationGlobalRelative(loc.lat + random.uniform(-0.01, 0.01), loc.lon + random.uniform(-0.01, 0.01), random.uniform(0, 100)) for loc in self.starts]
+        self.columns = ([loc.lat for loc in self.starts], [loc.lon for loc in self.starts], [loc.alt for loc in self.starts],
+                        [loc.lat for loc in self.ends], [loc.lon for loc in self.ends], [loc.alt for loc in self.ends])
+
+    def testDistance(self):
+        """ getDistanceFromPointsArray matches getDistanceFromPoints """
+        lat1, lon1, alt1, lat2, lon2, alt2 = self.columns
+        dists = location_helpers.getDistanceFromPointsArray(lat1, lon1, lat2, lon2)
+        for i in range(len(self.starts)):
+            self.assertTrue( abs( dists[i] - location_helpers.getDistanceFromPoints(self.starts[i], self.ends[i]) ) < ERROR_LOC )
+
+    def testDistance3d(self):
+        """ getDistanceFromPoints3dArray matches getDistanceFromPoints3d """
+        dists = location_helpers.getDistanceFromPoints3dArray(*self.columns)
+        for i in range(len(self.starts)):
+            self.assertTrue( abs( dists[i] - location_helpers.getDistanceFromPoints3d(self.starts[i], self.ends[i]) ) < ERROR_LOC )
+
+    def testAzimuth(self):
+        """ calcAzimuthFromPointsArray matches calcAzimuthFromPoints """
+        lat1, lon1, alt1, lat2, lon2, alt2 = self.columns
+        azs = location_helpers.calcAzimuthFromPointsArray(lat1, lon1, lat2, lon2)
+        for i in range(len(self.starts)):
+            self.assertTrue( abs( azs[i] - location_helpers.calcAzimuthFromPoints(self.starts[i], self.ends[i]) ) < ERROR_LOC )
+
+    def testVector(self):
+        """ getVectorFromPointsArray matches getVectorFromPoints """
+        x, y, z = location_helpers.getVectorFromPointsArray(*self.columns)
+        for i in range(len(self.starts)):
+            vec = location_helpers.getVectorFromPoints(self.starts[i], self.ends[i])
+            self.assertTrue( abs( x[i] - vec.x ) < ERROR_LOC )
+            self.assertTrue( abs( y[i] - vec.y ) < ERROR_LOC )
+            self.assertTrue( abs( z[i] - vec.z ) < ERROR_LOC )
+
+    def testBroadcastStart(self):
+        """ A single start location broadcasts against many ends """
+        start = self.starts[0]
+        lat1, lon1, alt1, lat2, lon2, alt2 = self.columns
+        dists = location_helpers.getDistanceFromPoints3dArray(start.lat, start.lon, start.alt, lat2, lon2, alt2)
+        self.assertEqual( len(dists), len(self.ends) )
+        self.assertTrue( abs( dists[5] - location_helpers.getDistanceFromPoints3d(start, self.ends[5]) ) < ERROR_LOC )
+
+    def testWrapTo360(self):
+        """ wrapTo360Array matches wrapTo360 """
+        vals = [-720.0, -45.0, 0.0, 45.0, 360.0, 720.0, 725.5]
+        wrapped = location_helpers.wrapTo360Array(vals)
+        for i in range(len(vals)):
+            self.assertEqual( wrapped[i], location_helpers.wrapTo360(vals[i]) )
+
+
+class TestLocalFrame(unittest.TestCase):
+    def setUp(self):
+        self.origin = LocationGlobalRelative(83.5, 9.2, 10.0)
+        self.frame = location_helpers.LocalFrame(self.origin)
+
+    def testToNEDMatchesGetVectorFromPoints(self):
+        """ toNED is getVectorFromPoints with z flipped to Down """
+        loc = LocationGlobalRelative(83.51, 9.21, 4.5)
+        vec = location_helpers.getVectorFromPoints(self.origin, loc)
+        north, east, down = self.frame.toNED(loc)
+        self.assertEqual( north, vec.x )
+        self.assertEqual( east, vec.y )
+        self.assertEqual( down, -vec.z )
+
+    def testFromNEDMatchesAddVectorToLocation(self):
+        """ fromNED is addVectorToLocation with z flipped to Down """
+        newloc = location_helpers.addVectorToLocation(self.origin, Vector3(1111.95, 125.876314, 3.0))
+        lat, lon, alt = self.frame.fromNED(1111.95, 125.876314, -3.0)
+        self.assertEqual( lat, newloc.lat )
+        self.assertEqual( lon, newloc.lon )
+        self.assertEqual( alt, newloc.alt )
+
+    def testRoundTrip(self):
+        """ Converting to NED and back returns the same location """
+        loc = LocationGlobalRelative(83.5012, 9.2034, 25.0)
+        lat, lon, alt = self.frame.fromNED(*self.frame.toNED(loc))
+        self.assertTrue( abs( lat - loc.lat ) < ERROR_LOC )
+        self.assertTrue( abs( lon - loc.lon ) < ERROR_LOC )
+        self.assertTrue( abs( alt - loc.alt ) < ERROR )
+
+    def testArraysMatchScalar(self):
+        """ Batched conversions match the scalar ones """
+        lats = [83.5, 83.51, 83.49]
+        lons = [9.2, 9.21, 9.15]
+        alts = [10.0, 0.0, 50.0]
+        north, east, down = self.frame.toNEDArrays(lats, lons, alts)
+        for i in range(3):
+            n, e, d = self.frame.toNEDFromLatLonAlt(lats[i], lons[i], alts[i])
+            self.assertTrue( abs( north[i] - n ) < ERROR_LOC )
+            self.assertTrue( abs( east[i] - e ) < ERROR_LOC )
+            self.assertTrue( abs( down[i] - d ) < ERROR_LOC )
+        newLats, newLons, newAlts = self.frame.fromNEDArrays(north, east, down)
+        for i in range(3):
+            self.assertTrue( abs( newLats[i] - lats[i] ) < ERROR_LOC )
+            self.assertTrue( abs( newLons[i] - lons[i] ) < ERROR_LOC )
+            self.assertTrue( abs( newAlts[i] - alts[i] ) < ERROR_LOC )
+
+    def testNoAltitude(self):
+        """ An origin without altitude is treated as altitude zero """
+        frame = location_helpers.LocalFrame(LocationGlobalRelative(83.5, 9.2))
+        self.assertEqual( frame.toNEDFromLatLonAlt(83.5, 9.2, 5.0), (0.0, 0.0, -5.0) )
+
+
 class TestSpotLock(unittest.TestCase):
     def testSpotLockN(self):
         """ Test spot loc North """
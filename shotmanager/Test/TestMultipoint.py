@@ -64,6 +64,7 @@ class TestHandleRCs(unittest.TestCase):
         self.shot.cable.position = Vector3()
         self.shot.cable.velocity = Vector3()
         self.shot.splineOrigin = LocationGlobalRelative(37.873168,-122.302062, 0)
+        self.shot.splineFrame = location_helpers.LocalFrame(self.shot.splineOrigin)
 
         #Mock interpolateCamera()
         self.shot.interpolateCamera = Mock(return_value=(0,0))
@@ -759,6 +760,77 @@ class TestUpdatePathTimes(unittest.TestCase):
         struct_pack.assert_called_with('<IIff', app_packet.SOLO_SPLINE_DURATIONS, 8, 10, 60)
 
 
+class TestSendPathPreview(unittest.TestCase):
+
+    def setUp(self):
+        #Create a mock vehicle object
+        vehicle = mock.create_autospec(Vehicle)
+
+        #Create a mock shotManager object
+        shotmgr = mock.create_autospec(ShotManager)
+        shotmgr.appMgr = Mock()
+
+        #Run the shot constructor
+        self.shot = multipoint.MultipointShot(vehicle, shotmgr)
+
+        #Mock cable
+        self.shot.cable = mock.create_autospec(CableController)
+        self.shot.cable.getPathPreview.return_value = [(0.0, Vector3(0, 0, 0), 1.0), (1.0, Vector3(10, 0, -5), 2.0)]
+        self.shot.splineFrame = location_helpers.LocalFrame(LocationGlobalRelative(37.0, -122.0, 10.0))
+
+    def testNoSpline(self):
+        '''if a spline has not been defined yet, then return immediately'''
+
+        self.shot.cable = None
+        self.shot.sendPathPreview(0.0)
+        assert not self.shot.shotmgr.appMgr.sendPacket.called
+
+    def testDefaultTolerance(self):
+        '''A tolerance of zero uses the default'''
+
+        self.shot.sendPathPreview(0.0)
+        self.shot.cable.getPathPreview.assert_called_with(cableController.PATH_PREVIEW_TOLERANCE, cableController.PATH_PREVIEW_SPEED_TOLERANCE)
+
+    def testPacket(self):
+        '''Samples are sent as lat/lon/alt with their speed limits'''
+
+        self.shot.sendPathPreview(1.0)
+        packet = self.shot.shotmgr.appMgr.sendPacket.call_args[0][0]
+        (packetType, length, tolerance, count) = struct.unpack('<IIfI', packet[:16])
+        self.assertEqual(packetType, app_packet.SOLO_SPLINE_PATH_PREVIEW)
+        self.assertEqual(length, 8 + 28 * 2)
+        self.assertEqual(len(packet), 8 + length)
+        self.assertEqual(tolerance, 1.0)
+        self.assertEqual(count, 2)
+        (p, lat, lon, alt, speedLimit) = struct.unpack('<fddff', packet[44:])
+        self.assertEqual(p, 1.0)
+        self.assertTrue(lat > 37.0)
+        self.assertAlmostEqual(lon, -122.0)
+        self.assertAlmostEqual(alt, 15.0)
+        self.assertEqual(speedLimit, 2.0)
+
+    def testTooManySamples(self):
+        '''Tolerance is loosened until the preview fits'''
+
+        sample = (0.0, Vector3(0, 0, 0), 1.0)
+        self.shot.cable.getPathPreview.side_effect = [[sample] * (PATH_PREVIEW_MAX_SAMPLES + 1), [sample] * 2]
+        self.shot.sendPathPreview(1.0)
+        self.shot.cable.getPathPreview.assert_called_with(2.0, 2.0 * cableController.PATH_PREVIEW_SPEED_TOLERANCE)
+
+    def testPreviewThinnedOut(self):
+        '''If loosening the tolerances doesn't help, the preview is cut down to size'''
+
+        samples = [(i / 1000.0, Vector3(i, 0, 0), 1.0) for i in range(1001)]
+        self.shot.cable.getPathPreview.return_value = samples
+        self.shot.sendPathPreview(1.0)
+        self.assertEqual(self.shot.cable.getPathPreview.call_count, multipoint.PATH_PREVIEW_MAX_PASSES + 1)
+        packet = self.shot.shotmgr.appMgr.sendPacket.call_args[0][0]
+        (packetType, length, tolerance, count) = struct.unpack('<IIfI', packet[:16])
+        self.assertEqual(count, PATH_PREVIEW_MAX_SAMPLES)
+        self.assertEqual(struct.unpack('<f', packet[16:20])[0], 0.0)
+        self.assertEqual(struct.unpack('<f', packet[-28:-24])[0], 1.0)
+
+
 class TestUpdatePlaybackStatus(unittest.TestCase):
 
     def setUp(self):
@@ -985,6 +1057,8 @@ class TestGenerateSplines(unittest.TestCase):
 
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
+        shotmgr.geoFenceManager = Mock()
+        shotmgr.geoFenceManager.checkCable.return_value = None
 
         #Run the shot constructor
         self.shot = multipoint.MultipointShot(vehicle, shotmgr)
@@ -1172,6 +1246,9 @@ class TestHandleAttach(unittest.TestCase):
 
         #Create a mock shotManager object
         shotmgr = mock.create_autospec(ShotManager)
+        shotmgr.geoFenceManager = Mock()
+        shotmgr.geoFenceManager.fenceVersion = 1
+        shotmgr.geoFenceManager.checkCable.return_value = None
 
         #Run the shot constructor
         self.shot = multipoint.MultipointShot(vehicle, shotmgr)
@@ -1179,6 +1256,7 @@ class TestHandleAttach(unittest.TestCase):
         #Mock cable
         self.shot.cable = mock.create_autospec(CableController)
         self.shot.cable.spline = mock.create_autospec(CatmullRom)
+        self.shot.fenceCheckVersion = 1
 
         self.loc1 = LocationGlobalRelative(37.873309, -122.302562, 10)
         self.pitch1 = 45
@@ -1239,6 +1317,55 @@ class TestHandleAttach(unittest.TestCase):
         self.shot.handleAttach(attach)
         self.shot.cable.spline.nonDimensionalToArclength.assert_called_with(1,1)
 
+    def testAttachOutsideGeoFence(self):
+        '''Do not attach to a keyframe the geofence pre-check found breached'''
+        self.shot.cableCamPlaying = True
+        self.shot.waypoints = [self.waypt1,self.waypt2,self.waypt3]
+        self.shot.cable.spline.nonDimensionalToArclength.return_value = (0.5,)
+        self.shot.fenceCheck = Mock()
+        self.shot.fenceCheck.reachableRange.return_value = None
+        self.shot.handleAttach((1,))
+        self.assertEqual(self.shot.attachIndex, -1)
+        assert not self.shot.cable.setCurrentP.called
+        assert not self.shot.vehicle.simple_goto.called
+
+    def testAttachLimitedByGeoFence(self):
+        '''The cable is limited to the clear stretch around the keyframe'''
+        self.shot.cableCamPlaying = True
+        self.shot.waypoints = [self.waypt1,self.waypt2,self.waypt3]
+        self.shot.cable.spline.nonDimensionalToArclength.return_value = (0.5,)
+        self.shot.fenceCheck = Mock()
+        self.shot.fenceCheck.reachableRange.return_value = (0.2, 0.8)
+        self.shot.handleAttach((1,))
+        self.shot.fenceCheck.reachableRange.assert_called_with(0.5)
+        self.shot.cable.setReachableRange.assert_called_with(0.2, 0.8)
+        self.shot.cable.setCurrentP.assert_called_with(0.5)
+
+    def testAttachRechecksChangedGeoFence(self):
+        '''A fence set after the cable was generated is checked at attach'''
+        self.shot.cableCamPlaying = True
+        self.shot.waypoints = [self.waypt1,self.waypt2,self.waypt3]
+        self.shot.cable.spline.nonDimensionalToArclength.return_value = (0.5,)
+        fenceCheck = Mock()
+        fenceCheck.reachableRange.return_value = (0.2, 0.8)
+        self.shot.shotmgr.geoFenceManager.checkCable.return_value = fenceCheck
+        self.shot.shotmgr.geoFenceManager.fenceVersion = 2
+        self.shot.handleAttach((1,))
+        self.shot.shotmgr.geoFenceManager.checkCable.assert_called_with(self.shot.cable, self.shot.splineFrame)
+        self.shot.cable.setReachableRange.assert_called_with(0.2, 0.8)
+
+    def testAttachAfterGeoFenceCleared(self):
+        '''Clearing the fence lifts the limit on the cable'''
+        self.shot.cableCamPlaying = True
+        self.shot.waypoints = [self.waypt1,self.waypt2,self.waypt3]
+        self.shot.cable.spline.nonDimensionalToArclength.return_value = (0.5,)
+        self.shot.fenceCheck = Mock()
+        self.shot.shotmgr.geoFenceManager.fenceVersion = 2
+        self.shot.handleAttach((1,))
+        self.assertIsNone(self.shot.fenceCheck)
+        self.shot.cable.setReachableRange.assert_called_with(0.0, 1.0)
+        self.shot.cable.setCurrentP.assert_called_with(0.5)
+
 
 
 class TestListenForAttach(unittest.TestCase):
@@ -1369,3 +1496,12 @@ class TestHandlePacket(unittest.TestCase):
         self.shot.handlePacket(app_packet.SOLO_SPLINE_ATTACH, 4, value)
         self.shot.handleAttach.assert_called_with((1,))
 
+    def testSoloSplinePathPreview(self):
+        ''' Test parsing a solo spline path preview request '''
+
+        self.shot.shotmgr.currentShot = shots.APP_SHOT_MULTIPOINT
+        value = struct.pack('<f',0.5)
+        self.shot.sendPathPreview = Mock()
+        self.shot.handlePacket(app_packet.SOLO_SPLINE_PATH_PREVIEW, 4, value)
+        self.shot.sendPathPreview.assert_called_with(0.5)
+
@@ -0,0 +1,75 @@
+#  TestPathSimplifier.py
+#  shotmanager
+#
+#  Unit tests for polyline decimation.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import math
+import unittest
+
+import pathSimplifier
+from vector3 import Vector3
+
+
+class TestDistanceToSegment(unittest.TestCase):
+    def testPerpendicular(self):
+        '''Distance to the middle of a segment'''
+        dist, t = pathSimplifier.distanceToSegment(Vector3(5, 3, 0), Vector3(0, 0, 0), Vector3(10, 0, 0))
+        self.assertAlmostEqual(dist, 3.)
+        self.assertAlmostEqual(t, 0.5)
+
+    def testBeyondEnd(self):
+        '''Distance past the end of a segment is measured to the endpoint'''
+        dist, t = pathSimplifier.distanceToSegment(Vector3(13, 4, 0), Vector3(0, 0, 0), Vector3(10, 0, 0))
+        self.assertAlmostEqual(dist, 5.)
+        self.assertEqual(t, 1.)
+
+    def testDegenerateSegment(self):
+        '''A zero length segment measures to its start'''
+        dist, t = pathSimplifier.distanceToSegment(Vector3(0, 0, 2), Vector3(0, 0, 0), Vector3(0, 0, 0))
+        self.assertAlmostEqual(dist, 2.)
+        self.assertEqual(t, 0.)
+
+
+class TestSimplifyPath(unittest.TestCase):
+    def testShortPath(self):
+        '''Paths with fewer than 3 points are returned whole'''
+        self.assertEqual(pathSimplifier.simplifyPath([Vector3(), Vector3(1, 0, 0)], 1.), [0, 1])
+
+    def testStraightLine(self):
+        '''A straight line collapses to its endpoints'''
+        points = [Vector3(i, 0, 0) for i in range(100)]
+        self.assertEqual(pathSimplifier.simplifyPath(points, 0.1), [0, 99])
+
+    def testCorner(self):
+        '''Corners are kept'''
+        points = [Vector3(i, 0, 0) for i in range(10)] + [Vector3(9, i, 0) for i in range(1, 10)]
+        self.assertEqual(pathSimplifier.simplifyPath(points, 0.1), [0, 9, 18])
+
+    def testErrorBound(self):
+        '''Every dropped point is within tolerance of the simplified path'''
+        points = [Vector3(math.cos(i / 50.), math.sin(i / 50.), 0) for i in range(300)]
+        kept = pathSimplifier.simplifyPath(points, 0.01)
+        self.assertTrue(len(kept) < len(points))
+        for i in range(len(points)):
+            dist = min(pathSimplifier.distanceToSegment(points[i], points[a], points[b])[0] for a, b in zip(kept[:-1], kept[1:]))
+            self.assertTrue(dist <= 0.01)
+
+    def testValues(self):
+        '''Points are kept where their value can't be interpolated'''
+        points = [Vector3(i, 0, 0) for i in range(10)]
+        values = [1.0] * 10
+        values[4] = 3.0
+        self.assertEqual(pathSimplifier.simplifyPath(points, 0.1, values, 0.5), [0, 3, 4, 5, 9])
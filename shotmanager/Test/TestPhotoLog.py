@@ -0,0 +1,109 @@
+#  TestPhotoLog.py
+#  shotmanager
+#
+#  Unit tests for the geotag photo log.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import photoLog
+from photoLog import PhotoLog
+
+
+class TestPhotoLog(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'photo.log')
+        self.log = PhotoLog(self.path)
+
+    def tearDown(self):
+        self.log.close()
+        shutil.rmtree(self.dir)
+
+    def read(self):
+        with open(self.path) as f:
+            return f.read()
+
+    def testNoFileUntilFirstPhoto(self):
+        self.log.sync()
+        self.log.poll(100.0)
+        self.assertFalse(os.path.exists(self.path))
+
+    def testCsvFormat(self):
+        self.log.add(37.1234567, -122.7654321, 12.3456, 42.9, 1000.0)
+        self.log.sync()
+        self.assertEqual(self.read(), "37.123457,-122.765432,12.346,42\n")
+
+    def testBufferedUntilSync(self):
+        self.log.add(37.0, -122.0, 10.0, 10.0, 1000.0)
+        self.log.poll(10.0 + photoLog.PHOTO_LOG_SYNC_INTERVAL / 2)
+        self.assertEqual(self.log.unsynced, 1)
+        self.log.poll(10.0 + photoLog.PHOTO_LOG_SYNC_INTERVAL)
+        self.assertEqual(self.log.unsynced, 0)
+        self.assertEqual(self.read(), "37.000000,-122.000000,10.000,10\n")
+
+    def testIndex(self):
+        for i in range(5):
+            self.log.add(37.0 + i, -122.0, 10.0, 10.0 + i, 1000.0 + i)
+        self.log.sync()
+        log = self.read()
+        with open(photoLog.indexPath(self.path), 'rb') as f:
+            data = f.read()
+        self.assertEqual(len(data), 5 * photoLog.PHOTO_INDEX_SIZE)
+        for i in range(5):
+            (wallTime, offset) = struct.unpack_from(photoLog.PHOTO_INDEX_FORMAT, data, i * photoLog.PHOTO_INDEX_SIZE)
+            self.assertEqual(wallTime, 1000.0 + i)
+            self.assertTrue(log[offset:].startswith("%.6f," % (37.0 + i)))
+
+    def testAppendsAcrossRuns(self):
+        self.log.add(37.0, -122.0, 10.0, 10.0, 1000.0)
+        self.log.close()
+        self.log = PhotoLog(self.path)
+        self.log.add(38.0, -122.0, 10.0, 5.0, 2000.0)
+        self.log.sync()
+        self.assertEqual(photoLog.seekPhoto(self.path, 1500.0), (38.0, -122.0, 10.0, 5))
+
+    def testSeekPhoto(self):
+        for i in range(100):
+            self.log.add(37.0 + i * 0.001, -122.0, 10.0, i, 1000.0 + i * 2)
+        self.log.sync()
+        self.assertEqual(photoLog.seekPhoto(self.path, 0.0), (37.0, -122.0, 10.0, 0))
+        self.assertEqual(photoLog.seekPhoto(self.path, 1051.0)[3], 26)
+        self.assertEqual(photoLog.seekPhoto(self.path, 1052.0)[3], 26)
+        self.assertEqual(photoLog.seekPhoto(self.path, 1199.0), None)
+
+    def testClockBehindIndex(self):
+        ''' a photo taken before the clock is set on a later boot doesn't unsort the index '''
+        self.log.add(37.0, -122.0, 10.0, 10.0, 1000.0)
+        self.log.close()
+        self.log = PhotoLog(self.path)
+        self.log.add(38.0, -122.0, 10.0, 5.0, 10.0)
+        self.log.add(39.0, -122.0, 10.0, 20.0, 2000.0)
+        self.log.sync()
+        self.assertEqual(len(self.read().splitlines()), 3)
+        with open(photoLog.indexPath(self.path), 'rb') as f:
+            self.assertEqual(len(f.read()), 2 * photoLog.PHOTO_INDEX_SIZE)
+        self.assertEqual(photoLog.seekPhoto(self.path, 0.0), (37.0, -122.0, 10.0, 10))
+        self.assertEqual(photoLog.seekPhoto(self.path, 1500.0), (39.0, -122.0, 10.0, 20))
+
+    def testWriteErrorLogged(self):
+        self.log = PhotoLog(os.path.join(self.dir, 'missing', 'photo.log'))
+        self.log.add(37.0, -122.0, 10.0, 10.0, 1000.0)
+        self.assertEqual(self.log.log, None)
+        self.assertEqual(self.log.unsynced, 0)
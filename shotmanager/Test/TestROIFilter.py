@@ -0,0 +1,187 @@
+#  TestROIFilter.py
+#  shotmanager
+#
+#  Unit tests for the streaming ROI filters.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import random
+import unittest
+
+from dronekit import LocationGlobalRelative
+import numpy
+
+import location_helpers
+from roiFilter import IIRFilter, ConstantVelocityKalman, LocalROIFilter
+
+NUM = [0,0.000334672774973874,0.00111965413719632,-0.000469533537393159,-0.000199779184127412]
+DEN = [1,-3.48113699710809,4.56705782792063,-2.67504447769757,0.589908661075676]
+DT = 0.04
+
+
+class TestIIRFilter(unittest.TestCase):
+    def testBadCoefficients(self):
+        self.assertRaises(ValueError, IIRFilter, [], DEN, 1)
+        self.assertRaises(ValueError, IIRFilter, NUM, [1], 1)
+        self.assertRaises(ValueError, IIRFilter, NUM, [0, 1], 1)
+
+    def testMatchesDirectForm(self):
+        ''' same output as the expanded difference equation '''
+        random.seed(1)
+        xs = [random.uniform(-5, 5) for i in range(40)]
+
+        iir = IIRFilter(NUM, DEN, 1)
+        iir.reset(0.0)
+        x = [0.0] * 5
+        y = [0.0] * 4
+        for value in xs:
+            x = [value] + x[:4]
+            out = sum(NUM[k] * x[k] for k in range(5)) - sum(DEN[k + 1] * y[k] for k in range(4))
+            y = [out] + y[:3]
+            iir.update([value], DT)
+            self.assertAlmostEqual(iir.position[0], out, 9)
+
+    def testStepResponse(self):
+        ''' unity DC gain, per channel '''
+        iir = IIRFilter(NUM, DEN, 2)
+        iir.reset(0.0)
+        iir.update([10.0, -4.0], DT)
+        for i in range(500):
+            iir.update(None, DT)
+        self.assertAlmostEqual(iir.position[0], 10.0, 4)
+        self.assertAlmostEqual(iir.position[1], -4.0, 4)
+        self.assertAlmostEqual(iir.velocity[0], 0.0, 4)
+
+    def testRampVelocity(self):
+        iir = IIRFilter(NUM, DEN, 1)
+        iir.reset(0.0)
+        for i in range(500):
+            iir.update([2.0 * i * DT], DT)
+        self.assertAlmostEqual(iir.velocity[0], 2.0, 4)
+
+
+class TestConstantVelocityKalman(unittest.TestCase):
+    def testTracksVelocity(self):
+        random.seed(2)
+        kalman = ConstantVelocityKalman(2, 1.0, 3.0)
+        kalman.reset([0.0, 0.0])
+        for i in range(1, 500):
+            t = i * DT
+            kalman.update([5.0 * t + random.gauss(0, 3.0), -2.0 * t + random.gauss(0, 3.0)], DT)
+        self.assertAlmostEqual(kalman.velocity[0], 5.0, 0)
+        self.assertAlmostEqual(kalman.velocity[1], -2.0, 0)
+        self.assertTrue(abs(kalman.position[0] - 5.0 * 499 * DT) < 3.0)
+
+    def testPredictOnly(self):
+        ''' without measurements the state coasts and the uncertainty grows '''
+        kalman = ConstantVelocityKalman(1, 1.0, 3.0)
+        kalman.reset([0.0])
+        kalman.velocity[0] = 2.0
+        p00 = kalman.p00[0]
+        for i in range(25):
+            kalman.update(None, DT)
+        self.assertAlmostEqual(kalman.position[0], 2.0, 9)
+        self.assertTrue(kalman.p00[0] > p00)
+
+    def testCorrectionShrinksUncertainty(self):
+        kalman = ConstantVelocityKalman(1, 1.0, 3.0)
+        kalman.reset([0.0])
+        kalman.predict(1.0)
+        p00 = kalman.p00[0]
+        kalman.correct([1.0])
+        self.assertTrue(kalman.p00[0] < p00)
+        self.assertTrue(0.0 < kalman.position[0] < 1.0)
+
+
+class TestLocalROIFilter(unittest.TestCase):
+    def setUp(self):
+        self.origin = LocationGlobalRelative(37.873168, -122.302062, 2.0)
+        self.frame = location_helpers.LocalFrame(self.origin)
+
+    def testFirstROI(self):
+        roiFilter = LocalROIFilter(ConstantVelocityKalman(2, 2.0, 3.0), 0.65, 0.3)
+        roiFilter.update(self.origin, DT)
+        roi = roiFilter.location()
+        self.assertAlmostEqual(roi.lat, self.origin.lat, 9)
+        self.assertAlmostEqual(roi.lon, self.origin.lon, 9)
+        self.assertAlmostEqual(roi.alt, self.origin.alt, 9)
+        self.assertEqual(roiFilter.velocity(), (0.0, 0.0, 0.0))
+        self.assertEqual(roiFilter.updates, 1)
+
+    def testRepeatedROIIsNotNewData(self):
+        kalman = ConstantVelocityKalman(2, 2.0, 3.0)
+        roiFilter = LocalROIFilter(kalman, 0.65, 0.0)
+        roiFilter.update(self.origin, DT)
+        moved = self.frame.locationFromNED(10.0, 0.0, -2.0)
+        roiFilter.update(moved, DT)
+        position = kalman.position[0]
+        # the same Location again only predicts
+        kalman.velocity[:] = 0.0
+        roiFilter.update(moved, DT)
+        self.assertEqual(kalman.position[0], position)
+
+    def leadError(self, latency):
+        ''' north error of the led ROI behind a subject doing 5 m/s, whose ROIs arrive 0.5 s late '''
+        roiFilter = LocalROIFilter(ConstantVelocityKalman(2, 2.0, 1.0), 0.65, latency)
+        speed = 5.0
+        delay = 0.5
+        roi = self.origin
+        for i in range(250):
+            t = i * DT
+            # a new ROI at 5 Hz, describing where the subject was delay seconds ago
+            if i % 5 == 0:
+                roi = self.frame.locationFromNED(speed * (t - delay), 0.0, -2.0)
+            roiFilter.update(roi, DT, (i % 5) * DT)
+        (north, east, down) = self.frame.toNED(roiFilter.location())
+        return abs(north - speed * t)
+
+    def testLatencyCompensation(self):
+        self.assertTrue(self.leadError(0.0) > 2.0)
+        self.assertTrue(self.leadError(0.5) < 0.5)
+
+    def testIIRLeadsByAge(self):
+        ''' a held IIR input is led by how old it is '''
+        horizontal = IIRFilter(NUM, DEN, 2)
+        predicted = []
+        for age in (0.0, 1.0):
+            roiFilter = LocalROIFilter(horizontal, 0.65, 0.0)
+            roiFilter.update(self.origin, DT)
+            for i in range(1, 100):
+                roiFilter.update(self.frame.locationFromNED(i * 0.2, 0.0, -2.0), DT, age)
+            predicted.append(roiFilter.predicted[0])
+        self.assertAlmostEqual(predicted[1] - predicted[0], horizontal.velocity[0], 6)
+
+    def testKalmanUsesAge(self):
+        ''' a Kalman filter places old measurements back in time instead of leading by their age '''
+        kalman = ConstantVelocityKalman(2, 2.0, 1.0)
+        roiFilter = LocalROIFilter(kalman, 0.65, 0.0)
+        speed = 5.0
+        roiFilter.update(self.origin, DT)
+        for i in range(1, 250):
+            t = i * DT
+            # ROIs captured 0.5 s before we get them
+            roi = self.frame.locationFromNED(speed * (t - 0.5), 0.0, -2.0)
+            roiFilter.update(roi, DT, 0.5)
+        self.assertEqual(roiFilter.predicted[0], kalman.position[0])
+        self.assertTrue(abs(kalman.position[0] - speed * t) < 0.1)
+
+    def testIIR(self):
+        roiFilter = LocalROIFilter(IIRFilter(NUM, DEN, 2), 0.65, 0.0)
+        roiFilter.update(self.origin, DT)
+        target = self.frame.locationFromNED(0.0, 8.0, -2.0)
+        for i in range(500):
+            roiFilter.update(target, DT)
+        (north, east, down) = self.frame.toNED(roiFilter.location())
+        self.assertAlmostEqual(east, 8.0, 3)
+        self.assertAlmostEqual(roiFilter.velocity()[1], 0.0, 3)
@@ -0,0 +1,131 @@
+#  TestROIJitterBuffer.py
+#  shotmanager
+#
+#  Unit tests for the ROI jitter buffer.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+
+import roiJitterBuffer
+from roiJitterBuffer import ROIJitterBuffer
+
+DELAY = 0.1
+
+
+class TestROIJitterBuffer(unittest.TestCase):
+    def setUp(self):
+        self.buffer = ROIJitterBuffer(DELAY)
+
+    def push(self, sequence, arrival, captureTime = None):
+        ''' 5Hz ROIs captured on a clock 1000 s ahead of ours '''
+        if captureTime is None:
+            captureTime = 1000.0 + sequence * 0.2
+        return self.buffer.push(sequence, captureTime, arrival, 37.0 + sequence, -122.0, 0.0)
+
+    def testEmpty(self):
+        self.assertEqual(self.buffer.pop(10.0), None)
+        self.assertEqual(self.buffer.lost(), 0)
+
+    def testHeldForDelay(self):
+        self.push(0, 0.05)
+        self.assertEqual(self.buffer.offset, 0.05 - 1000.0)
+        self.assertEqual(self.buffer.pop(0.1), None)
+        (t, lat, lon, alt) = self.buffer.pop(0.15)
+        self.assertAlmostEqual(t, 0.05, 9)
+        self.assertEqual(lat, 37.0)
+
+    def testReorder(self):
+        self.push(1, 0.25)
+        self.push(0, 0.26)
+        self.assertEqual(self.buffer.reordered, 1)
+        # the offset comes from the least delayed packet
+        self.assertAlmostEqual(self.buffer.offset, 0.05 - 1000.0, 9)
+
+        (t, lat, lon, alt) = self.buffer.pop(0.16)
+        self.assertEqual(lat, 37.0)
+        (t, lat, lon, alt) = self.buffer.pop(0.36)
+        self.assertEqual(lat, 38.0)
+
+    def testTimeAligned(self):
+        ''' jittery arrivals come out on the sender's spacing '''
+        arrivals = [0.05, 0.32, 0.45, 0.72, 0.85]
+        for (i, arrival) in enumerate(arrivals):
+            self.push(i, arrival)
+        self.assertAlmostEqual(self.buffer.maxJitter, 0.07, 9)
+
+        for i in range(5):
+            due = 0.05 + i * 0.2 + DELAY
+            self.assertEqual(self.buffer.pop(due - 0.001), None)
+            (t, lat, lon, alt) = self.buffer.pop(due + 0.001)
+            self.assertAlmostEqual(t, 0.05 + i * 0.2, 9)
+            self.assertEqual(lat, 37.0 + i)
+
+    def testNewestDueWins(self):
+        for i in range(3):
+            self.push(i, 0.05 + i * 0.2)
+        (t, lat, lon, alt) = self.buffer.pop(10.0)
+        self.assertEqual(lat, 39.0)
+        self.assertEqual(self.buffer.pending, [])
+
+    def testLate(self):
+        self.push(1, 0.25)
+        self.buffer.pop(1.0)
+        self.assertFalse(self.push(0, 1.1))
+        self.assertEqual(self.buffer.late, 1)
+
+    def testDuplicate(self):
+        self.push(0, 0.05)
+        self.assertFalse(self.push(0, 0.06))
+        self.assertEqual(self.buffer.duplicates, 1)
+        self.assertEqual(len(self.buffer.pending), 1)
+
+    def testLoss(self):
+        for i in (0, 1, 4, 5):
+            self.push(i, 0.05 + i * 0.2)
+        self.assertEqual(self.buffer.lost(), 2)
+        self.push(2, 0.5)
+        self.assertEqual(self.buffer.lost(), 1)
+
+    def testOverflow(self):
+        for i in range(roiJitterBuffer.ROI_JITTER_CAPACITY + 2):
+            self.push(i, 0.05 + i * 0.2)
+        self.assertEqual(len(self.buffer.pending), roiJitterBuffer.ROI_JITTER_CAPACITY)
+        self.assertEqual(self.buffer.overflows, 2)
+        self.assertEqual(self.buffer.pending[0][0], 2)
+
+    def testRestart(self):
+        ''' a sender restarting its sequence starts the buffer over '''
+        for i in range(1000, 1003):
+            self.push(i, 0.05 + (i - 1000) * 0.2)
+        self.buffer.pop(1.0)
+        # new stream, on a clock that now runs 500 s ahead of ours
+        self.assertTrue(self.push(0, 2.05, captureTime = 502.05))
+        self.assertEqual(self.buffer.restarts, 1)
+        self.assertEqual(self.buffer.late, 0)
+        self.assertAlmostEqual(self.buffer.offset, -500.0, 9)
+        self.assertEqual(self.buffer.pop(2.1), None)
+        (t, lat, lon, alt) = self.buffer.pop(2.16)
+        self.assertAlmostEqual(t, 2.05, 9)
+        self.assertEqual(lat, 37.0)
+        self.push(1, 2.25, captureTime = 502.25)
+        self.assertEqual(self.buffer.lost(), 0)
+
+    def testWrap(self):
+        ''' the uint32 sequence wrapping around isn't late '''
+        self.push(0xffffffff, 0.05, captureTime = 1000.0)
+        self.buffer.pop(1.0)
+        self.assertTrue(self.push(0, 1.05, captureTime = 1001.0))
+        self.assertEqual(self.buffer.late, 0)
+        self.assertEqual(self.buffer.lost(), 0)
@@ -92,4 +92,40 @@ class TestRewind(unittest.TestCase):
 #        # handleRCs shuold call RTL (mode 6)
 #        #self.controller.shotmgr.enterMode.assert_called_with(6)
 #        
-#
\ No newline at end of file
+#
+
+
+class TestLimitToFence(unittest.TestCase):
+    def setUp(self):
+        # RewindShot exits to RTL in its constructor, so test the method on a mock shot
+        self.shot = Mock()
+        self.shot.fenceVersion = None
+        self.shot.shotmgr.geoFenceManager.fenceVersion = 1
+        self.shot.cable.currentP = 0.25
+        self.fenceCheck = self.shot.shotmgr.geoFenceManager.checkCable.return_value
+        self.limitToFence = RewindShot.__dict__['limitToFence']
+
+    def testClearStretch(self):
+        ''' the cable is limited to the clear stretch around us '''
+        self.fenceCheck.reachableRange.return_value = (0.0, 0.5)
+        self.limitToFence(self.shot)
+        self.fenceCheck.reachableRange.assert_called_with(0.25)
+        self.shot.cable.setReachableRange.assert_called_with(0.0, 0.5)
+
+    def testNoFence(self):
+        ''' without fences the whole trail can be flown '''
+        self.shot.shotmgr.geoFenceManager.checkCable.return_value = None
+        self.limitToFence(self.shot)
+        self.shot.cable.setReachableRange.assert_called_with(0.0, 1.0)
+
+    def testBreachedAtP(self):
+        ''' if we're already in a breached stretch, hold where we are '''
+        self.fenceCheck.reachableRange.return_value = None
+        self.limitToFence(self.shot)
+        self.shot.cable.setReachableRange.assert_called_with(0.25, 0.25)
+
+    def testSameVersion(self):
+        ''' nothing is checked again until the fences change '''
+        self.shot.fenceVersion = 1
+        self.limitToFence(self.shot)
+        self.assertFalse(self.shot.shotmgr.geoFenceManager.checkCable.called)
@@ -5,10 +5,14 @@ from mock import call
 from mock import Mock
 from mock import patch
 import os
+import shutil
+import struct
+import tempfile
 from os import sys, path
 import unittest
 
 from dronekit import LocationGlobalRelative, Vehicle
+import app_packet
 import location_helpers
 import rewindManager
 from rewindManager import RewindManager
@@ -17,28 +21,48 @@ from shotManager import ShotManager
 
 class TestRedind(unittest.TestCase):
     def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        patcher = patch('rewindManager.RTL_TRAIL_FILE', os.path.join(self.dir, 'rewind.trail'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
         mgr = mock.create_autospec(ShotManager)
         mgr.buttonManager = Mock()
         self.mock_vehicle = mock.create_autospec(Vehicle)
         self.rewind = RewindManager(self.mock_vehicle, mgr)
         self.mock_vehicle.location.global_relative_frame = LocationGlobalRelative(37.0, -122.0, 10.0)
 
+        self.now = 100.0
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def sample(self, lat, lon, alt = 10.0, dt = 1.0):
+        ''' location update from dronekit, dt seconds after the last one '''
+        self.now += dt
+        with patch('monotonic.monotonic', return_value = self.now):
+            self.rewind.location_callback(self.mock_vehicle, 'location.global_relative_frame', LocationGlobalRelative(lat, lon, alt))
+
+    def fly(self, lat, lon, alt = 10.0):
+        self.sample(lat, lon, alt)
+        self.rewind.updateLocation()
+
     def testInit(self):
         """ Test init """
-        self.assertEqual(self.rewind.bufferSize, int(math.floor(self.rewind.rewindDistance / rewindManager.RTL_STEP_DIST)))
+        self.assertEqual(len(self.rewind.trail), 0)
+        self.assertEqual(self.rewind.trail.maxLength, self.rewind.rewindDistance)
+        self.assertEqual(self.rewind.trail.capacity, rewindManager.RTL_TRAIL_CAPACITY)
         
 
     def testReset(self):
         """ Test reset """
         self.rewind.resetSpline()
-        for num in range(1,self.rewind.bufferSize):
-            self.assertEqual(self.rewind.buffer[num], None)
 
-        self.assertEqual(self.rewind.bufferSize, len(self.rewind.buffer))
-        self.assertEqual(self.rewind.buffer[0].lat, 37.0)
-        self.assertEqual(self.rewind.buffer[0].lon, -122.0)
-        self.assertEqual(self.rewind.buffer[0].alt, 10.0)
-        self.assertEqual(self.rewind.buffer[1], None)
+        self.assertEqual(len(self.rewind.trail), 1)
+        (lat, lon, alt, t) = self.rewind.trail.newest()
+        self.assertEqual(lat, 37.0)
+        self.assertEqual(lon, -122.0)
+        self.assertEqual(alt, 10.0)
         self.assertEqual(self.rewind.did_init, True)
         
         
@@ -51,12 +75,143 @@ class TestRedind(unittest.TestCase):
         self.mock_vehicle.system_status = 'ACTIVE'
         
         self.rewind.resetSpline()
-        self.mock_vehicle.location.global_relative_frame = LocationGlobalRelative(37.00001, -122.00002, 10.0)
-        self.rewind.counter = 4
+        self.fly(37.00001, -122.00002)
+        self.assertEqual(len(self.rewind.trail), 2)
+        (lat, lon, alt, t) = self.rewind.trail.newest()
+        self.assertEqual(lat, 37.00001)
+        self.assertEqual(lon, -122.00002)
+        self.assertEqual(alt, 10.0)
+
+    def testUpdateLocationTooClose(self):
+        """ Locations closer than RTL_STEP_DIST are not stored """
+        self.mock_vehicle.armed = True
+        self.mock_vehicle.system_status = 'ACTIVE'
+
+        self.rewind.resetSpline()
+        self.fly(37.000001, -122.0)
+        self.assertEqual(len(self.rewind.trail), 1)
+
+    def testQueueNextloc(self):
+        """ Breadcrumbs come back newest first, then None and a reset """
+        self.mock_vehicle.armed = True
+        self.mock_vehicle.system_status = 'ACTIVE'
+
+        self.rewind.resetSpline()
+        # fly a right angle so the corner is kept
+        for (lat, lon) in ((37.0001, -122.0), (37.0002, -122.0), (37.0002, -122.0002)):
+            self.fly(lat, lon)
+
+        self.assertEqual(len(self.rewind.trail), 3)
+        locs = [self.rewind.queueNextloc() for i in range(3)]
+        self.assertEqual([(loc.lat, loc.lon) for loc in locs], [(37.0002, -122.0002), (37.0002, -122.0), (37.0, -122.0)])
+
+        self.assertEqual(self.rewind.queueNextloc(), None)
+        # reset back to the vehicle location
+        self.assertEqual(len(self.rewind.trail), 1)
+
+    def testRewindDistanceOption(self):
+        """ The app can ask for kilometer trails """
+        self.rewind.shotmgr.currentShot = 0
+        packet = struct.pack('<BBf', 1, 0, 1500.0)
+        self.rewind.handlePacket(app_packet.SOLO_REWIND_OPTIONS, len(packet), packet)
+        self.assertEqual(self.rewind.rewindDistance, 1500.0)
+        self.assertEqual(self.rewind.trail.maxLength, 1500.0)
+
+        packet = struct.pack('<BBf', 1, 0, 1.0e6)
+        self.rewind.handlePacket(app_packet.SOLO_REWIND_OPTIONS, len(packet), packet)
+        self.assertEqual(self.rewind.rewindDistance, rewindManager.RTL_MAX_DISTANCE)
+
+    def testRestoreAfterRestart(self):
+        """ A new RewindManager picks up the trail and home of the last one """
+        self.mock_vehicle.armed = True
+        self.mock_vehicle.system_status = 'ACTIVE'
+
+        self.rewind.resetSpline()
+        for (lat, lon) in ((37.0001, -122.0), (37.0002, -122.0), (37.0002, -122.0002)):
+            self.fly(lat, lon)
+        msg = Mock(x = 37.0, y = -122.0, z = 5.0)
+        self.rewind.shotmgr.appMgr = Mock()
+        self.rewind.handleMissionItem(self.mock_vehicle, 'MISSION_ITEM', msg)
+
+        restarted = RewindManager(self.mock_vehicle, self.rewind.shotmgr)
+        self.assertTrue(restarted.restore())
+        self.assertTrue(restarted.did_init)
+        self.assertEqual(len(restarted.trail), 3)
+        self.assertEqual(restarted.trail.newest(), self.rewind.trail.newest())
+        self.assertEqual((restarted.homeLocation.lat, restarted.homeLocation.lon, restarted.homeLocation.alt), (37.0, -122.0, 5.0))
+
+    def testRequestedResetInMainLoop(self):
+        """ A reset asked for from the dronekit thread happens on the next update """
+        self.mock_vehicle.armed = True
+        self.mock_vehicle.system_status = 'ACTIVE'
+        self.rewind.resetSpline()
+        for (lat, lon) in ((37.0001, -122.0), (37.0002, -122.0), (37.0002, -122.0002)):
+            self.fly(lat, lon)
+        self.assertEqual(len(self.rewind.trail), 3)
+
+        self.rewind.requestReset()
+        self.assertEqual(len(self.rewind.trail), 3)
         self.rewind.updateLocation()
-        self.assertEqual(self.rewind.currentIndex, 1)
-        self.assertEqual(self.rewind.buffer[1].lat, 37.00001)
-        self.assertEqual(self.rewind.buffer[1].lon, -122.00002)
-        self.assertEqual(self.rewind.buffer[1].alt, 10.0)
+        self.assertEqual(len(self.rewind.trail), 1)
+        self.assertFalse(self.rewind.resetRequested)
+
+    def testRestoreCancelsReset(self):
+        """ An armed report before the restore doesn't wipe the restored trail """
+        self.mock_vehicle.armed = True
+        self.mock_vehicle.system_status = 'ACTIVE'
+        self.rewind.resetSpline()
+        for (lat, lon) in ((37.0001, -122.0), (37.0002, -122.0), (37.0002, -122.0002)):
+            self.fly(lat, lon)
+
+        restarted = RewindManager(self.mock_vehicle, self.rewind.shotmgr)
+        restarted.requestReset()
+        self.assertTrue(restarted.restore())
+        restarted.updateLocation()
+        self.assertEqual(len(restarted.trail), 3)
 
+    def testRestoreNothing(self):
+        self.assertFalse(self.rewind.restore())
 
+    def testSampleTimeDecimation(self):
+        """ Location updates faster than RTL_SAMPLE_INTERVAL are skipped """
+        self.sample(37.0, -122.0)
+        self.sample(37.0001, -122.0, dt = rewindManager.RTL_SAMPLE_INTERVAL / 2)
+        self.assertEqual(self.rewind.samplesConsidered, 2)
+        self.assertEqual(self.rewind.samplesQueued, 1)
+
+    def testSampleDistanceDecimation(self):
+        """ Location updates closer than RTL_STEP_DIST are skipped """
+        self.sample(37.0, -122.0)
+        self.sample(37.000001, -122.0)
+        self.sample(37.0001, -122.0)
+        self.assertEqual(self.rewind.samplesConsidered, 3)
+        self.assertEqual(self.rewind.samplesQueued, 2)
+
+    def testSampleQueueFull(self):
+        """ Samples the main loop can't keep up with are dropped and counted """
+        for i in range(rewindManager.RTL_SAMPLE_QUEUE_SIZE + 3):
+            self.sample(37.0 + i * 0.0001, -122.0)
+        self.assertEqual(self.rewind.samplesQueued, rewindManager.RTL_SAMPLE_QUEUE_SIZE)
+        self.assertEqual(self.rewind.samplesDropped, 3)
+
+    def testSamplesStoredInMainLoop(self):
+        """ The trail only changes when the main loop drains the samples """
+        self.mock_vehicle.armed = True
+        self.mock_vehicle.system_status = 'ACTIVE'
+        self.rewind.resetSpline()
+
+        self.sample(37.0001, -122.0)
+        self.sample(37.0001, -122.0001)
+        self.assertEqual(len(self.rewind.trail), 1)
+
+        self.rewind.updateLocation()
+        self.assertEqual(len(self.rewind.trail), 3)
+        self.assertEqual(self.rewind.samplesStored, 2)
+        self.assertTrue(self.rewind.samples.empty())
+
+    def testSamplesDiscardedOnGround(self):
+        self.mock_vehicle.armed = False
+        self.sample(37.0001, -122.0)
+        self.rewind.updateLocation()
+        self.assertTrue(self.rewind.samples.empty())
+        self.assertEqual(self.rewind.samplesStored, 0)
@@ -5,6 +5,10 @@ from mock import Mock
 from mock import patch
 import os
 from os import sys, path
+import hashlib
+import shutil
+import tempfile
+import threading
 
 import unittest
 
@@ -21,7 +25,7 @@ class TestWriteSettingsThread(unittest.TestCase):
 
     def testLocks(self):
         """ Make sure we lock/unlock """
-        settings.writeSettingsThread("a", "b")
+        settings.writeSettings({"a" : "b"})
         self.lock.acquire.assert_called_with()
         self.lock.release.assert_called_with()
 
@@ -30,11 +34,87 @@ class TestWriteSettingsThread(unittest.TestCase):
         with patch('ConfigParser.SafeConfigParser') as patchedParser:
             parser = Mock()
             patchedParser.return_value = parser
-            settings.writeSettingsThread("aaa", "bbb")
+            settings.writeSettings({"aaa" : "bbb"})
             parser.read.assert_called_with("Test/shotmanager.conf")
             parser.set.assert_called_with("shotManager", "aaa", "bbb")
 
 
+class TestWriteSettingsFile(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        settings.CONFIG_FILE = os.path.join(self.dir, "shotmanager.conf")
+        settings.CONFIG_FILE_BACKUP = os.path.join(self.dir, "shotmanager.back")
+        settings.settingsLock = threading.Lock()
+        with open(settings.CONFIG_FILE, 'w') as f:
+            f.write("[shotManager]\nA = 1, 2\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testWritesAllValues(self):
+        """ Several settings go out in one write """
+        settings.writeSettings({"A" : "3, 4", "B" : "5, 6"})
+        with open(settings.CONFIG_FILE) as f:
+            contents = f.read()
+        self.assertTrue("A = 3, 4" in contents)
+        self.assertTrue("B = 5, 6" in contents)
+
+    def testMd5(self):
+        """ The md5 file is what md5sum would write """
+        settings.writeSettings({"A" : "3, 4"})
+        with open(settings.CONFIG_FILE, 'rb') as f:
+            digest = hashlib.md5(f.read()).hexdigest()
+        with open(settings.CONFIG_FILE + ".md5") as f:
+            self.assertEqual(f.read(), "%s  %s\n" % (digest, settings.CONFIG_FILE))
+
+    def testNoLeftovers(self):
+        """ The backup and temp files are gone once the write is done """
+        settings.writeSettings({"A" : "3, 4"})
+        self.assertEqual(sorted(os.listdir(self.dir)), ["shotmanager.conf", "shotmanager.conf.md5"])
+
+    def testFailedWriteKeepsFile(self):
+        """ If the new file can't be written the old one is untouched """
+        with patch('os.fsync', side_effect = OSError("disk full")):
+            settings.writeSettings({"A" : "3, 4"})
+        with open(settings.CONFIG_FILE) as f:
+            self.assertEqual(f.read(), "[shotManager]\nA = 1, 2\n")
+        self.assertFalse(settings.settingsLock.locked())
+
+
+class TestWriteSetting(unittest.TestCase):
+    def setUp(self):
+        # earlier tests may have left a write queued
+        settings.writerThread = None
+        settings.pendingSettings.clear()
+        patcher = patch('settings.writeSettings')
+        self.addCleanup(patcher.stop)
+        self.writeSettings = patcher.start()
+        thread = patch('threading.Thread')
+        self.addCleanup(thread.stop)
+        self.thread = thread.start()
+
+    def tearDown(self):
+        settings.writerThread = None
+        settings.pendingSettings.clear()
+
+    def testBatched(self):
+        """ Settings changed together are written once """
+        settings.writeSetting("A", "1, 2")
+        settings.writeSetting("B", "3, 4")
+        settings.writeSetting("A", "5, 6")
+        self.assertEqual(self.thread.call_count, 1)
+        self.assertFalse(self.writeSettings.called)
+        settings.flushSettings()
+        self.writeSettings.assert_called_once_with({"A" : "5, 6", "B" : "3, 4"})
+        settings.flushSettings()
+        self.assertEqual(self.writeSettings.call_count, 1)
+
+    def testReadPending(self):
+        """ A setting waiting to be written reads back as its new value """
+        settings.writeSetting("A", "1, 2")
+        self.assertEqual(settings.readSetting("A"), "1, 2")
+
+
 class TestReadSetting(unittest.TestCase):
     def setUp(self):
         mockParser = patch('ConfigParser.SafeConfigParser')
@@ -42,6 +122,7 @@ class TestReadSetting(unittest.TestCase):
         mock = mockParser.start()
         self.parser = Mock()
         settings.CONFIG_FILE = "Test/shotmanager.conf"
+        settings.configCache.clear()
         mock.return_value = self.parser
 
     def testReadSetting(self):
@@ -60,3 +141,54 @@ class TestReadSetting(unittest.TestCase):
             pass
         else:
             self.assertFalse(True)
+
+
+class TestConfigCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        settings.CONFIG_FILE = os.path.join(self.dir, "shotmanager.conf")
+        settings.CONFIG_FILE_BACKUP = os.path.join(self.dir, "shotmanager.back")
+        settings.settingsLock = threading.Lock()
+        settings.pendingSettings.clear()
+        settings.configCache.clear()
+        self.write("[shotManager]\nA = 1, 2\nB = 3, 4\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        settings.pendingSettings.clear()
+
+    def write(self, contents, mtime = 1000.0):
+        with open(settings.CONFIG_FILE, 'w') as f:
+            f.write(contents)
+        os.utime(settings.CONFIG_FILE, (mtime, mtime))
+
+    def testParsedOnce(self):
+        """ Reading several settings parses the file once """
+        with patch('ConfigParser.SafeConfigParser.read', autospec = True, side_effect = settings.ConfigParser.SafeConfigParser.read) as read:
+            self.assertEqual(settings.readSetting("A"), "1, 2")
+            self.assertEqual(settings.readSetting("B"), "3, 4")
+        self.assertEqual(read.call_count, 1)
+
+    def testModifiedFileReread(self):
+        """ A change to the file's mtime picks up the new contents """
+        settings.readSetting("A")
+        self.write("[shotManager]\nA = 5, 6\nB = 3, 4\n", 2000.0)
+        self.assertEqual(settings.readSetting("A"), "5, 6")
+
+    def testResizedFileReread(self):
+        """ A change to the file's size picks up the new contents """
+        settings.readSetting("A")
+        self.write("[shotManager]\nA = 15, 6\nB = 3, 4\n")
+        self.assertEqual(settings.readSetting("A"), "15, 6")
+
+    def testWriteInvalidates(self):
+        """ Writing through the settings module drops the cached copy """
+        settings.readSetting("A")
+        settings.writeSettings({"A" : "7, 8"})
+        os.utime(settings.CONFIG_FILE, (1000.0, 1000.0))
+        self.assertEqual(settings.readSetting("A"), "7, 8")
+
+    def testReadSettings(self):
+        """ A whole section can be read at once, including pending changes """
+        settings.pendingSettings["B"] = "9, 9"
+        self.assertEqual(settings.readSettings(), {"a" : "1, 2", "b" : "9, 9"})
@@ -0,0 +1,91 @@
+#  TestShotLogger.py
+#  shotmanager
+#
+#  Unit tests for the background, rate limited logger.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+
+from mock import patch
+
+import shotLogger
+from shotLogger import Logger
+
+
+class TestLogger(unittest.TestCase):
+    def setUp(self):
+        self.logger = Logger(threaded = False)
+        self.messages = []
+        # xlog is the logging module's shared "shot" logger, so patch rather than assign
+        handle = patch.object(self.logger.xlog, 'handle', side_effect = lambda record: self.messages.append(record.getMessage()))
+        self.addCleanup(handle.stop)
+        handle.start()
+
+    def logAt(self, now, data):
+        with patch('monotonic.monotonic', return_value = now):
+            self.logger.log(data)
+
+    def testQueuedUntilWritten(self):
+        self.logger.log("hello\0")
+        self.assertEqual(self.messages, [])
+        self.logger.drain()
+        self.assertEqual(self.messages, ["hello"])
+
+    def testRecordKeepsCaller(self):
+        self.logger.log("where")
+        (created, pathname, lineno, message) = self.logger.queue.get_nowait()
+        self.assertEqual(pathname, __file__.replace('.pyc', '.py'))
+
+    def testRateLimited(self):
+        for i in range(shotLogger.LOG_RATE_LIMIT + 5):
+            self.logAt(100.0, "spam %d" % i)
+        self.logAt(100.0 + shotLogger.LOG_RATE_PERIOD, "after")
+        self.logger.drain()
+        self.assertEqual(len(self.messages), shotLogger.LOG_RATE_LIMIT + 1)
+        self.assertEqual(self.messages[-1], "after (5 suppressed)")
+        self.assertEqual(self.logger.suppressed, 5)
+
+    def testRateLimitPerCallSite(self):
+        with patch('monotonic.monotonic', return_value = 100.0):
+            for i in range(shotLogger.LOG_RATE_LIMIT):
+                self.logger.log("first site")
+            self.logger.log("second site")
+        self.logger.drain()
+        self.assertEqual(self.messages[-1], "second site")
+        self.assertEqual(self.logger.suppressed, 0)
+
+    def testDropWhenFull(self):
+        with patch('shotLogger.LOG_RATE_LIMIT', shotLogger.LOG_QUEUE_SIZE * 2):
+            for i in range(shotLogger.LOG_QUEUE_SIZE + 3):
+                self.logAt(100.0, "flood")
+        self.assertEqual(self.logger.dropped, 3)
+        self.logger.drain()
+        self.assertEqual(self.messages[0], "[log]: queue full, dropped 3 messages")
+        self.assertEqual(len(self.messages), shotLogger.LOG_QUEUE_SIZE + 1)
+
+    def testNotQueuedWhenDisabled(self):
+        with patch.object(self.logger.xlog, 'isEnabledFor', return_value = False):
+            self.logger.log("quiet")
+        self.assertTrue(self.logger.queue.empty())
+
+
+class TestLoggerThread(unittest.TestCase):
+    def testWrittenInBackground(self):
+        logger = Logger()
+        written = []
+        with patch.object(logger.xlog, 'handle', side_effect = lambda record: written.append(record.getMessage())):
+            logger.log("background")
+            logger.stop()
+        self.assertEqual(written, ["background"])
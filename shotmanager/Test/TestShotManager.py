@@ -6,13 +6,16 @@ from mock import patch
 import os
 from os import sys, path
 from pymavlink import mavutil
+import shutil
 import socket
 import struct
+import tempfile
 import unittest
 
 from dronekit import Vehicle, LocationGlobalRelative, VehicleMode
 sys.path.append(os.path.realpath('..'))
 import app_packet
+import rewindManager
 from orbit import OrbitShot
 from selfie import SelfieShot
 from follow import FollowShot
@@ -28,6 +31,20 @@ import __builtin__
 
 ERROR = 0.1
 
+# keep the breadcrumbs of the ShotManagers built here out of the real trail file
+trailDir = None
+trailPatcher = None
+
+def setUpModule():
+    global trailDir, trailPatcher
+    trailDir = tempfile.mkdtemp()
+    trailPatcher = patch.object(rewindManager, 'RTL_TRAIL_FILE', os.path.join(trailDir, 'rewind.trail'))
+    trailPatcher.start()
+
+def tearDownModule():
+    trailPatcher.stop()
+    shutil.rmtree(trailDir)
+
 class TestEKFCallback(unittest.TestCase):
     @patch.object(socket.socket, 'bind')
     def setUp(self, mock_bind):
@@ -70,6 +87,7 @@ class TestArmedCallback(unittest.TestCase):
         self.mgr.armed_callback( self.mgr.vehicle, "armed", True)
         self.assertTrue( self.mgr.last_armed )
         self.mgr.buttonManager.setButtonMappings.assert_called_with()
+        self.mgr.rewindManager.requestReset.assert_called_with()
 
     def testArmedCallbackNoChange(self):
         """ Don't change button mappings if our armed state doesn't change """
@@ -92,6 +110,22 @@ class TestArmedCallback(unittest.TestCase):
         self.mgr.armed_callback( self.mgr.vehicle, "armed", False )
         self.assertTrue( self.mgr.goproManager.handleRecordCommand.called )
 
+    @patch.object(socket.socket, 'bind')
+    def testArmedAfterInAirRestart(self, mock_bind):
+        """ A restart in the air keeps the restored Rewind trail when armed is reported """
+        mgr = shotManager.ShotManager()
+        vehicle = mock.create_autospec(Vehicle)
+        vehicle.system_status = 'ACTIVE'
+        vehicle.armed = True
+        with patch('rewindManager.RewindManager.restore') as restore:
+            mgr.Start(vehicle)
+        restore.assert_called_with()
+        self.assertTrue( mgr.last_armed )
+        mgr.rewindManager = Mock()
+        mgr.buttonManager = Mock()
+        mgr.armed_callback( vehicle, "armed", True )
+        self.assertFalse( mgr.rewindManager.requestReset.called )
+
 class TestEnterShot(unittest.TestCase):
     @patch.object(socket.socket, 'bind')
     def setUp(self, mock_bind):
@@ -159,6 +193,15 @@ class TestEnterShot(unittest.TestCase):
         """ No shot to Follow """
         self.mgr.enterShot( shots.APP_SHOT_FOLLOW )
         self.assertTrue( isinstance(self.mgr.curController, FollowShot) )
+        self.assertTrue( self.mgr.curController.socket in self.mgr.inputs )
+
+    def testExitFollow(self):
+        """ Leaving Follow stops selecting on its ROI socket """
+        self.mgr.enterShot( shots.APP_SHOT_FOLLOW )
+        follow = self.mgr.curController
+        follow.closeSocket = Mock()
+        self.mgr.enterShot( shots.APP_SHOT_NONE )
+        follow.closeSocket.assert_called_with()
 
     def testNoShot(self):
         """ Entering no shot """
@@ -0,0 +1,117 @@
+#  TestVectors.py
+#  shotmanager
+#
+#  Unit tests for Vector2 and Vector3.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+
+from vector2 import Vector2
+from vector3 import Vector3
+
+
+class TestVector3InPlace(unittest.TestCase):
+    def testIaddKeepsIdentity(self):
+        '''+= modifies the left hand vector rather than allocating'''
+        v = Vector3(1, 2, 3)
+        before = id(v)
+        v += Vector3(1, 1, 1)
+        self.assertEqual(id(v), before)
+        self.assertEqual(v, Vector3(2, 3, 4))
+
+    def testIaddDoesNotTouchOperand(self):
+        '''+= leaves the right hand vector alone'''
+        v = Vector3(1, 2, 3)
+        w = Vector3(1, 1, 1)
+        v += w
+        self.assertEqual(w, Vector3(1, 1, 1))
+
+    def testIsub(self):
+        v = Vector3(1, 2, 3)
+        v -= Vector3(1, 1, 1)
+        self.assertEqual(v, Vector3(0, 1, 2))
+
+    def testImul(self):
+        v = Vector3(1, 2, 3)
+        before = id(v)
+        v *= 2.0
+        self.assertEqual(id(v), before)
+        self.assertEqual(v, Vector3(2., 4., 6.))
+
+    def testIdiv(self):
+        v = Vector3(2., 4., 6.)
+        v /= 2.0
+        self.assertEqual(v, Vector3(1., 2., 3.))
+
+    def testMatchesAllocatingOps(self):
+        '''In-place results match the allocating operators exactly'''
+        a = Vector3(0.1, -2.7, 13.3)
+        b = Vector3(5.5, 0.3, -1.1)
+        expected = (a + b) * 0.7 - b
+        v = Vector3(a.x, a.y, a.z)
+        v += b
+        v *= 0.7
+        v -= b
+        self.assertEqual(v, expected)
+
+    def testSet(self):
+        v = Vector3()
+        self.assertIs(v.set(4, 5, 6), v)
+        self.assertEqual(v, Vector3(4, 5, 6))
+
+    def testLengthSquared(self):
+        self.assertEqual(Vector3(1, 2, 2).lengthSquared(), 9)
+
+    def testNoDict(self):
+        '''Slotted vectors can't grow new attributes'''
+        v = Vector3()
+        with self.assertRaises(AttributeError):
+            v.w = 1
+
+    def testIter(self):
+        x, y, z = Vector3(1, 2, 3)
+        self.assertEqual((x, y, z), (1, 2, 3))
+
+
+class TestVector2InPlace(unittest.TestCase):
+    def testIadd(self):
+        v = Vector2(1, 2)
+        before = id(v)
+        v += Vector2(3, 4)
+        self.assertEqual(id(v), before)
+        self.assertEqual((v.x, v.y), (4, 6))
+
+    def testIsub(self):
+        v = Vector2(1, 2)
+        v -= Vector2(3, 4)
+        self.assertEqual((v.x, v.y), (-2, -2))
+
+    def testImul(self):
+        v = Vector2(1, 2)
+        v *= 3
+        self.assertEqual((v.x, v.y), (3, 6))
+
+    def testSet(self):
+        v = Vector2(0, 0)
+        self.assertIs(v.set(4, 5), v)
+        self.assertEqual((v.x, v.y), (4, 5))
+
+    def testLengthSquared(self):
+        self.assertEqual(Vector2(3, 4).lengthSquared(), 25)
+
+    def testNoDict(self):
+        v = Vector2(0, 0)
+        with self.assertRaises(AttributeError):
+            v.z = 1
@@ -106,7 +106,7 @@ class appManager():
         self.broadcastShotToApp(self.shotMgr.currentShot)
 
         self.shotMgr.buttonManager.setButtonMappings() # called to un-grey out Artoo buttons
-        self.shotMgr.goproManager.sendState() # send gopro state to app
+        self.shotMgr.goproManager.appConnected() # send gopro state to app
 
 
     def disconnectClient(self):
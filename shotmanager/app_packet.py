@@ -18,6 +18,8 @@ SOLO_MESSAGE_SET_CURRENT_SHOT = 1
 
 # send a location
 SOLO_MESSAGE_LOCATION = 2
+# send a location with the sender's capture time and a sequence number
+SOLO_MESSAGE_LOCATION_V2 = 102
 # record a position (for cable cam)
 SOLO_RECORD_POSITION = 3
 SOLO_CABLE_CAM_OPTIONS = 4
@@ -45,6 +47,7 @@ SOLO_SPLINE_PLAYBACK_STATUS = 54
 SOLO_SPLINE_PATH_SETTINGS = 55
 SOLO_SPLINE_DURATIONS = 56
 SOLO_SPLINE_ATTACH = 57
+SOLO_SPLINE_PATH_PREVIEW = 58
 
 # Artoo-App messages start at 100
 
@@ -83,6 +86,8 @@ GOPRO_V2_STATE = 5006
 GOPRO_REQUEST_STATE = 5007
 GOPRO_SET_EXTENDED_REQUEST = 5009
 GOPRO_PHOTO = 5020 # Added to Open Solo for solex app photo logging
+GOPRO_STATE_DELTA = 5021 # changed GOPRO_V2_STATE fields, as (index, value) byte pairs
+GOPRO_SET_DELTA_ENABLED = 5022 # app asks for GOPRO_STATE_DELTA instead of full state
 
 
 # enums for packet types
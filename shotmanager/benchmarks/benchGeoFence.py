@@ -0,0 +1,89 @@
+#  benchGeoFence.py
+#  shotmanager
+#
+#  Compares the linear GeoFenceHelper scans against the NumPy edge kernels and the
+#  grid indexed FenceGeometry.
+#  Usage: python benchmarks/benchGeoFence.py
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import math
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from GeoFenceHelper import *
+from vector2 import Vector2
+
+VERTEX_COUNTS = [100, 1000, 5000]
+NUM_QUERIES = 200
+RADIUS = 500.0 # meters
+REACH = 15.0 # meters, latency distance at 10 m/s
+REPEAT = 3
+
+
+def noisyCircle(vertexCount):
+    polygon = []
+    for i in range(vertexCount):
+        angle = 2.0 * math.pi * i / vertexCount
+        r = RADIUS * random.uniform(0.8, 1.0)
+        polygon.append(Vector2(r * math.cos(angle), r * math.sin(angle)))
+    polygon.append(polygon[0])
+    return polygon
+
+
+def best(func):
+    return min(timeit.repeat(func, number = 1, repeat = REPEAT))
+
+
+if __name__ == '__main__':
+    random.seed(94739473)
+    points = [Vector2(random.uniform(-RADIUS, RADIUS), random.uniform(-RADIUS, RADIUS)) for i in range(NUM_QUERIES)]
+    rays = []
+    for p in points:
+        angle = random.uniform(0, 2.0 * math.pi)
+        rays.append((p, Vector2(p.x + 10.0 * math.cos(angle), p.y + 10.0 * math.sin(angle))))
+
+    print "%d queries per row, best of %d, times per query" % (NUM_QUERIES, REPEAT)
+    print "%-8s %-16s %12s %12s %8s" % ("vertices", "query", "linear (us)", "fast (us)", "speedup")
+    for vertexCount in VERTEX_COUNTS:
+        polygon = noisyCircle(vertexCount)
+        buildTime = best(lambda: FenceGeometry(polygon))
+        geometry = FenceGeometry(polygon)
+
+        benchmarks = [
+            ('winding number',
+                lambda: [GeoFenceHelper.isPointInPolygon(p, polygon) for p in points],
+                lambda: [geometry.windingNumber(p) for p in points]),
+            ('closest point',
+                lambda: [GeoFenceHelper.closestPointToPolygon(p, polygon) for p in points],
+                lambda: [geometry.closestPoint(p) for p in points]),
+            ('ray cast',
+                lambda: [GeoFenceHelper.closestCollisionVectorToPolygon(ray, polygon) for ray in rays],
+                lambda: [geometry.closestCollision(ray, geometry.edgesNear(ray[0], REACH)) for ray in rays]),
+            ('kernel point',
+                lambda: [GeoFenceHelper.closestPointToPolygon(p, polygon) for p in points],
+                lambda: [GeoFenceHelper.closestPointToEdges(p, geometry.xs, geometry.ys) for p in points]),
+            ('kernel ray cast',
+                lambda: [GeoFenceHelper.closestCollisionVectorToPolygon(ray, polygon) for ray in rays],
+                lambda: [GeoFenceHelper.closestCollisionToEdges(ray, geometry.xs, geometry.ys) for ray in rays]),
+        ]
+
+        print "%-8d %-16s %25.0f ms" % (vertexCount, "build", buildTime * 1000.)
+        for name, linear, grid in benchmarks:
+            linearTime = best(linear) / NUM_QUERIES
+            gridTime = best(grid) / NUM_QUERIES
+            print "%-8d %-16s %12.1f %12.1f %7.1fx" % (vertexCount, name, linearTime * 1e6, gridTime * 1e6, linearTime / gridTime)
@@ -0,0 +1,74 @@
+#  benchLocationHelpers.py
+#  shotmanager
+#
+#  Compares the scalar and batched geodesy helpers on 10k point inputs.
+#  Usage: python benchmarks/benchLocationHelpers.py
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from dronekit import LocationGlobalRelative
+import location_helpers
+
+NUM_POINTS = 10000
+REPEAT = 5
+
+random.seed(94739473)
+starts = [LocationGlobalRelative(random.uniform(-70, 70), random.uniform(-180, 180), random.uniform(0, 100)) for i in range(NUM_POINTS)]
+ends = [LocationGlobalRelative(loc.lat + random.uniform(-0.01, 0.01), loc.lon + random.uniform(-0.01, 0.01), random.uniform(0, 100)) for loc in starts]
+
+lat1 = [loc.lat for loc in starts]
+lon1 = [loc.lon for loc in starts]
+alt1 = [loc.alt for loc in starts]
+lat2 = [loc.lat for loc in ends]
+lon2 = [loc.lon for loc in ends]
+alt2 = [loc.alt for loc in ends]
+
+frame = location_helpers.LocalFrame(starts[0])
+
+BENCHMARKS = [
+    ('getDistanceFromPoints',
+        lambda: [location_helpers.getDistanceFromPoints(a, b) for a, b in zip(starts, ends)],
+        lambda: location_helpers.getDistanceFromPointsArray(lat1, lon1, lat2, lon2)),
+    ('getDistanceFromPoints3d',
+        lambda: [location_helpers.getDistanceFromPoints3d(a, b) for a, b in zip(starts, ends)],
+        lambda: location_helpers.getDistanceFromPoints3dArray(lat1, lon1, alt1, lat2, lon2, alt2)),
+    ('calcAzimuthFromPoints',
+        lambda: [location_helpers.calcAzimuthFromPoints(a, b) for a, b in zip(starts, ends)],
+        lambda: location_helpers.calcAzimuthFromPointsArray(lat1, lon1, lat2, lon2)),
+    ('getVectorFromPoints',
+        lambda: [location_helpers.getVectorFromPoints(a, b) for a, b in zip(starts, ends)],
+        lambda: location_helpers.getVectorFromPointsArray(lat1, lon1, alt1, lat2, lon2, alt2)),
+    ('LocalFrame.toNED',
+        lambda: [frame.toNED(b) for b in ends],
+        lambda: frame.toNEDArrays(lat2, lon2, alt2)),
+]
+
+
+def best(func):
+    return min(timeit.repeat(func, number = 1, repeat = REPEAT))
+
+
+if __name__ == '__main__':
+    print "%d points, best of %d" % (NUM_POINTS, REPEAT)
+    print "%-26s %12s %12s %8s" % ("function", "scalar (ms)", "array (ms)", "speedup")
+    for name, scalar, array in BENCHMARKS:
+        scalarTime = best(scalar)
+        arrayTime = best(array)
+        print "%-26s %12.2f %12.2f %7.1fx" % (name, scalarTime * 1000., arrayTime * 1000., scalarTime / arrayTime)
@@ -0,0 +1,120 @@
+#  benchVectors.py
+#  shotmanager
+#
+#  Compares classic, dict backed vectors against slotted Vector3 and in-place math.
+#  Usage: python benchmarks/benchVectors.py
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from vector3 import Vector3
+
+NUM_OPS = 100000
+REPEAT = 5
+
+
+# Vector3 as it was before __slots__ and the in-place operators
+class ClassicVector3:
+    def __init__(self, x=0, y=0, z=0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __add__(self, vector):
+        return ClassicVector3(self.x + vector.x, self.y + vector.y, self.z + vector.z)
+
+    def __mul__(self, scalar):
+        return ClassicVector3(self.x * scalar, self.y * scalar, self.z * scalar)
+
+    def __rmul__(self, scalar):
+        return ClassicVector3(scalar * self.x, scalar * self.y, scalar * self.z)
+
+
+def classicConstruct():
+    for i in xrange(NUM_OPS):
+        ClassicVector3(1., 2., 3.)
+
+
+def slottedConstruct():
+    for i in xrange(NUM_OPS):
+        Vector3(1., 2., 3.)
+
+
+def classicAccumulate():
+    pos = ClassicVector3()
+    vel = ClassicVector3(1., 2., 3.)
+    for i in xrange(NUM_OPS):
+        pos = pos + vel * 0.04
+
+
+def slottedAccumulate():
+    pos = Vector3()
+    vel = Vector3(1., 2., 3.)
+    step = Vector3()
+    for i in xrange(NUM_OPS):
+        step.set(vel.x, vel.y, vel.z)
+        step *= 0.04
+        pos += step
+
+
+# catmull-rom position, the per-tick spline evaluation
+def classicSpline():
+    P1, A, B, C = ClassicVector3(1., 2., 3.), ClassicVector3(.1, .2, .3), ClassicVector3(.4, .5, .6), ClassicVector3(.7, .8, .9)
+    for i in xrange(NUM_OPS):
+        u = 0.5
+        P1 + (0.5 * u) * (C + u * (B + u * A))
+
+
+def slottedSpline():
+    P1, A, B, C = Vector3(1., 2., 3.), Vector3(.1, .2, .3), Vector3(.4, .5, .6), Vector3(.7, .8, .9)
+    for i in xrange(NUM_OPS):
+        u = 0.5
+        pos = A * u
+        pos += B
+        pos *= u
+        pos += C
+        pos *= 0.5 * u
+        pos += P1
+
+
+BENCHMARKS = [
+    ('construct', classicConstruct, slottedConstruct),
+    ('accumulate', classicAccumulate, slottedAccumulate),
+    ('spline position', classicSpline, slottedSpline),
+]
+
+
+def best(func):
+    return min(timeit.repeat(func, number = 1, repeat = REPEAT))
+
+
+def instanceBytes(vector):
+    size = sys.getsizeof(vector)
+    if hasattr(vector, '__dict__'):
+        size += sys.getsizeof(vector.__dict__)
+    return size
+
+
+if __name__ == '__main__':
+    print "bytes per vector: classic %d, slotted %d" % (instanceBytes(ClassicVector3()), instanceBytes(Vector3()))
+    print "%d ops, best of %d" % (NUM_OPS, REPEAT)
+    print "%-26s %12s %12s %8s" % ("benchmark", "classic (ms)", "slotted (ms)", "speedup")
+    for name, classic, slotted in BENCHMARKS:
+        classicTime = best(classic)
+        slottedTime = best(slotted)
+        print "%-26s %12.2f %12.2f %7.1fx" % (name, classicTime * 1000., slottedTime * 1000., classicTime / slottedTime)
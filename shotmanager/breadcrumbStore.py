@@ -0,0 +1,104 @@
+#  breadcrumbStore.py
+#  shotmanager
+#
+#  Memory-mapped copy of the Rewind breadcrumbs and home location.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import mmap
+import os
+import struct
+
+TRAIL_MAGIC = 'SRW1'
+
+# magic, capacity, ring start, ring count, path length (m), max length (m)
+TRAIL_HEADER = struct.Struct('<4sIIIdd')
+# valid, lat, lon, alt
+TRAIL_HOME = struct.Struct('<Bddd')
+# lat, lon, alt, time (s), path length (m)
+TRAIL_RECORD = struct.Struct('<ddddd')
+
+TRAIL_HOME_OFFSET = TRAIL_HEADER.size
+TRAIL_RECORDS_OFFSET = 64
+
+
+class BreadcrumbStore():
+    '''Mirrors a BreadcrumbTrail into a fixed-size memory-mapped file.
+
+    Each append touches one record and the header, so it is O(1) and never
+    fsyncs: the shared mapping lives in the page cache and survives a
+    shotmanager crash, which is all an in-air restart needs. Records are
+    written before the header that points at them.
+    '''
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self.size = TRAIL_RECORDS_OFFSET + capacity * TRAIL_RECORD.size
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0644)
+        try:
+            if os.fstat(fd).st_size != self.size:
+                os.ftruncate(fd, self.size)
+            self.map = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        self.map.close()
+
+    def writeRing(self, trail):
+        TRAIL_HEADER.pack_into(self.map, 0, TRAIL_MAGIC, self.capacity, trail.start, trail.count, trail.pathLength, trail.maxLength)
+
+    def writePoint(self, trail, index):
+        TRAIL_RECORD.pack_into(self.map, TRAIL_RECORDS_OFFSET + index * TRAIL_RECORD.size,
+                               trail.lats[index], trail.lons[index], trail.alts[index], trail.times[index], trail.lengths[index])
+
+    def writeTrail(self, trail):
+        '''Writes every point of trail, then its header'''
+        for i in range(trail.count):
+            self.writePoint(trail, trail._index(i))
+        self.writeRing(trail)
+
+    def restore(self, trail):
+        '''Loads the stored ring into trail. Returns False, leaving trail alone,
+        if the file does not hold a trail of the same capacity'''
+        (magic, capacity, start, count, pathLength, maxLength) = TRAIL_HEADER.unpack_from(self.map, 0)
+        if magic != TRAIL_MAGIC or capacity != trail.capacity or start >= capacity or count > capacity:
+            return False
+
+        for i in range(count):
+            index = (start + i) % capacity
+            (trail.lats[index], trail.lons[index], trail.alts[index], trail.times[index], trail.lengths[index]) = \
+                TRAIL_RECORD.unpack_from(self.map, TRAIL_RECORDS_OFFSET + index * TRAIL_RECORD.size)
+        trail.start = start
+        trail.count = count
+        trail.pathLength = pathLength
+        trail.maxLength = maxLength
+        trail.window = []
+        return True
+
+    def writeHome(self, home):
+        '''Stores home as a (lat, lon, alt) tuple, or clears it if home is None'''
+        if home is None:
+            TRAIL_HOME.pack_into(self.map, TRAIL_HOME_OFFSET, 0, 0.0, 0.0, 0.0)
+        else:
+            TRAIL_HOME.pack_into(self.map, TRAIL_HOME_OFFSET, 1, home[0], home[1], home[2])
+
+    def readHome(self):
+        '''Returns the stored home as (lat, lon, alt), or None'''
+        (valid, lat, lon, alt) = TRAIL_HOME.unpack_from(self.map, TRAIL_HOME_OFFSET)
+        if not valid:
+            return None
+        return (lat, lon, alt)
@@ -0,0 +1,180 @@
+#  breadcrumbTrail.py
+#  shotmanager
+#
+#  Fixed-capacity breadcrumb ring buffer with streaming simplification.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+from array import array
+import math
+
+from location_helpers import LATLON_TO_M
+import pathSimplifier
+from vector3 import Vector3
+
+# maximum number of raw samples a floating tip may stand in for before it is committed
+SIMPLIFY_WINDOW = 32
+
+
+class BreadcrumbTrail():
+    '''Preallocated ring of lat/lon/alt/time samples, oldest to newest.
+
+    Samples are decimated as they arrive: the newest point is a floating tip
+    that keeps sliding forward while every raw sample since the previous kept
+    point stays within tolerance meters of the straight line back to it. Once
+    a sample falls outside, the tip is committed and the new sample becomes
+    the next tip. The oldest points are dropped once the rest of the trail
+    still covers maxLength meters of flown path, or when the ring is full.
+    '''
+
+    def __init__(self, capacity, tolerance, maxLength):
+        if capacity < 2:
+            raise ValueError("BreadcrumbTrail needs room for at least 2 points")
+
+        self.capacity = capacity
+        self.tolerance = tolerance
+        self.maxLength = maxLength
+
+        self.lats = array('d', [0.0]) * capacity
+        self.lons = array('d', [0.0]) * capacity
+        self.alts = array('d', [0.0]) * capacity
+        self.times = array('d', [0.0]) * capacity
+        # flown path length at each point, meters
+        self.lengths = array('d', [0.0]) * capacity
+
+        # optional BreadcrumbStore mirroring every change
+        self.store = None
+
+        self.clear()
+
+    def clear(self):
+        self.start = 0
+        self.count = 0
+        self.pathLength = 0.0
+        # raw samples represented by the floating tip, as (lat, lon, alt)
+        self.window = []
+        if self.store:
+            self.store.writeRing(self)
+
+    def __len__(self):
+        return self.count
+
+    def _index(self, i):
+        '''ring index of the i-th oldest point (negative counts from the newest)'''
+        if i < 0:
+            i += self.count
+        return (self.start + i) % self.capacity
+
+    def _store(self, index, lat, lon, alt, t):
+        self.lats[index] = lat
+        self.lons[index] = lon
+        self.alts[index] = alt
+        self.times[index] = t
+        self.lengths[index] = self.pathLength
+
+    def _push(self, lat, lon, alt, t):
+        if self.count == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+            self.count -= 1
+        self.count += 1
+        self._store(self._index(-1), lat, lon, alt, t)
+
+    def _trim(self):
+        # drop the oldest point while the remainder still covers maxLength
+        while self.count > 2 and self.pathLength - self.lengths[self._index(1)] >= self.maxLength:
+            self.start = (self.start + 1) % self.capacity
+            self.count -= 1
+
+    def point(self, i):
+        '''Returns (lat, lon, alt, t) of the i-th oldest point'''
+        index = self._index(i)
+        return (self.lats[index], self.lons[index], self.alts[index], self.times[index])
+
+    def newest(self):
+        '''Returns (lat, lon, alt, t) of the newest point, or None if empty'''
+        if self.count == 0:
+            return None
+        return self.point(-1)
+
+    def distanceToNewest(self, lat, lon, alt):
+        '''Returns the 3d distance in meters from the newest point, as
+        location_helpers.getDistanceFromPoints3d'''
+        index = self._index(-1)
+        dlat = lat - self.lats[index]
+        dlon = (lon - self.lons[index]) * math.cos(math.radians(self.lats[index]))
+        dalt = (alt - self.alts[index]) / LATLON_TO_M
+        return math.sqrt(dlat * dlat + dlon * dlon + dalt * dalt) * LATLON_TO_M
+
+    def append(self, lat, lon, alt, t):
+        '''Adds a sample to the head of the trail'''
+        if self.count == 0:
+            self.pathLength = 0.0
+            self._push(lat, lon, alt, t)
+            self._save()
+            return
+
+        self.pathLength += self.distanceToNewest(lat, lon, alt)
+
+        if len(self.window) == 0 or len(self.window) >= SIMPLIFY_WINDOW or not self._fits(lat, lon, alt):
+            # the tip (if any) stays where it is, the sample becomes the new tip
+            self._push(lat, lon, alt, t)
+            self.window = [(lat, lon, alt)]
+        else:
+            # slide the tip forward to the new sample
+            self._store(self._index(-1), lat, lon, alt, t)
+            self.window.append((lat, lon, alt))
+
+        self._trim()
+        self._save()
+
+    def _save(self):
+        # only the newest point and the ring bounds change per append
+        if self.store:
+            self.store.writePoint(self, self._index(-1))
+            self.store.writeRing(self)
+
+    def _fits(self, lat, lon, alt):
+        '''True if every sample in the window is within tolerance of the
+        segment from the anchor (the point before the tip) to lat, lon, alt'''
+        anchor = self._index(-2)
+        anchorLat = self.lats[anchor]
+        anchorLon = self.lons[anchor]
+        anchorAlt = self.alts[anchor]
+        lonScale = math.cos(math.radians(anchorLat)) * LATLON_TO_M
+
+        start = Vector3()
+        end = Vector3((lat - anchorLat) * LATLON_TO_M, (lon - anchorLon) * lonScale, alt - anchorAlt)
+        sample = Vector3()
+        for (sampleLat, sampleLon, sampleAlt) in self.window:
+            sample.set((sampleLat - anchorLat) * LATLON_TO_M, (sampleLon - anchorLon) * lonScale, sampleAlt - anchorAlt)
+            (distance, t) = pathSimplifier.distanceToSegment(sample, start, end)
+            if distance > self.tolerance:
+                return False
+        return True
+
+    def pop(self):
+        '''Removes and returns (lat, lon, alt, t) of the newest point, or None if empty'''
+        if self.count == 0:
+            return None
+        newest = self.point(-1)
+        self.count -= 1
+        # whatever is left is committed
+        self.window = []
+        if self.count > 0:
+            self.pathLength = self.lengths[self._index(-1)]
+        else:
+            self.pathLength = 0.0
+        if self.store:
+            self.store.writeRing(self)
+        return newest
@@ -67,6 +67,12 @@ class buttonManager():
         self.connected = False
         self.buttonsInitialized = False
         self.connectingThread = None
+        # button id -> (shot, mask, string) last sent to Artoo
+        self.artooButtons = {}
+        # button id -> (shot, mask, string) waiting to go out with the batch,
+        # or None if we're not batching
+        self.artooBatch = None
+        self.artooLock = threading.RLock()
         self.connect()
         # These are the mappings for the A,B buttons during Free Flight
         # The A+B buttons are mapped to shot, mode tuples
@@ -74,12 +80,11 @@ class buttonManager():
         self.freeButtonMappings = [(-1, -1), (-1, -1)]
 
         try:
-            aMapping = settings.readSetting("A")
-            bMapping = settings.readSetting("B")
+            mappings = settings.readSettings()
 
-            values = string.split(aMapping, ",")
+            values = string.split(mappings["a"], ",")
             self.freeButtonMappings[0] = (int(values[0]), int(values[1]))
-            values = string.split(bMapping, ",")
+            values = string.split(mappings["b"], ",")
             self.freeButtonMappings[1] = (int(values[0]), int(values[1]))
 
         except:
@@ -94,6 +99,7 @@ class buttonManager():
             logger.log("[button]: Creating a new thread to connect to Artoo.")
             self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.client.setblocking(0)
+            self.framer = btn_msg.framer(self.client)
             self.connectingThread = threading.Thread(target = self.connectThread)
             self.connectingThread.daemon = True
             self.connectingThread.start()
@@ -121,16 +127,18 @@ class buttonManager():
                     logger.log("[button]: Unexpected socket exception: %s" % e)
                     time.sleep(1.0)
 
+    # handles every button event that has arrived from Artoo
     def parse(self):
         try:
-            msg = btn_msg.recv(self.client)
-            if not msg:
+            msgs = self.framer.read()
+            if msgs is None:
                 raise Exception('No msg from Artoo.')
         except Exception as e:
             logger.log('[button]: Data from Artoo is nil.')
             self.disconnect()
         else:
-            self.handleButtons((msg[1],msg[2]))
+            for msg in msgs:
+                self.handleButtons((msg[1],msg[2]))
         
     def disconnect(self):
         logger.log('[button]: Disconnecting from Artoo.')
@@ -138,6 +146,7 @@ class buttonManager():
         self.client.close()
         self.connected = False
         self.buttonsInitialized = False
+        self.artooButtons = {}
 
     def checkButtonConnection(self):
         if not self.isButtonConnected():
@@ -152,10 +161,24 @@ class buttonManager():
             self.buttonsInitialized = True
 
     # set Artoo's button mappings
+    # Only the buttons that changed since we last sent them go to Artoo, all in one write
     def setButtonMappings(self):
         if not self.isButtonConnected():
             return
 
+        self.artooLock.acquire()
+        try:
+            self.artooBatch = {}
+            try:
+                self.setButtonStrings()
+            finally:
+                batch = self.artooBatch
+                self.artooBatch = None
+            self.sendArtooButtons(batch)
+        finally:
+            self.artooLock.release()
+
+    def setButtonStrings(self):
         if self.shotMgr.currentShot == shots.APP_SHOT_NONE:
             aString = "\0"
             bString = "\0"
@@ -190,11 +213,29 @@ class buttonManager():
 
     def setArtooButton(self, button_id, shot, mask, string):
         if self.isButtonConnected():
+            self.artooLock.acquire()
             try:
-                btn_msg.sendArtooString(self.client, button_id, shot, mask, string)
-            except Exception as e:
-                logger.log("[button]: %s" % e)
-                self.disconnect()
+                if self.artooBatch is not None:
+                    self.artooBatch[button_id] = (shot, mask, string)
+                else:
+                    self.sendArtooButtons({button_id : (shot, mask, string)})
+            finally:
+                self.artooLock.release()
+
+    # sends the buttons whose strings differ from what Artoo already has
+    def sendArtooButtons(self, buttons):
+        changed = [(button_id, value) for (button_id, value) in sorted(buttons.items()) if self.artooButtons.get(button_id) != value]
+        if not changed or not self.isButtonConnected():
+            return
+
+        try:
+            pkt = "".join(btn_msg.packArtooString(button_id, shot, mask, string) for (button_id, (shot, mask, string)) in changed)
+            self.client.sendall(pkt)
+        except Exception as e:
+            logger.log("[button]: %s" % e)
+            self.disconnect()
+        else:
+            self.artooButtons.update(changed)
 
     # Sends a single string to Artoo that it can display as the current user-facing mode
     # This is usually what shot the user is in, but if the user is not in a shot it can be the APM mode
@@ -20,6 +20,8 @@
 
 from catmullRom import CatmullRom
 from vector3 import *
+import pathSimplifier
+import numpy
 from numpy import linspace
 import math
 import threading
@@ -32,6 +34,12 @@ TARGET_EPSILON_M = 0.1
 # Length of each segment that is assigned a maximum speed based on its maximum curvature
 CURVATURE_MAP_RES = 1. # meters
 
+# Maximum distance between a path preview polyline and the flown cable
+PATH_PREVIEW_TOLERANCE = 0.5 # meters
+
+# Maximum error of the speed limit interpolated along a path preview polyline
+PATH_PREVIEW_SPEED_TOLERANCE = 0.5 # m/s
+
 def goldenSection(func, a, b, tol = 1e-5):
     gr = 0.61803398875
 
@@ -105,6 +113,10 @@ class CableController():
         # Target position in P domain
         self.targetP = self.currentP
 
+        # Reachable range in P domain, targets are clamped to it (e.g. by a geofence pre-check)
+        self.minP = 0.0
+        self.maxP = 1.0
+
         # Previously reached target, once set
         self.prevReachedTarget = None
 
@@ -145,6 +157,12 @@ class CableController():
         # number of map segments that have been computed by the curvatureMapThread
         self.curvatureMapSegmentsComputed = 0
 
+        # densely sampled (p, position, speedLimit) cable, kept once every speed limit is known
+        self.pathPreviewSamples = None
+
+        # last decimated path preview, as ((tolerance, speedTolerance), samples)
+        self.pathPreviewLast = None
+
         # flag that indicates to the thread to die
         self.poisonPill = False
 
@@ -167,9 +185,16 @@ class CableController():
         return abs(self.currentP - self.targetP) * self.spline.totalArcLength < TARGET_EPSILON_M
 
     def setTargetP(self, targetP):
-        '''Interface to set a target P'''
+        '''Interface to set a target P, clamped to the reachable range'''
 
-        self.targetP = targetP
+        self.targetP = constrain(targetP, self.minP, self.maxP)
+
+    def setReachableRange(self, minP, maxP):
+        '''Limits the part of the cable that targets can be set in'''
+
+        self.minP = minP
+        self.maxP = maxP
+        self.targetP = constrain(self.targetP, self.minP, self.maxP)
 
     def trackSpeed(self, speed):
         '''Updates controller desired speed'''
@@ -190,6 +215,30 @@ class CableController():
         self.currentP = p
         self.currentSeg, self.currentU = self.spline.arclengthToNonDimensional(self.currentP)
 
+    def getPathPreview(self, tolerance = PATH_PREVIEW_TOLERANCE, speedTolerance = PATH_PREVIEW_SPEED_TOLERANCE):
+        '''Returns a decimated list of (p, position, speedLimit) samples of the cable as it will be flown.
+        No dropped sample is further than tolerance meters from the returned polyline, and
+        its speed limit is within speedTolerance of the linearly interpolated one.
+        The last result is cached, so asking again with the same tolerances is free.'''
+
+        key = (tolerance, speedTolerance)
+        if self.pathPreviewLast is None or self.pathPreviewLast[0] != key:
+            samples = self.pathPreviewSamples
+            if samples is None:
+                samples = self._samplePath()
+
+            points = [sample[1] for sample in samples]
+            speeds = [sample[2] for sample in samples]
+            indices = pathSimplifier.simplifyPath(points, tolerance, speeds, speedTolerance)
+            self.pathPreviewLast = (key, [samples[i] for i in indices])
+
+        return self.pathPreviewLast[1]
+
+    def sampleTrajectory(self, spacing):
+        '''Returns (ps, (north, east, down)) numpy arrays of the whole cable, sampled about every spacing meters'''
+
+        return self.spline.sampleArrays(spacing)
+
     def killCurvatureMapThread(self):
         '''Sets poisonPill to True so the curvatureMapThread knows to die'''
 
@@ -282,6 +331,32 @@ class CableController():
 
             return True
 
+    def _samplePath(self):
+        '''Samples position and speed limit about every curvature map segment.
+        Only speed limits the curvatureMapThread has already computed are used, so this
+        never does curvature work on the caller's thread; segments it hasn't reached yet
+        are given maxSpeed. The samples are kept once every speed limit is known.'''
+
+        ps, (xs, ys, zs) = self.spline.sampleArrays(CURVATURE_MAP_RES)
+        ps[-1] = 1.
+
+        if self.curvatureMapNumSegments == 0:
+            # zero length cable, nowhere to fly
+            speedLimits = numpy.zeros(len(ps))
+            complete = True
+        else:
+            with self.curvatureMapSegmentsComputedLock:
+                complete = self.curvatureMapSegmentsComputed == self.curvatureMapNumSegments
+            mapSpeedLimits = numpy.array([self.maxSpeed if limit is None else limit for limit in self.curvatureMapSpeedLimits])
+            mapSegs = numpy.minimum(numpy.floor(ps / self.curvatureMapSegLengthP).astype(int), self.curvatureMapNumSegments - 1)
+            speedLimits = mapSpeedLimits[mapSegs]
+
+        samples = [(float(p), Vector3(float(x), float(y), float(z)), float(speedLimit)) for (p, x, y, z, speedLimit) in zip(ps, xs, ys, zs, speedLimits)]
+        if complete:
+            self.pathPreviewSamples = samples
+
+        return samples
+
     def _getCurvatureMapSpeedLimit(self, mapSeg):
         '''Look up the speed limit for the requested map segment'''
 
@@ -321,7 +396,8 @@ class CableController():
 
         # calculate our position and velocity commands
         self.position = self.spline.position(self.currentSeg, self.currentU)
-        self.velocity = spline_vel_unit * self.speed
+        spline_vel_unit *= self.speed
+        self.velocity = spline_vel_unit
 
     def _constrainSpeed(self, speed):
         '''Looks ahead and behind current controller position and constrains to a speed limit'''
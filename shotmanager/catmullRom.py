@@ -18,10 +18,18 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import math
+import numpy
 from vector3 import Vector3
 
 TOL = 1.0e-3
 
+# Gaussian Quadrature weights and abscissae for n = 5
+GAUSS_ABSCISSAE = [
+    0.0000000000, 0.5384693101, -0.5384693101, 0.9061798459, -0.9061798459]
+GAUSS_WEIGHTS = [0.5688888889, 0.4786286705,
+                 0.4786286705, 0.2369268850, 0.2369268850]
+
 class CatmullRom:
     # Derivation: https://en.wikipedia.org/wiki/Centripetal_Catmull%E2%80%93Rom_spline
     # Class inspiration:
@@ -72,13 +80,25 @@ class CatmullRom:
         '''Returns x,y,z position of spline at parameter u'''
         P0,P1,P2,P3,A,B,C = self.splineCoefficients[seg]
 
-        return P1 + (0.5 * u) * (C + u * (B + u * A))
+        # P1 + (0.5 * u) * (C + u * (B + u * A)), evaluated in place
+        pos = A * u
+        pos += B
+        pos *= u
+        pos += C
+        pos *= 0.5 * u
+        pos += P1
+        return pos
 
     def velocity(self, seg, u):
         '''Returns x,y,z velocity of spline at parameter u'''
         P0,P1,P2,P3,A,B,C = self.splineCoefficients[seg]
 
-        return (0.5 * C + u * (B + 1.5 * u * A))
+        # 0.5 * C + u * (B + 1.5 * u * A), evaluated in place
+        vel = A * (1.5 * u)
+        vel += B
+        vel *= u
+        vel += C * 0.5
+        return vel
 
     def acceleration(self, seg, u):
         '''Returns x,y,z acceleration of spline at parameter u'''
@@ -106,23 +126,63 @@ class CatmullRom:
         if u2 > 1.0:
             u2 = 1.0
 
-        # Gaussian Quadrature weights and abscissae for n = 5
-
-        abscissae = [
-            0.0000000000, 0.5384693101, -0.5384693101, 0.9061798459, -0.9061798459]
-        weights = [0.5688888889, 0.4786286705,
-                   0.4786286705, 0.2369268850, 0.2369268850]
-
         # Gaussian Quadrature
         length = 0.0
         for j in range(0, 5):
-            u = 0.5 * ((u2 - u1) * abscissae[j] + u2 + u1)
-            length += weights[j] * self.velocity(seg, u).length()
+            u = 0.5 * ((u2 - u1) * GAUSS_ABSCISSAE[j] + u2 + u1)
+            length += GAUSS_WEIGHTS[j] * self.velocity(seg, u).length()
 
         length *= 0.5 * (u2 - u1)
 
         return length
 
+    def positionArrays(self, seg, us):
+        '''Returns a numpy array per spline dimension of the positions at each parameter in us'''
+        P0,P1,P2,P3,A,B,C = self.splineCoefficients[seg]
+        us = numpy.asarray(us, dtype = float)
+
+        return tuple(p + (0.5 * us) * (c + us * (b + us * a)) for (p, a, b, c) in zip(P1, A, B, C))
+
+    def arcLengthArrays(self, seg, us):
+        '''Returns the arc lengths from u = 0 to each parameter in us, using the same quadrature as arcLength'''
+        P0,P1,P2,P3,A,B,C = self.splineCoefficients[seg]
+        us = numpy.clip(numpy.asarray(us, dtype = float), 0.0, 1.0)
+
+        length = numpy.zeros(us.shape)
+        for j in range(0, 5):
+            u = 0.5 * (us * GAUSS_ABSCISSAE[j] + us)
+            speed2 = numpy.zeros(us.shape)
+            for (a, b, c) in zip(A, B, C):
+                v = 0.5 * c + u * (b + 1.5 * u * a)
+                speed2 += v * v
+            length += GAUSS_WEIGHTS[j] * numpy.sqrt(speed2)
+
+        return length * (0.5 * us)
+
+    def sampleArrays(self, spacing):
+        '''Samples the whole spline about every spacing meters, in one batch per segment.
+        Returns the arc length normalized parameter p of each sample and a numpy array per spline dimension'''
+        ps = []
+        positions = []
+        startLength = 0.0
+        numSegments = len(self.arcLengths)
+        for seg in range(numSegments):
+            numSamples = max(int(math.ceil(self.arcLengths[seg] / spacing)), 1)
+            us = numpy.linspace(0., 1., numSamples + 1)
+            # the end of a segment is the start of the next one
+            if seg < numSegments - 1:
+                us = us[:-1]
+
+            positions.append(self.positionArrays(seg, us))
+            ps.append(startLength + self.arcLengthArrays(seg, us))
+            startLength += self.arcLengths[seg]
+
+        ps = numpy.concatenate(ps)
+        if self.totalArcLength > 0:
+            ps /= self.totalArcLength
+
+        return ps, tuple(numpy.concatenate(axis) for axis in zip(*positions))
+
     def findParameterByDistance(self, seg, u1, s, newtonIterations = 32):
         '''Returns a parameter u that is s meters ahead of u1'''
 
@@ -0,0 +1,313 @@
+#  flightJournal.py
+#  shotmanager
+#
+#  Binary journal of flight events, and a reader for it.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import csv
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+if 'SOLOLINK_SANDBOX' in os.environ:
+    JOURNAL_FILE = os.path.join(tempfile.gettempdir(), 'shotmanager.journal')
+else:
+    JOURNAL_FILE = "/log/shotmanager.journal"
+
+# start a new file once the current one reaches this size, bytes
+JOURNAL_MAX_SIZE = 4 * 1024 * 1024
+# rotated files kept as JOURNAL_FILE.1 (newest) .. JOURNAL_FILE.n
+JOURNAL_ROTATIONS = 4
+# write buffer, bytes
+JOURNAL_BUFFER_SIZE = 64 * 1024
+# most time buffered records wait before being written, seconds
+JOURNAL_FLUSH_INTERVAL = 2.0
+
+# start of every journal file
+JOURNAL_MAGIC = "SOLOJRN1"
+# record header: payload length, record type, wall clock time
+JOURNAL_HEADER = '<HBd'
+
+# record types
+JOURNAL_SHOT = 1
+JOURNAL_MODE = 2
+JOURNAL_POSITION_TARGET = 3
+JOURNAL_MOUNT = 4
+JOURNAL_COMMAND = 5
+JOURNAL_COMMAND_INT = 6
+JOURNAL_RC = 7
+JOURNAL_GEOFENCE = 8
+
+# record type -> (name, payload format, field names)
+JOURNAL_RECORDS = \
+{
+    JOURNAL_SHOT : ("shot", '<bb', ("previous", "shot")),
+    JOURNAL_MODE : ("mode", '<16s', ("mode",)),
+    JOURNAL_POSITION_TARGET : ("position_target", '<BHiifffff',
+        ("frame", "type_mask", "lat_int", "lon_int", "alt", "vx", "vy", "vz", "yaw")),
+    JOURNAL_MOUNT : ("mount", '<iii', ("pitch", "roll", "yaw")),
+    JOURNAL_COMMAND : ("command", '<H7f',
+        ("command", "param1", "param2", "param3", "param4", "param5", "param6", "param7")),
+    JOURNAL_COMMAND_INT : ("command_int", '<BH4fiif',
+        ("frame", "command", "param1", "param2", "param3", "param4", "x", "y", "z")),
+    JOURNAL_RC : ("rc", '<B8H', ("remapping", "ch1", "ch2", "ch3", "ch4", "ch5", "ch6", "ch7", "ch8")),
+    JOURNAL_GEOFENCE : ("geofence", '<dd', ("lat", "lon")),
+}
+
+# precompiled headers and payloads
+headerStruct = struct.Struct(JOURNAL_HEADER)
+recordStructs = dict((recordType, struct.Struct(fmt)) for (recordType, (name, fmt, fields)) in JOURNAL_RECORDS.items())
+
+# outgoing mavlink message type -> (record type, payload values)
+JOURNAL_MESSAGES = \
+{
+    'SET_POSITION_TARGET_GLOBAL_INT' : (JOURNAL_POSITION_TARGET, lambda m:
+        (m.coordinate_frame, m.type_mask, m.lat_int, m.lon_int, m.alt, m.vx, m.vy, m.vz, m.yaw)),
+    'MOUNT_CONTROL' : (JOURNAL_MOUNT, lambda m: (m.input_a, m.input_b, m.input_c)),
+    'COMMAND_LONG' : (JOURNAL_COMMAND, lambda m:
+        (m.command, m.param1, m.param2, m.param3, m.param4, m.param5, m.param6, m.param7)),
+    'COMMAND_INT' : (JOURNAL_COMMAND_INT, lambda m:
+        (m.frame, m.command, m.param1, m.param2, m.param3, m.param4, m.x, m.y, m.z)),
+}
+
+
+class FlightJournal():
+    '''Appends length prefixed binary records of flight events to a file.
+
+    Each record is a JOURNAL_HEADER followed by a payload packed as
+    JOURNAL_RECORDS describes for its type; readers skip types they don't
+    know by length. Records are buffered in memory and written every
+    JOURNAL_FLUSH_INTERVAL seconds (see poll). Every start begins a new
+    file, as does reaching JOURNAL_MAX_SIZE; the older ones are rotated out.
+
+    Recording is safe from any thread, and never raises: a journal that
+    can't be written just stops recording.
+    '''
+
+    def __init__(self, path = JOURNAL_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.bufferSize = 0
+        self.size = 0
+        self.lastFlush = None
+        self.file = None
+
+        # statistics
+        self.records = 0
+        self.errors = 0
+
+        self.lock.acquire()
+        try:
+            self.rotate()
+        finally:
+            self.lock.release()
+
+    # moves path to path.1, path.1 to path.2 .. and starts a new path
+    # call with lock held
+    def rotate(self):
+        try:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            for i in range(JOURNAL_ROTATIONS - 1, 0, -1):
+                older = "%s.%d" % (self.path, i)
+                if os.path.exists(older):
+                    os.rename(older, "%s.%d" % (self.path, i + 1))
+            if os.path.exists(self.path):
+                os.rename(self.path, self.path + ".1")
+
+            self.file = open(self.path, 'wb')
+            self.file.write(JOURNAL_MAGIC)
+            self.size = len(JOURNAL_MAGIC)
+        except (IOError, OSError):
+            self.errors += 1
+            self.file = None
+
+    def record(self, recordType, values, now = None):
+        '''Adds a record of recordType with payload values, at wall clock time now'''
+        if now is None:
+            now = time.time()
+
+        try:
+            payload = recordStructs[recordType].pack(*values)
+        except (struct.error, TypeError):
+            self.errors += 1
+            return
+        data = headerStruct.pack(len(payload), recordType, now) + payload
+
+        self.lock.acquire()
+        try:
+            if self.file is None:
+                return
+            self.buffer.append(data)
+            self.bufferSize += len(data)
+            self.records += 1
+            if self.bufferSize >= JOURNAL_BUFFER_SIZE:
+                self.flush()
+        finally:
+            self.lock.release()
+
+    # writes out buffered records
+    # call with lock held
+    def flush(self):
+        if self.file is None or not self.buffer:
+            return
+        try:
+            self.file.write(''.join(self.buffer))
+            self.file.flush()
+        except (IOError, OSError):
+            self.errors += 1
+        self.size += self.bufferSize
+        self.buffer = []
+        self.bufferSize = 0
+        if self.size >= JOURNAL_MAX_SIZE:
+            self.rotate()
+
+    def poll(self, now):
+        '''Writes buffered records if JOURNAL_FLUSH_INTERVAL has passed since
+        the last write. now is monotonic time'''
+        if self.lastFlush is not None and now - self.lastFlush < JOURNAL_FLUSH_INTERVAL:
+            return
+        self.lastFlush = now
+        self.lock.acquire()
+        try:
+            self.flush()
+        finally:
+            self.lock.release()
+
+    def close(self):
+        self.lock.acquire()
+        try:
+            self.flush()
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+        finally:
+            self.lock.release()
+
+    def shot(self, previous, shot):
+        self.record(JOURNAL_SHOT, (previous, shot))
+
+    def mode(self, name):
+        self.record(JOURNAL_MODE, (str(name),))
+
+    def rc(self, remapping, channels):
+        try:
+            values = [remapping] + list(channels)
+        except TypeError:
+            self.errors += 1
+            return
+        self.record(JOURNAL_RC, values)
+
+    def geofence(self, lat, lon):
+        self.record(JOURNAL_GEOFENCE, (lat, lon))
+
+    # mavlink send callback; records the guided commands among outgoing messages
+    def sent(self, msg):
+        entry = JOURNAL_MESSAGES.get(msg.get_type())
+        if entry is not None:
+            (recordType, values) = entry
+            self.record(recordType, values(msg))
+
+
+def readJournal(path):
+    '''Yields (record type, wall clock time, values) for each record in the
+    journal at path. Types this reader doesn't know have values None; a record
+    cut short at the end of the file is ignored.'''
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if not data.startswith(JOURNAL_MAGIC):
+        raise ValueError("%s is not a flight journal" % path)
+
+    offset = len(JOURNAL_MAGIC)
+    while offset + headerStruct.size <= len(data):
+        (length, recordType, t) = headerStruct.unpack_from(data, offset)
+        offset += headerStruct.size
+        if offset + length > len(data):
+            return
+        payload = recordStructs.get(recordType)
+        if payload is not None and payload.size == length:
+            values = payload.unpack_from(data, offset)
+        else:
+            values = None
+        offset += length
+        yield (recordType, t, values)
+
+def loadJournal(path):
+    '''Returns {record name: numpy record array} for the journal at path, with
+    a "time" column ahead of each record's fields'''
+    if numpy is None:
+        raise ImportError("loadJournal needs numpy")
+
+    rows = dict((recordType, []) for recordType in JOURNAL_RECORDS)
+    for (recordType, t, values) in readJournal(path):
+        if values is not None:
+            rows[recordType].append((t,) + values)
+
+    arrays = {}
+    for (recordType, (name, fmt, fields)) in JOURNAL_RECORDS.items():
+        dtype = [("time", '<f8')] + [(field, '<' + code) for (field, code) in zip(fields, fieldCodes(fmt))]
+        arrays[name] = numpy.array(rows[recordType], dtype = dtype)
+    return arrays
+
+# single field struct codes of a format, e.g. '<B8H' -> ['B', 'H', ... 'H']
+def fieldCodes(fmt):
+    codes = []
+    count = ''
+    for c in fmt.lstrip('<'):
+        if c.isdigit():
+            count += c
+        elif c == 's':
+            codes.append('S' + count)
+            count = ''
+        else:
+            codes.extend([c] * int(count or 1))
+            count = ''
+    return codes
+
+def writeCSV(path, directory):
+    '''Writes the journal at path out as one CSV file per record type in directory'''
+    writers = {}
+    files = []
+    try:
+        for (recordType, t, values) in readJournal(path):
+            if values is None:
+                continue
+            if recordType not in writers:
+                (name, fmt, fields) = JOURNAL_RECORDS[recordType]
+                f = open(os.path.join(directory, name + ".csv"), 'wb')
+                files.append(f)
+                writers[recordType] = csv.writer(f)
+                writers[recordType].writerow(("time",) + fields)
+            writers[recordType].writerow((t,) + tuple(v.rstrip('\0') if isinstance(v, str) else v for v in values))
+    finally:
+        for f in files:
+            f.close()
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print "usage: %s <journal> <output directory>" % sys.argv[0]
+        sys.exit(1)
+    writeCSV(sys.argv[1], sys.argv[2])
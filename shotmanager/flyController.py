@@ -81,8 +81,10 @@ class FlyController():
         # Climb
         climbVel = self._climb(channels[RAW_PADDLE])
 
-        # add up velocities
-        currentVel = approachVel + strafeVel + climbVel
+        # add up velocities (in place, approachVel is ours to modify)
+        currentVel = approachVel
+        currentVel += strafeVel
+        currentVel += climbVel
 
         # add up positions
         self.offset += currentVel * UPDATE_TIME
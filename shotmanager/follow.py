@@ -20,14 +20,16 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 
+import errno
 import os
 import math
 import struct
 import monotonic
-import collections
 import app_packet
 import camera
 import location_helpers
+import roiFilter
+import roiJitterBuffer
 import pathHandler
 import shotLogger
 import shots
@@ -45,7 +47,9 @@ from sololink import btn_msg
 sys.path.append(os.path.realpath(''))
 
 FOLLOW_PORT = 14558
-SOCKET_TIMEOUT = 0.01
+ROI_PACKET_SIZE = 28 # bytes, SOLO_MESSAGE_LOCATION
+ROI_PACKET_V2_SIZE = 40 # bytes, SOLO_MESSAGE_LOCATION_V2
+ROI_JITTER_DELAY = 0.1 # s, how long timestamped ROIs are held to reorder and even them out
 
 DEFAULT_PILOT_VELZ_MAX_VALUE = 133.0
 ZVEL_FACTOR = 0.95
@@ -53,8 +57,13 @@ ZVEL_FACTOR = 0.95
 # in degrees per second for FREE CAM
 YAW_SPEED = 120.0
 
-MIN_RAW_ROI_QUEUE_LENGTH = 5
-MIN_FILT_ROI_QUEUE_LENGTH = 4
+# ROI smoothing: constant velocity Kalman (True) or the original 4th order IIR (False), run on north/east
+ROI_FILTER_KALMAN = True
+ROI_IIR_NUM = [0,0.000334672774973874,0.00111965413719632,-0.000469533537393159,-0.000199779184127412]
+ROI_IIR_DEN = [1,-3.48113699710809,4.56705782792063,-2.67504447769757,0.589908661075676]
+ROI_KALMAN_ACCEL_NOISE = 2.0 # m/s^2, how hard the subject maneuvers
+ROI_KALMAN_GPS_NOISE = 3.0 # m, phone GPS position error
+ROI_LATENCY = 0.3 # s, phone GPS and link delay the ROI is led by, on top of its age on Solo
 
 #Path accel/decel constants
 PATH_ACCEL = 2.5
@@ -145,13 +154,28 @@ class FollowShot():
         self.filteredROI = None
         self.rawROI = None
 
-        # initialize raw and filtered roi queues
-        self.rawROIQueue = collections.deque(maxlen=MIN_RAW_ROI_QUEUE_LENGTH)
-        self.filteredROIQueue = collections.deque(maxlen=MIN_FILT_ROI_QUEUE_LENGTH)
+        # smooths rawROI into filteredROI
+        if ROI_FILTER_KALMAN:
+            horizontalFilter = roiFilter.ConstantVelocityKalman(2, ROI_KALMAN_ACCEL_NOISE, ROI_KALMAN_GPS_NOISE)
+        else:
+            horizontalFilter = roiFilter.IIRFilter(ROI_IIR_NUM, ROI_IIR_DEN, 2)
+        self.roiFilter = roiFilter.LocalROIFilter(horizontalFilter, ROI_ALT_FILTER_GAIN, ROI_LATENCY)
 
         # initialize roiVelocity to None
         self.roiVelocity = None
 
+        # receive time of the newest ROI, the time since the one before it and how old it is now
+        self.previousROItime = None
+        self.roiDeltaTime = None
+        self.roiAge = None
+
+        # ROI packets read from the socket, and those superseded by a newer one in the same burst
+        self.roiPacketsReceived = 0
+        self.roiPacketsSkipped = 0
+
+        # timestamped ROIs wait here until they are due
+        self.jitterBuffer = roiJitterBuffer.ROIJitterBuffer(ROI_JITTER_DELAY)
+
         # for limiting follow acceleration could lead to some bad lag
         self.translateVel = Vector3()
         
@@ -187,13 +211,20 @@ class FollowShot():
     # channels are expected to be floating point values in the (-1.0, 1.0) range
     def handleRCs( self, channels ):
 
-        # check socket for a new ROI from the app
-        self.checkSocket()
+        # play out any timestamped ROI that is due
+        now = monotonic.monotonic()
+        sample = self.jitterBuffer.pop(now)
+        if sample is not None:
+            (captureTime, lat, lon, alt) = sample
+            self.setRawROI(lat, lon, alt, captureTime)
 
         # if we have never received an ROI
         if not self.rawROI:
             return
 
+        # new ROIs are read by shotManager as they arrive, just track how stale the newest is
+        self.roiAge = now - self.previousROItime
+
         # smooth ROI and calculate translateVel for follow
         self.filterROI()
 
@@ -413,63 +444,75 @@ class FollowShot():
         except Exception as e:
             logger.log("[follow]: failed to bind follow socket - %s"%(type(e)))
 
-        self.socket.settimeout(SOCKET_TIMEOUT)
+        # shotManager calls checkSocket when the socket is readable
+        self.shotmgr.inputs.append(self.socket)
+
+
+    def closeSocket(self):
+        '''Stops listening for ROIs, called by shotManager when we leave the shot'''
+        if self.socket in self.shotmgr.inputs:
+            self.shotmgr.inputs.remove(self.socket)
+        self.socket.close()
+        logger.log("[follow]: closed follow socket after %d ROIs (%d skipped)" % (self.roiPacketsReceived, self.roiPacketsSkipped))
+        if self.jitterBuffer.received > 0:
+            logger.log("[follow]: timestamped ROIs: %s" % self.jitterBuffer.summary())
 
 
     def checkSocket(self):
         '''check our socket to see if a new follow roi is there'''
 
-        packetsConsumed = 0
+        newestData = None
         #consume from socket until it's empty
         while True:
             try:
-                data, addr = self.socket.recvfrom(28)
-            except socket.timeout:
+                data, addr = self.socket.recvfrom(ROI_PACKET_V2_SIZE)
+            except socket.error as e:
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    logger.log("[follow]: error reading follow socket - %s" % e)
                 break
-            else:
+
+            self.roiPacketsReceived += 1
+            now = monotonic.monotonic()
+
+            if len(data) < app_packet.SOLO_MESSAGE_HEADER_LENGTH:
+                logger.log("[follow]: got a short packet from follow socket")
+                continue
+
+            (id, length) = struct.unpack_from('<II', data)
+            if id == app_packet.SOLO_MESSAGE_LOCATION and len(data) == ROI_PACKET_SIZE:
+                # untimestamped ROIs: only the newest of a burst matters
+                if newestData is not None:
+                    self.roiPacketsSkipped += 1
                 newestData = data
-                packetsConsumed += 1
+            elif id == app_packet.SOLO_MESSAGE_LOCATION_V2 and len(data) == ROI_PACKET_V2_SIZE:
+                (id, length, lat, lon, alt, captureTime, sequence) = struct.unpack('<IIddfdI', data)
+                self.jitterBuffer.push(sequence, captureTime, now, lat, lon, alt)
+            else:
+                logger.log("[follow]: got an invalid packet from follow socket")
 
         # make sure we have a packet to work with
-        if packetsConsumed > 0:
+        if newestData is not None:
             (id, length, lat, lon, alt) = struct.unpack('<IIddf', newestData)
-            if id == app_packet.SOLO_MESSAGE_LOCATION:
-                now = monotonic.monotonic()
-                if self.rawROI is None:
-                    self.roiDeltaTime = None
-                else:
-                    self.roiDeltaTime = now - self.previousROItime
-                self.previousROItime = now
-                self.rawROI = LocationGlobalRelative(lat,lon,alt)
-            else:
-                logger.log("[follow]: got an invalid packet from follow socket")
+            self.setRawROI(lat, lon, alt, monotonic.monotonic())
+
+    def setRawROI(self, lat, lon, alt, timestamp):
+        '''Takes a new ROI from the app, captured at timestamp on our monotonic clock'''
+        if self.rawROI is None:
+            self.roiDeltaTime = None
         else:
-            pass # will implement 2 second timeout to kill shot here
+            self.roiDeltaTime = timestamp - self.previousROItime
+        self.previousROItime = timestamp
+        self.roiAge = monotonic.monotonic() - timestamp
+        self.rawROI = LocationGlobalRelative(lat,lon,alt)
 
     def filterROI(self):
-        '''Filters app ROI using a 5th order linear filter and calculates an associated roi velocity'''
-        
-        # store last 5 raw roi values
-        self.rawROIQueue.append(self.rawROI)
-
-        # only run filter if we have enough data in the queues.
-        if len(self.rawROIQueue) == MIN_RAW_ROI_QUEUE_LENGTH and len(self.filteredROIQueue) == MIN_FILT_ROI_QUEUE_LENGTH:
-            num = [0,0.000334672774973874,0.00111965413719632,-0.000469533537393159,-0.000199779184127412]
-            den = [1,-3.48113699710809,4.56705782792063,-2.67504447769757,0.589908661075676]
-
-            filteredLat = ( (num[4]*self.rawROIQueue[0].lat + num[3]*self.rawROIQueue[1].lat + num[2]*self.rawROIQueue[2].lat + num[1]*self.rawROIQueue[3].lat + num[0]*self.rawROIQueue[4].lat) - (den[4]*self.filteredROIQueue[0].lat + den[3]*self.filteredROIQueue[1].lat + den[2]*self.filteredROIQueue[2].lat + den[1]*self.filteredROIQueue[3].lat) ) / den[0]
-            filteredLon = ( (num[4]*self.rawROIQueue[0].lon + num[3]*self.rawROIQueue[1].lon + num[2]*self.rawROIQueue[2].lon + num[1]*self.rawROIQueue[3].lon + num[0]*self.rawROIQueue[4].lon) - (den[4]*self.filteredROIQueue[0].lon + den[3]*self.filteredROIQueue[1].lon + den[2]*self.filteredROIQueue[2].lon + den[1]*self.filteredROIQueue[3].lon) ) / den[0]
-            filteredAlt = ROI_ALT_FILTER_GAIN * self.filteredROIQueue[-1].alt + (1-ROI_ALT_FILTER_GAIN) * self.rawROI.alt# index -1 should refer to most recent value in the queue.
-            self.filteredROI = LocationGlobalRelative(filteredLat,filteredLon,filteredAlt)
-        else:
-            self.filteredROI = self.rawROI
-            
+        '''Filters app ROI in a local frame, leads it by its age and latency and calculates an associated roi velocity'''
 
-        # store last 4 filtered roi values
-        self.filteredROIQueue.append(self.filteredROI)
+        self.roiFilter.update(self.rawROI, UPDATE_TIME, self.roiAge or 0.0)
+        self.filteredROI = self.roiFilter.location()
 
         # only called once - when we have an ROI from phone
-        if len(self.filteredROIQueue) == 1:
+        if self.roiFilter.updates == 1:
             # initialize ROI velocity for Guided controller
             self.roiVelocity = Vector3(0,0,0)
             
@@ -482,13 +525,9 @@ class FollowShot():
             # go into Look At Me as default state. iOS app changes state to Orbit after 3 seconds.
             self.initState(FOLLOW_LOOKAT)
 
-        elif len(self.filteredROIQueue) > 1 and self.roiDeltaTime:
-            #calculate vector from previous to new roi in North,East,Up
-            vec = location_helpers.getVectorFromPoints(self.filteredROIQueue[-2] , self.filteredROIQueue[-1])
-
-            # calculate velocity based on time difference
+        else:
             # roiVelocity in NEU frame
-            self.roiVelocity = vec/self.roiDeltaTime
+            self.roiVelocity.set(*self.roiFilter.velocity())
 
             # calculate desiredYaw and desiredPitch from new ROI
             self.desiredYaw, self.desiredPitch = location_helpers.calcYawPitchFromLocations(self.vehicle.location.global_relative_frame, self.filteredROI)
@@ -1,11 +1,11 @@
 #helper functions for location
 from dronekit.lib import LocationGlobalRelative
 import math
+import numpy
 from vector3 import Vector3
 
 LATLON_TO_M  =  111195.0
 
-#optimize : store persistent sclaing
 def getLonScale(lat):
     scale   = 1 / math.cos(math.radians(lat))
     return scale
@@ -53,8 +53,8 @@ def calcAzimuthFromPoints(loc1, loc2):
 def getVectorFromPoints(start, end):
     x = (end.lat - start.lat) * LATLON_TO_M
 
-    # calculate longitude scaling factor.  We could cache this if necessary
-    # but we aren't doing so now
+    # calculate longitude scaling factor.  Use a LocalFrame to cache this
+    # when converting many points against the same start
     y = ((end.lon - start.lon) * LATLON_TO_M) / getLonScale(start.lat)
     z = end.alt - start.alt
     return Vector3(x, y, z)
@@ -64,12 +64,117 @@ def getVectorFromPoints(start, end):
 # and return the resulting Location
 def addVectorToLocation(loc, vec):
     xToDeg = vec.x / LATLON_TO_M
-    # calculate longitude scaling factor.  We could cache this if necessary
-    # but we aren't doing so now
+    # calculate longitude scaling factor.  Use a LocalFrame to cache this
+    # when converting many points against the same location
     yToDeg = (vec.y / LATLON_TO_M) * getLonScale(loc.lat)
     return LocationGlobalRelative(loc.lat + xToDeg, loc.lon + yToDeg, loc.alt + vec.z)
 
 
+# Batched versions of the functions above.  Each takes columns (lists or numpy
+# arrays) of lat, lon and alt and returns numpy arrays; scalars broadcast, so a
+# single start location can be checked against many end locations.
+# As with the scalar versions, longitude is scaled by the start latitude.
+
+def getLonScaleArray(lat):
+    return 1 / numpy.cos(numpy.radians(lat))
+
+
+#returns distances between the given points in meters
+def getDistanceFromPointsArray(lat1, lon1, lat2, lon2):
+    lat1 = numpy.asarray(lat1, dtype=float)
+    dlat    = numpy.asarray(lat2, dtype=float) - lat1
+    dlong   = (numpy.asarray(lon2, dtype=float) - numpy.asarray(lon1, dtype=float)) / getLonScaleArray(lat1)
+    return numpy.sqrt((dlat * dlat) + (dlong * dlong)) * LATLON_TO_M
+
+
+#returns 3d distances between the given points in meters
+def getDistanceFromPoints3dArray(lat1, lon1, alt1, lat2, lon2, alt2):
+    lat1 = numpy.asarray(lat1, dtype=float)
+    dlat    = numpy.asarray(lat2, dtype=float) - lat1
+    dlong   = (numpy.asarray(lon2, dtype=float) - numpy.asarray(lon1, dtype=float)) / getLonScaleArray(lat1)
+    dalt    = (numpy.asarray(alt2, dtype=float) - numpy.asarray(alt1, dtype=float)) / LATLON_TO_M
+    return numpy.sqrt((dlat * dlat) + (dlong * dlong) + (dalt * dalt)) * LATLON_TO_M
+
+
+#calculate azimuths between start and end points (in degrees)
+def calcAzimuthFromPointsArray(lat1, lon1, lat2, lon2):
+    lat1 = numpy.asarray(lat1, dtype=float)
+    off_x   = (numpy.asarray(lon2, dtype=float) - numpy.asarray(lon1, dtype=float)) / getLonScaleArray(lat1)
+    off_y   = numpy.asarray(lat2, dtype=float) - lat1
+    az      = 90 + numpy.degrees(numpy.arctan2(-off_y, off_x))
+    return wrapTo360Array(az)
+
+
+# given start and end points, return (x, y, z) arrays containing deltas in meters
+# between start/end along each axis (North, East, Up, like getVectorFromPoints)
+def getVectorFromPointsArray(lat1, lon1, alt1, lat2, lon2, alt2):
+    lat1 = numpy.asarray(lat1, dtype=float)
+    x = (numpy.asarray(lat2, dtype=float) - lat1) * LATLON_TO_M
+    y = ((numpy.asarray(lon2, dtype=float) - numpy.asarray(lon1, dtype=float)) * LATLON_TO_M) / getLonScaleArray(lat1)
+    z = numpy.asarray(alt2, dtype=float) - numpy.asarray(alt1, dtype=float)
+    return x, y, z
+
+
+# A North-East-Down frame fixed at an origin location.
+# Caches the longitude scaling of the origin so shots and managers that convert
+# many points against the same origin (spline origins, fence origins) don't
+# recompute it, and returns plain tuples/arrays instead of new Locations.
+# Conversions match getVectorFromPoints/addVectorToLocation, with z flipped to Down.
+class LocalFrame():
+
+    def __init__(self, origin):
+        self.origin = origin
+        self.lat = origin.lat
+        self.lon = origin.lon
+        self.alt = origin.alt if origin.alt is not None else 0.0
+        self.lonScale = getLonScale(origin.lat)
+
+    # returns (north, east, down) in meters of the given Location
+    def toNED(self, loc):
+        return self.toNEDFromLatLonAlt(loc.lat, loc.lon, loc.alt)
+
+    def toNEDFromLatLonAlt(self, lat, lon, alt):
+        north = (lat - self.lat) * LATLON_TO_M
+        east = ((lon - self.lon) * LATLON_TO_M) / self.lonScale
+        down = self.alt - alt
+        return north, east, down
+
+    # returns the given Location as a NED Vector3
+    def toNEDVector(self, loc):
+        return Vector3(*self.toNED(loc))
+
+    # returns (lat, lon, alt) of the given north, east, down offset in meters
+    def fromNED(self, north, east, down):
+        lat = self.lat + north / LATLON_TO_M
+        lon = self.lon + (east / LATLON_TO_M) * self.lonScale
+        alt = self.alt - down
+        return lat, lon, alt
+
+    # returns a new Location for the given north, east, down offset in meters
+    def locationFromNED(self, north, east, down):
+        return LocationGlobalRelative(*self.fromNED(north, east, down))
+
+    # batched toNED: takes arrays of lat, lon, alt and returns arrays of north, east, down
+    def toNEDArrays(self, lats, lons, alts):
+        lats = numpy.asarray(lats, dtype=float)
+        lons = numpy.asarray(lons, dtype=float)
+        alts = numpy.asarray(alts, dtype=float)
+        north = (lats - self.lat) * LATLON_TO_M
+        east = ((lons - self.lon) * LATLON_TO_M) / self.lonScale
+        down = self.alt - alts
+        return north, east, down
+
+    # batched fromNED: takes arrays of north, east, down and returns arrays of lat, lon, alt
+    def fromNEDArrays(self, norths, easts, downs):
+        norths = numpy.asarray(norths, dtype=float)
+        easts = numpy.asarray(easts, dtype=float)
+        downs = numpy.asarray(downs, dtype=float)
+        lats = self.lat + norths / LATLON_TO_M
+        lons = self.lon + (easts / LATLON_TO_M) * self.lonScale
+        alts = self.alt - downs
+        return lats, lons, alts
+
+
 # Casts a ray at the ground based on the location, heading and camera pitch
 # The Spot lock location is always equal to home altitude (zero)
 def getSpotLock(loc, pitch, yaw):
@@ -114,6 +219,11 @@ def wrapTo360(val):
     else:
         return wrapped
 
+def wrapTo360Array(val):
+    val = numpy.asarray(val, dtype=float)
+    wrapped = numpy.mod(val, 360)
+    return numpy.where((wrapped == 0) & (val > 0), 360., wrapped)
+
 def deg2rad(deg):
     return deg * math.pi/180.
 
@@ -70,6 +70,12 @@ NOTIFICATIONS_PER_SECOND = 10
 # Maximum time, in seconds, that any cable can take
 MAXIMUM_CABLE_DURATION = 20*60.
 
+# Maximum number of samples sent to the app in a single path preview
+PATH_PREVIEW_MAX_SAMPLES = 512
+
+# Times the path preview tolerances are loosened before the preview is thinned out instead
+PATH_PREVIEW_MAX_PASSES = 4
+
 # constants for cruiseState
 RIGHT = 1
 PAUSED = 0
@@ -172,6 +178,14 @@ class MultipointShot():
         # initialize cable to None
         self.cable = None        
 
+        # NED frame at the first waypoint, set when the spline is generated
+        self.splineFrame = None
+
+        # geofence pre-check of the cable, None if no fence is set
+        self.fenceCheck = None
+        # geoFenceManager.fenceVersion the check was made against
+        self.fenceCheckVersion = None
+
         # solo spline point version
         self.splinePointVersion = 0
 
@@ -253,8 +267,8 @@ class MultipointShot():
 
         self.cable.update(dt)
 
-        # add NED position vector to spline origin (addVectorToLocation needs NEU)
-        self.commandPos = location_helpers.addVectorToLocation(self.splineOrigin, Vector3(self.cable.position.x, self.cable.position.y, -self.cable.position.z))
+        # convert NED position vector from the spline origin to lat, lon, alt
+        (lat, lon, alt) = self.splineFrame.fromNED(self.cable.position.x, self.cable.position.y, self.cable.position.z)
 
         # assign velocity from controller
         self.commandVel = self.cable.velocity
@@ -265,9 +279,9 @@ class MultipointShot():
             0, 1,    # target system, target component
             mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT,  # frame
             0b0000110111000000,  # type_mask - enable pos/vel
-            int(self.commandPos.lat * 10000000),  # latitude (degrees*1.0e7)
-            int(self.commandPos.lon * 10000000),  # longitude (degrees*1.0e7)
-            self.commandPos.alt,  # altitude (meters)
+            int(lat * 10000000),  # latitude (degrees*1.0e7)
+            int(lon * 10000000),  # longitude (degrees*1.0e7)
+            alt,  # altitude (meters)
             self.commandVel.x, self.commandVel.y, self.commandVel.z,  # North, East, Down velocity (m/s)
             0, 0, 0,  # x, y, z acceleration (not used)
             0, 0)    # yaw, yaw_rate (not used)
@@ -556,6 +570,43 @@ class MultipointShot():
         self.shotmgr.appMgr.sendPacket(packet)
         logger.log("[multipoint]: Sent times to app.")
 
+    def sendPathPreview(self, tolerance):
+        '''Sends the app a decimated polyline of the path the vehicle will fly, with speed limits'''
+
+        if self.cable is None:
+            logger.log("[multipoint]: Can't send path preview. A spline hasn't been generated yet!")
+            return
+
+        if tolerance <= 0.0:
+            tolerance = cableController.PATH_PREVIEW_TOLERANCE
+
+        # loosen the tolerances until the preview fits in a reasonably sized packet
+        speedTolerance = cableController.PATH_PREVIEW_SPEED_TOLERANCE
+        samples = self.cable.getPathPreview(tolerance, speedTolerance)
+        for i in range(PATH_PREVIEW_MAX_PASSES):
+            if len(samples) <= PATH_PREVIEW_MAX_SAMPLES:
+                break
+            tolerance *= 2.
+            speedTolerance *= 2.
+            samples = self.cable.getPathPreview(tolerance, speedTolerance)
+
+        # still too long, so keep evenly spaced samples including both ends
+        if len(samples) > PATH_PREVIEW_MAX_SAMPLES:
+            step = (len(samples) - 1) / float(PATH_PREVIEW_MAX_SAMPLES - 1)
+            samples = [samples[int(round(i * step))] for i in range(PATH_PREVIEW_MAX_SAMPLES)]
+
+        # convert all NED sample positions from the spline origin to lat, lon, alt at once
+        (lats, lons, alts) = self.splineFrame.fromNEDArrays([pos.x for (p, pos, speedLimit) in samples],
+                                                            [pos.y for (p, pos, speedLimit) in samples],
+                                                            [pos.z for (p, pos, speedLimit) in samples])
+
+        packet = struct.pack('<IIfI', app_packet.SOLO_SPLINE_PATH_PREVIEW, 8 + 28 * len(samples), tolerance, len(samples))
+        for i, (p, pos, speedLimit) in enumerate(samples):
+            packet += struct.pack('<fddff', p, lats[i], lons[i], alts[i], speedLimit)
+
+        self.shotmgr.appMgr.sendPacket(packet)
+        logger.log("[multipoint]: Sent path preview to app (%d samples, %.2f m tolerance)." % (len(samples), tolerance))
+
     def updatePlaybackStatus(self):
         if self.cable is None:
             logger.log("[multipoint]: A spline hasn't been generated yet!")
@@ -731,9 +782,9 @@ class MultipointShot():
         # set initial control point as origin
         ctrlPtsCart.append(Vector3(0, 0, 0))
         self.splineOrigin = ctrlPtsLLA[0]
+        self.splineFrame = location_helpers.LocalFrame(self.splineOrigin)
         for n in range(1, len(ctrlPtsLLA)):
-            ctrlPtsCart.append(location_helpers.getVectorFromPoints(self.splineOrigin, ctrlPtsLLA[n]))
-            ctrlPtsCart[-1].z *= -1. #NED
+            ctrlPtsCart.append(self.splineFrame.toNEDVector(ctrlPtsLLA[n]))
 
         # Build spline object
         try:
@@ -750,8 +801,20 @@ class MultipointShot():
         logger.log("[multipoint]: min time for cable: %f s." % (self.minTime))
         logger.log("[multipoint]: max time for cable: %f s." % (self.maxTime))
 
+        # check the whole cable against the geofence up front, rather than being tethered mid-cable
+        self.fenceCheckVersion = None
+        self.updateFenceCheck()
+
         return True
 
+    def updateFenceCheck(self):
+        '''Checks the cable against the geofence again if the fences changed since the last check'''
+        fenceVersion = self.shotmgr.geoFenceManager.fenceVersion
+        if self.cable is None or fenceVersion == self.fenceCheckVersion:
+            return
+        self.fenceCheck = self.shotmgr.geoFenceManager.checkCable(self.cable, self.splineFrame)
+        self.fenceCheckVersion = fenceVersion
+
     def estimateTime(self,speed):
         '''Tries to guess a time from a given cruiseSpeed (inverse of estimateCruiseSpeed())'''
 
@@ -805,6 +868,21 @@ class MultipointShot():
             attachSeg = self.attachIndex
             attachU = 0.
         p = self.cable.spline.nonDimensionalToArclength(attachSeg, attachU)[0]
+
+        # only the clear stretch of cable around the keyframe can be flown
+        self.updateFenceCheck()
+        if self.fenceCheck is not None:
+            reachable = self.fenceCheck.reachableRange(p)
+            if reachable is None:
+                logger.log("[multipoint]: Keyframe %d is outside the geofence. Will not attach." % self.attachIndex)
+                self.attachIndex = -1
+                return
+            self.cable.setReachableRange(*reachable)
+            logger.log("[multipoint]: Cable limited to p %f to %f by the geofence." % reachable)
+        else:
+            # no fence any more, lift any earlier limit
+            self.cable.setReachableRange(0.0, 1.0)
+
         self.cable.setCurrentP(p)
 
         self.commandPos = self.waypoints[self.attachIndex].loc
@@ -933,6 +1011,10 @@ class MultipointShot():
             elif packetType == app_packet.SOLO_SPLINE_ATTACH:
                 attach = struct.unpack('<I', packetValue)
                 self.handleAttach(attach)
+
+            elif packetType == app_packet.SOLO_SPLINE_PATH_PREVIEW:
+                (tolerance,) = struct.unpack('<f', packetValue)
+                self.sendPathPreview(tolerance)
             else:
                 return False
         except Exception as e:
@@ -98,8 +98,11 @@ class OrbitController(object):
         if self.maxAlt is not None:
             currentPos.alt = min(currentPos.alt, self.maxAlt)
 
-        # sum velocities
-        currentVel = approachVel + strafeVel + climbVel + roiVel
+        # sum velocities (in place, approachVel is ours to modify but roiVel is not)
+        currentVel = approachVel
+        currentVel += strafeVel
+        currentVel += climbVel
+        currentVel += roiVel
 
         return currentPos, currentVel
 
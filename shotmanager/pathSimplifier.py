@@ -0,0 +1,95 @@
+#  pathSimplifier.py
+#  shotmanager
+#
+#  Douglas-Peucker style polyline decimation.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import math
+
+
+def distanceToSegment(point, start, end):
+    '''Returns (distance, t) from point to the segment start-end, where t is the
+    clamped (0,1) parameter of the closest point on the segment'''
+
+    dx = end.x - start.x
+    dy = end.y - start.y
+    dz = end.z - start.z
+    length2 = float(dx * dx + dy * dy + dz * dz)
+
+    px = point.x - start.x
+    py = point.y - start.y
+    pz = point.z - start.z
+
+    if length2 == 0.:
+        return math.sqrt(px * px + py * py + pz * pz), 0.
+
+    t = (px * dx + py * dy + pz * dz) / length2
+    if t < 0.:
+        t = 0.
+    elif t > 1.:
+        t = 1.
+
+    ex = px - t * dx
+    ey = py - t * dy
+    ez = pz - t * dz
+
+    return math.sqrt(ex * ex + ey * ey + ez * ez), t
+
+
+def simplifyPath(points, tolerance, values = None, valueTolerance = None):
+    '''Returns the sorted indices of the points to keep so that no dropped point is
+    more than tolerance meters from the simplified polyline.
+
+    points - list of Vector3
+    tolerance - maximum allowable position error, meters
+    values - optional list of scalars attached to each point (e.g. speed limits)
+    valueTolerance - maximum error between a dropped value and the value
+                     linearly interpolated along the simplified polyline
+    '''
+
+    numPoints = len(points)
+    if numPoints < 3:
+        return range(numPoints)
+
+    keep = [False] * numPoints
+    keep[0] = True
+    keep[-1] = True
+
+    # iterative rather than recursive so long paths can't blow the stack
+    stack = [(0, numPoints - 1)]
+    while stack:
+        first, last = stack.pop()
+
+        # errors are normalized by their tolerance, so anything above 1 needs splitting
+        maxError = 1.
+        maxIndex = None
+        for i in range(first + 1, last):
+            dist, t = distanceToSegment(points[i], points[first], points[last])
+            error = dist / tolerance
+
+            if values is not None:
+                interp = values[first] + t * (values[last] - values[first])
+                error = max(error, abs(values[i] - interp) / valueTolerance)
+
+            if error > maxError:
+                maxError = error
+                maxIndex = i
+
+        if maxIndex is not None:
+            keep[maxIndex] = True
+            stack.append((first, maxIndex))
+            stack.append((maxIndex, last))
+
+    return [i for i in range(numPoints) if keep[i]]
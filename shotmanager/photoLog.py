@@ -0,0 +1,169 @@
+#  photoLog.py
+#  shotmanager
+#
+#  Geotag log of photos taken, with a binary index by time.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import bisect
+import os
+import struct
+import tempfile
+
+import shotLogger
+
+logger = shotLogger.logger
+
+if 'SOLOLINK_SANDBOX' in os.environ:
+    PHOTO_LOG_FILE = os.path.join(tempfile.gettempdir(), 'photo.log')
+else:
+    PHOTO_LOG_FILE = "/log/photo.log"
+
+# seconds between fsyncs of the log while photos are being taken
+PHOTO_LOG_SYNC_INTERVAL = 5.0
+
+# index record: wall clock time of the photo, byte offset of its line in the log
+PHOTO_INDEX_FORMAT = '<dQ'
+PHOTO_INDEX_SIZE = struct.calcsize(PHOTO_INDEX_FORMAT)
+
+
+def indexPath(logPath):
+    return os.path.splitext(logPath)[0] + '.idx'
+
+
+class PhotoLog():
+    '''Appends "lat,lon,alt,time" lines to the photo log.
+
+    The log and its index stay open and buffered between photos; they are
+    written through and fsynced every PHOTO_LOG_SYNC_INTERVAL seconds by poll()
+    and whenever sync() is called, e.g. at the end of a shot. Each line also
+    gets a fixed width PHOTO_INDEX_FORMAT record in the index, so a photo can
+    be found with a binary search (see seekPhoto) instead of reading the
+    whole log. time in the log is monotonic and restarts at every boot, so
+    the index is keyed by wall clock time, which is also what the camera's
+    own timestamps are matched against. The index file outlives a boot and
+    the wall clock isn't set until GPS time arrives, so a photo whose wall
+    time is before the last one indexed is logged but left out of the index,
+    which keeps it sorted.
+    '''
+
+    def __init__(self, path = PHOTO_LOG_FILE):
+        self.path = path
+        self.log = None
+        self.index = None
+        # byte offset of the end of the log
+        self.offset = 0
+        # wall time of the last index record
+        self.lastWallTime = None
+        # photos written since the last sync, and when the first of them was
+        self.unsynced = 0
+        self.unsyncedSince = None
+
+    def open(self):
+        self.log = open(self.path, 'ab')
+        self.log.seek(0, os.SEEK_END)
+        self.offset = self.log.tell()
+        self.index = open(indexPath(self.path), 'a+b')
+        index = PhotoIndex(self.index)
+        if len(index) > 0:
+            self.lastWallTime = index[len(index) - 1][0]
+        self.index.seek(0, os.SEEK_END)
+
+    def add(self, lat, lon, alt, time, wallTime):
+        '''Logs a photo taken at monotonic time time, wallTime on the wall clock'''
+        try:
+            if self.log is None:
+                self.open()
+
+            line = "%.6f,%.6f,%.3f,%d\n" % (lat, lon, alt, time)
+            self.log.write(line)
+            if self.lastWallTime is None or wallTime >= self.lastWallTime:
+                self.index.write(struct.pack(PHOTO_INDEX_FORMAT, wallTime, self.offset))
+                self.lastWallTime = wallTime
+            else:
+                logger.log("[photolog]: wall clock at %.0f is behind the index, not indexing photo" % wallTime)
+            self.offset += len(line)
+        except (IOError, OSError) as e:
+            logger.log("[photolog]: could not log photo to %s (%s)" % (self.path, e))
+            self.close()
+            return
+
+        if self.unsynced == 0:
+            self.unsyncedSince = time
+        self.unsynced += 1
+
+    def poll(self, now):
+        '''Syncs if photos have been waiting longer than PHOTO_LOG_SYNC_INTERVAL'''
+        if self.unsynced > 0 and now - self.unsyncedSince >= PHOTO_LOG_SYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        '''Writes buffered photos through to disk'''
+        if self.log is None or self.unsynced == 0:
+            return
+
+        try:
+            for f in (self.log, self.index):
+                f.flush()
+                os.fsync(f.fileno())
+        except (IOError, OSError) as e:
+            logger.log("[photolog]: could not sync %s (%s)" % (self.path, e))
+        self.unsynced = 0
+        self.unsyncedSince = None
+
+    def close(self):
+        self.sync()
+        for f in (self.log, self.index):
+            if f is not None:
+                try:
+                    f.close()
+                except (IOError, OSError):
+                    pass
+        self.log = None
+        self.index = None
+
+
+class PhotoIndex():
+    '''Read only view of an index file as a sequence of (time, offset)'''
+
+    def __init__(self, f):
+        self.f = f
+        f.seek(0, os.SEEK_END)
+        self.count = f.tell() // PHOTO_INDEX_SIZE
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0 or i >= self.count:
+            raise IndexError(i)
+        self.f.seek(i * PHOTO_INDEX_SIZE)
+        return struct.unpack(PHOTO_INDEX_FORMAT, self.f.read(PHOTO_INDEX_SIZE))
+
+
+def seekPhoto(path, wallTime):
+    '''Returns (lat, lon, alt, time) of the first photo taken at or after
+    wallTime, or None, reading only the index entries a binary search visits'''
+    with open(indexPath(path), 'rb') as f:
+        index = PhotoIndex(f)
+        # PhotoLog never indexes a photo out of order, so the index is sorted by time
+        i = bisect.bisect_left(index, (wallTime,))
+        if i == len(index):
+            return None
+        (photoWallTime, offset) = index[i]
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        (lat, lon, alt, time) = f.readline().strip().split(',')
+    return (float(lat), float(lon), float(alt), int(time))
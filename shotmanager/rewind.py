@@ -110,6 +110,10 @@ class RewindShot():
         self.lastTime = None
         
         self.splineOrigin = None
+        self.splineFrame = None
+
+        # geoFenceManager.fenceVersion the cable was last limited for
+        self.fenceVersion = None
         
         if not self.generateSplines():
             logger.log("[Rewind]: Spline generation failed.")
@@ -135,7 +139,8 @@ class RewindShot():
             else:
                 self.shotmgr.enterShot(shots.APP_SHOT_NONE)
             return
-        
+
+        self.limitToFence()
         self.travel()
 
         # Freelook
@@ -171,8 +176,8 @@ class RewindShot():
 
         self.cable.update(dt)
 
-        # add NED position vector to spline origin (addVectorToLocation needs NEU)
-        self.commandPos = location_helpers.addVectorToLocation(self.splineOrigin, Vector3(self.cable.position.x, self.cable.position.y, -self.cable.position.z))
+        # convert NED position vector from the spline origin to lat, lon, alt
+        (lat, lon, alt) = self.splineFrame.fromNED(self.cable.position.x, self.cable.position.y, self.cable.position.z)
 
         # assign velocity from controller
         self.commandVel = self.cable.velocity
@@ -183,9 +188,9 @@ class RewindShot():
             0, 1,    # target system, target component
             mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT,  # frame
             0b0000110111000000,  # type_mask - enable pos/vel
-            int(self.commandPos.lat * 10000000),  # latitude (degrees*1.0e7)
-            int(self.commandPos.lon * 10000000),  # longitude (degrees*1.0e7)
-            self.commandPos.alt,  # altitude (meters)
+            int(lat * 10000000),  # latitude (degrees*1.0e7)
+            int(lon * 10000000),  # longitude (degrees*1.0e7)
+            alt,  # altitude (meters)
             self.commandVel.x, self.commandVel.y, self.commandVel.z,  # North, East, Down velocity (m/s)
             0, 0, 0,  # x, y, z acceleration (not used)
             0, 0)    # yaw, yaw_rate (not used)
@@ -247,24 +252,26 @@ class RewindShot():
         ctrlPtsLLA.append(loc)
         # store as spline origin
         self.splineOrigin = ctrlPtsLLA[0]
+        self.splineFrame = location_helpers.LocalFrame(self.splineOrigin)
         
         # read all available locations
         while (loc is not None):
             loc = self.rewindManager.queueNextloc()
             if loc is not None:
-                logger.log("[Rewind] read loc: %f %f %f" % (loc.lat, loc.lon, loc.alt))
                 ctrlPtsLLA.append(loc)
-            else:
-                print "loc: None"
+
+        logger.log("[Rewind] read %d locs" % len(ctrlPtsLLA))
 
         # try and have a 3 point spline or longer:
         if len(ctrlPtsLLA) < 2:
             return False
 
-        # Save offsets from home for spline
-        for n in range(1, len(ctrlPtsLLA)):
-            ctrlPtsCart.append(location_helpers.getVectorFromPoints(self.splineOrigin, ctrlPtsLLA[n]))
-            ctrlPtsCart[-1].z *= -1. #NED
+        # Save offsets from home for spline, converting the whole trail at once
+        (north, east, down) = self.splineFrame.toNEDArrays([loc.lat for loc in ctrlPtsLLA[1:]],
+                                                           [loc.lon for loc in ctrlPtsLLA[1:]],
+                                                           [loc.alt for loc in ctrlPtsLLA[1:]])
+        for n in range(len(north)):
+            ctrlPtsCart.append(Vector3(north[n], east[n], down[n]))
 
         # Construct spline object
         try:
@@ -275,9 +282,30 @@ class RewindShot():
 
         #set the location to the start point
         self.cable.setCurrentP(0)
+
+        # stop short of the first stretch of the trail that breaches the geofence
+        self.limitToFence()
         return True
 
 
+    def limitToFence(self):
+        '''Limits the cable to the clear stretch around us, checking again whenever the fences change'''
+        fenceVersion = self.shotmgr.geoFenceManager.fenceVersion
+        if fenceVersion == self.fenceVersion:
+            return
+        self.fenceVersion = fenceVersion
+
+        reachable = (0.0, 1.0)
+        fenceCheck = self.shotmgr.geoFenceManager.checkCable(self.cable, self.splineFrame)
+        if fenceCheck is not None:
+            reachable = fenceCheck.reachableRange(self.cable.currentP)
+            if reachable is None:
+                # already in a breached stretch, so don't fly any of the trail
+                logger.log("[Rewind]: Trail position %.3f is outside the geofence. Holding." % self.cable.currentP)
+                reachable = (self.cable.currentP, self.cable.currentP)
+        self.cable.setReachableRange(*reachable)
+
+
     def manualGimbalTargeting(self):
         '''set gimbal targeting mode to manual'''
         msg = self.vehicle.message_factory.mount_configure_encode(
@@ -27,14 +27,34 @@ import location_helpers
 import struct
 import app_packet
 import math
+import monotonic
+import os
+import Queue
 import shotLogger
+import tempfile
+from breadcrumbStore import BreadcrumbStore
+from breadcrumbTrail import BreadcrumbTrail
 
 RTL_STEP_DIST = 1
 RTL_MIN_DISTANCE = 10
 RTL_DEFAULT_DISTANCE = 20
-RTL_MAX_DISTANCE = 60
-
-LOOP_LIMITER = 4
+RTL_MAX_DISTANCE = 2000
+
+# max distance a dropped breadcrumb may sit from the simplified trail, meters
+RTL_SIMPLIFY_TOLERANCE = 0.5
+# preallocated breadcrumbs, also the cap on Rewind spline control points
+RTL_TRAIL_CAPACITY = 1024
+
+# tmpfs copy of the breadcrumbs and home, kept across shotmanager restarts but not reboots
+if 'SOLOLINK_SANDBOX' in os.environ:
+    RTL_TRAIL_FILE = os.path.join(tempfile.gettempdir(), 'shotmanager_rewind.trail')
+else:
+    RTL_TRAIL_FILE = "/run/shotmanager_rewind.trail"
+
+# minimum time between location samples handed to the main loop, seconds
+RTL_SAMPLE_INTERVAL = 0.1
+# location samples waiting for the main loop
+RTL_SAMPLE_QUEUE_SIZE = 64
 logger = shotLogger.logger
 
 class RewindManager():
@@ -56,39 +76,88 @@ class RewindManager():
         # length of breadcrumb trail
         self.rewindDistance = RTL_DEFAULT_DISTANCE
 
-        # Size of location storage
-        self.bufferSize  = int(math.floor(self.rewindDistance / RTL_STEP_DIST))
+        # simplified breadcrumb trail, sized for the longest rewind
+        self.trail = BreadcrumbTrail(RTL_TRAIL_CAPACITY, RTL_SIMPLIFY_TOLERANCE, self.rewindDistance)
 
-        # location buffer and pointer
-        self.buffer = None
-        self.currentIndex = 0
+        # mirror the trail to disk so an in-air restart can pick it up
+        self.store = None
+        try:
+            self.store = BreadcrumbStore(RTL_TRAIL_FILE, RTL_TRAIL_CAPACITY)
+        except Exception as e:
+            logger.log("[RewindManager] could not open %s, breadcrumbs won't survive a restart (%s)" % (RTL_TRAIL_FILE, e))
 
         # Flag to fill buffer once we get good locations
         self.did_init = False
 
-        # compute limiting
-        self.counter = 0
+        # set by callbacks on the dronekit thread, the main loop resets the trail
+        self.resetRequested = False
+
+        # location samples from the dronekit thread, as (lat, lon, alt, time)
+        self.samples = Queue.Queue(RTL_SAMPLE_QUEUE_SIZE)
+        self.lastSampleLocation = None
+        self.lastSampleTime = None
+
+        # sampling counters
+        self.samplesConsidered = 0
+        self.samplesQueued = 0
+        self.samplesDropped = 0
+        self.samplesStored = 0
 
         # proxy for the vehcile home
         self.homeLocation = None
         
         # manages behavior in Auto
         self.fs_thr = self.shotmgr.getParam( "FS_THR_ENABLE", 2 )
+
+        if self.store:
+            self.trail.store = self.store
+
+
+    def restore(self):
+        ''' Reload the breadcrumbs and home stored before an in-air restart '''
+        if self.store is None or not self.store.restore(self.trail) or len(self.trail) == 0:
+            return False
+
+        self.rewindDistance = self.trail.maxLength
+        self.did_init = True
+        # an armed report that came in before the restore shouldn't wipe it
+        self.resetRequested = False
+
+        home = self.store.readHome()
+        if home is not None:
+            self.homeLocation = LocationGlobal(*home)
+
+        logger.log("[RewindManager] restored %d breadcrumbs over %d m" % (len(self.trail), self.trail.pathLength))
+        return True
+
+
+    def saveHomeLocation(self):
+        if self.store:
+            if self.homeLocation is None:
+                self.store.writeHome(None)
+            else:
+                self.store.writeHome((self.homeLocation.lat, self.homeLocation.lon, self.homeLocation.alt))
         
 
 
     def resetSpline(self):
-        logger.log("[RewindManager] reset Spline to size %d" % self.bufferSize)
+        logger.log("[RewindManager] reset Spline to %d m (samples: %d considered, %d queued, %d dropped, %d stored)" %
+                   (self.rewindDistance, self.samplesConsidered, self.samplesQueued, self.samplesDropped, self.samplesStored))
         vehicleLocation = self.vehicle.location.global_relative_frame
 
         if vehicleLocation is None or vehicleLocation.lat is None or vehicleLocation.lon is None or vehicleLocation.alt is None:    
             self.did_init = False
             return
         else:
-            self.buffer = [None for i in range(self.bufferSize)]
+            self.trail.clear()
+            self.trail.append(vehicleLocation.lat, vehicleLocation.lon, vehicleLocation.alt, monotonic.monotonic())
             self.did_init = True
-            self.buffer[0] = vehicleLocation
-            self.currentIndex = 0
+
+
+    def requestReset(self):
+        ''' Reset the trail on the main loop's next updateLocation.
+        Safe to call from the dronekit thread. '''
+        self.resetRequested = True
 
 
     def loadHomeLocation(self):
@@ -107,6 +176,7 @@ class RewindManager():
         ''' Handles callback for home location from vehicle '''
         self.vehicle.remove_message_listener('MISSION_ITEM', self.handleMissionItem)
         self.homeLocation = LocationGlobal(msg.x, msg.y, msg.z)
+        self.saveHomeLocation()
         logger.log("[RewindManager] loaded home %f %f, alt %f" % (self.homeLocation.lat, self.homeLocation.lon, self.homeLocation.alt))
         # Send home to the App
         self.updateAppOptions()
@@ -120,84 +190,83 @@ class RewindManager():
         self.shotmgr.appMgr.sendPacket(packet)
 
 
-    def updateLocation(self):
-        ''' Store locations for Rewind Spline'''
+    def location_callback(self, vehicle, name, location):
+        ''' Queues position updates for Rewind, decimated by time and distance.
+        Called by dronekit on its own thread. '''
+        self.samplesConsidered += 1
 
-        # load limiter
-        self.counter += 1
-
-        if self.counter > LOOP_LIMITER:
-            self.counter = 0
-        else:
+        if location is None or location.lat is None or location.lon is None or location.alt is None:
             return
 
-        if not self.vehicle.armed or self.vehicle.system_status != 'ACTIVE':
-            # we don't want to reset every cycle while on ground
-            if self.currentIndex != 0:
-                self.resetSpline()
-            return
-
-        vehicleLocation = self.vehicle.location.global_relative_frame
+        now = monotonic.monotonic()
+        if self.lastSampleLocation is not None:
+            if now - self.lastSampleTime < RTL_SAMPLE_INTERVAL:
+                return
+            if location_helpers.getDistanceFromPoints3d(self.lastSampleLocation, location) < RTL_STEP_DIST:
+                return
 
-        if vehicleLocation is None or vehicleLocation.lat is None or vehicleLocation.lon is None or vehicleLocation.alt is None:
+        try:
+            self.samples.put_nowait((location.lat, location.lon, location.alt, now))
+        except Queue.Full:
+            self.samplesDropped += 1
             return
 
-        # reset buffer with the current location if needed
-        if self.did_init is False or self.buffer[self.currentIndex] is None:
-            self.resetSpline()
-            return
+        self.lastSampleLocation = location
+        self.lastSampleTime = now
+        self.samplesQueued += 1
 
-        try:
-            # calc distance from home
-            dist = location_helpers.getDistanceFromPoints3d(self.buffer[self.currentIndex], vehicleLocation)
 
-        except Exception as e:
-            logger.log('[RewindManager]: loc was None, %s' % e)
+    def discardSamples(self):
+        ''' Throw away queued locations, e.g. while we are rewinding '''
+        try:
+            while True:
+                self.samples.get_nowait()
+        except Queue.Empty:
+            pass
 
 
-        #logger.log("dist %f"% dist)
+    def updateLocation(self):
+        ''' Store queued locations for Rewind Spline'''
 
-        if dist >= RTL_STEP_DIST:
-            # store new location in next index
-            self.currentIndex += 1
-            # mind the size of the buffer
-            if(self.currentIndex >= self.bufferSize):
-                self.currentIndex = 0
+        if self.resetRequested:
+            self.resetRequested = False
+            self.resetSpline()
 
-            # store the location
-            self.buffer[self.currentIndex] = vehicleLocation
+        if not self.vehicle.armed or self.vehicle.system_status != 'ACTIVE':
+            self.discardSamples()
+            # we don't want to reset every cycle while on ground
+            if len(self.trail) > 1:
+                self.resetSpline()
+            return
 
-            # keep for testing
-            #logger.log("[RWMGR]: Save %d %f %f %f" % (self.currentIndex,
-            #                    vehicleLocation.lat,
-            #                    vehicleLocation.lon,
-            #                    vehicleLocation.alt))
+        while True:
+            try:
+                (lat, lon, alt, t) = self.samples.get_nowait()
+            except Queue.Empty:
+                return
 
+            # reset buffer with the current location if needed
+            if self.did_init is False or len(self.trail) == 0:
+                self.resetSpline()
+                continue
 
-    def queueNextloc(self):
-        ''' Called by Rewind shot '''
+            if self.trail.distanceToNewest(lat, lon, alt) >= RTL_STEP_DIST:
+                self.trail.append(lat, lon, alt, t)
+                self.samplesStored += 1
 
-        if self.buffer is None:
-            return None
 
-        # get ref to current buffered location
-        temp = self.buffer[self.currentIndex]
+    def queueNextloc(self):
+        ''' Called by Rewind shot, returns breadcrumbs newest first '''
 
-        # put a None in the array to clear it
-        self.buffer[self.currentIndex] = None
+        point = self.trail.pop()
 
-        # decrement index
-        self.currentIndex -= 1
-        if self.currentIndex < 0:
-            self.currentIndex = self.bufferSize - 1
-        
-        #logger.log("[RewindManager] next loc index %d %d" % (self.currentIndex, self.bufferSize))
-        
-        if temp is None:
+        if point is None:
             #logger.log("[RewindManager] next loc is None")
             self.resetSpline()
+            return None
 
-        return temp
+        (lat, lon, alt, t) = point
+        return LocationGlobalRelative(lat, lon, alt)
 
 
     def handlePacket(self, packetType, packetLength, packetValue):
@@ -215,8 +284,7 @@ class RewindManager():
 
                     if _rewindDistance != self.rewindDistance:
                         self.rewindDistance = max(min(_rewindDistance, RTL_MAX_DISTANCE), RTL_MIN_DISTANCE)
-                        self.bufferSize  = int(math.floor(self.rewindDistance / RTL_STEP_DIST))
-                        logger.log("[RWMGR]: self.bufferSize: %d" % self.bufferSize)
+                        self.trail.maxLength = self.rewindDistance
                         self.resetSpline()
 
             elif packetType == app_packet.SOLO_HOME_LOCATION:
@@ -229,6 +297,7 @@ class RewindManager():
                 # only respond to the app data when we are armed and in the air
                 if self.vehicle.armed == 1 and self.vehicle.system_status == 'ACTIVE':
                     self.homeLocation = LocationGlobal(lat, lon, self.homeLocation.alt)
+                    self.saveHomeLocation()
                     #logger.log("[RWMGR]: New Home loc set: %f, %f, %f" % (lat, lon, self.homeLocation.alt))
 
                     # let the app know we repsoned to the data
@@ -0,0 +1,229 @@
+#  roiFilter.py
+#  shotmanager
+#
+#  Streaming ROI filters with latency-compensating prediction.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import numpy
+
+from location_helpers import LocalFrame
+
+
+class IIRFilter():
+    '''Direct form I IIR filter run on several channels at once.
+
+    Clocked by update(): when no new measurement is given the last one is
+    held, so the filter can run at the tick rate on slower data. Velocity is
+    the change in output over the update interval.
+    '''
+
+    # output stays put while the input is held
+    coasts = False
+
+    def __init__(self, num, den, channels):
+        if len(num) == 0 or len(den) < 2 or den[0] == 0:
+            raise ValueError("IIRFilter needs a numerator and at least a 1st order denominator")
+
+        self.b = numpy.array(num, dtype=float) / den[0]
+        self.a = numpy.array(den[1:], dtype=float) / den[0]
+
+        # input and output histories, newest first
+        self.inputs = numpy.zeros((len(self.b), channels))
+        self.outputs = numpy.zeros((len(self.a), channels))
+
+        self.position = numpy.zeros(channels)
+        self.velocity = numpy.zeros(channels)
+        self.feedback = numpy.zeros(channels)
+
+    def reset(self, values):
+        '''Starts the filter at rest on values'''
+        self.inputs[:] = values
+        self.outputs[:] = values
+        self.position[:] = values
+        self.velocity[:] = 0.0
+
+    def update(self, values, dt, age = 0.0):
+        '''Advances the filter by dt seconds, with new input values or None to
+        hold the last ones. age is unused, a held input is led instead.'''
+        self.inputs[1:] = self.inputs[:-1]
+        if values is not None:
+            self.inputs[0] = values
+
+        numpy.dot(self.b, self.inputs, out = self.position)
+        numpy.dot(self.a, self.outputs, out = self.feedback)
+        self.position -= self.feedback
+
+        numpy.subtract(self.position, self.outputs[0], out = self.velocity)
+        self.velocity /= dt
+
+        self.outputs[1:] = self.outputs[:-1]
+        self.outputs[0] = self.position
+
+
+class ConstantVelocityKalman():
+    '''Independent position/velocity Kalman filters, one per channel.
+
+    Models the subject as moving at constant velocity disturbed by white
+    acceleration noise (accelNoise, in units/s^2) and measured with
+    measurementNoise (units) of position error. Predicts every update and
+    corrects only when a new measurement is given.
+    '''
+
+    # position is carried forward along velocity between measurements
+    coasts = True
+
+    def __init__(self, channels, accelNoise, measurementNoise):
+        self.q = accelNoise * accelNoise
+        self.r = measurementNoise * measurementNoise
+
+        self.position = numpy.zeros(channels)
+        self.velocity = numpy.zeros(channels)
+
+        # symmetric covariance [[p00, p01], [p01, p11]] of each channel
+        self.p00 = numpy.zeros(channels)
+        self.p01 = numpy.zeros(channels)
+        self.p11 = numpy.zeros(channels)
+
+        self.gain0 = numpy.zeros(channels)
+        self.gain1 = numpy.zeros(channels)
+        self.innovation = numpy.zeros(channels)
+        self.ph0 = numpy.zeros(channels)
+        self.ph1 = numpy.zeros(channels)
+
+    def reset(self, values):
+        '''Starts the filter at values with an unknown velocity'''
+        self.position[:] = values
+        self.velocity[:] = 0.0
+        self.p00[:] = self.r
+        self.p01[:] = 0.0
+        # a subject could plausibly be moving at 10 units/s
+        self.p11[:] = 100.0
+
+    def predict(self, dt):
+        dt2 = dt * dt
+        self.position += self.velocity * dt
+        self.p00 += (2.0 * self.p01 + self.p11 * dt) * dt + self.q * dt2 * dt2 / 4.0
+        self.p01 += self.p11 * dt + self.q * dt2 * dt / 2.0
+        self.p11 += self.q * dt2
+
+    def correct(self, values, age = 0.0):
+        '''Corrects with values measured age seconds ago, i.e. of position - velocity * age'''
+        # P * H' for H = [1, -age]
+        numpy.multiply(self.p01, -age, out = self.ph0)
+        self.ph0 += self.p00
+        numpy.multiply(self.p11, -age, out = self.ph1)
+        self.ph1 += self.p01
+
+        # innovation covariance H * P * H' + R, then the gains
+        numpy.multiply(self.ph1, -age, out = self.gain1)
+        self.gain1 += self.ph0
+        self.gain1 += self.r
+        numpy.divide(self.ph0, self.gain1, out = self.gain0)
+        numpy.divide(self.ph1, self.gain1, out = self.gain1)
+
+        numpy.multiply(self.velocity, age, out = self.innovation)
+        self.innovation += values
+        self.innovation -= self.position
+
+        self.position += self.gain0 * self.innovation
+        self.velocity += self.gain1 * self.innovation
+
+        self.p00 -= self.gain0 * self.ph0
+        self.p01 -= self.gain0 * self.ph1
+        self.p11 -= self.gain1 * self.ph1
+
+    def update(self, values, dt, age = 0.0):
+        '''Advances the filter by dt seconds, correcting with new values
+        (measured age seconds ago) unless None'''
+        self.predict(dt)
+        if values is not None:
+            self.correct(values, age)
+
+
+class LocalROIFilter():
+    '''Smooths a stream of ROI Locations in a LocalFrame.
+
+    North/east run through horizontalFilter (an IIRFilter or a
+    ConstantVelocityKalman with 2 channels) in meters, so latitude and
+    longitude are treated alike. Altitude gets a 1st order low pass with
+    altGain. The smoothed ROI is led along its velocity by latency seconds,
+    to make up for phone GPS and link delay, plus the age of the newest ROI
+    unless the filter already coasts forward between measurements.
+    '''
+
+    def __init__(self, horizontalFilter, altGain, latency):
+        self.filter = horizontalFilter
+        self.altGain = altGain
+        self.latency = latency
+
+        self.frame = None
+        self.lastROI = None
+        # number of updates since the first ROI
+        self.updates = 0
+
+        self.measurement = numpy.zeros(2)
+        self.alt = 0.0
+        self.climbRate = 0.0
+
+        # led north, east (m) and altitude
+        self.predicted = numpy.zeros(2)
+        self.predictedAlt = 0.0
+
+    def reset(self):
+        self.frame = None
+        self.lastROI = None
+        self.updates = 0
+
+    def update(self, roi, dt, age = 0.0):
+        '''Advances the filter by dt seconds. roi is the latest ROI from the
+        app; if it is the same object as last time it is treated as no new data.
+        age is how long ago roi was captured, in seconds.'''
+        if self.frame is None:
+            self.frame = LocalFrame(roi)
+            self.filter.reset(0.0)
+            self.alt = roi.alt
+            self.climbRate = 0.0
+            newROI = None
+        elif roi is not self.lastROI:
+            (north, east, down) = self.frame.toNEDFromLatLonAlt(roi.lat, roi.lon, roi.alt)
+            self.measurement[0] = north
+            self.measurement[1] = east
+            newROI = self.measurement
+        else:
+            newROI = None
+
+        if self.updates > 0:
+            self.filter.update(newROI, dt, age)
+            alt = self.altGain * self.alt + (1 - self.altGain) * roi.alt
+            self.climbRate = (alt - self.alt) / dt
+            self.alt = alt
+
+        self.lastROI = roi
+        self.updates += 1
+
+        horizon = self.latency
+        if not self.filter.coasts:
+            horizon += age
+        numpy.multiply(self.filter.velocity, horizon, out = self.predicted)
+        self.predicted += self.filter.position
+        self.predictedAlt = self.alt + self.climbRate * horizon
+
+    def location(self):
+        '''Returns the led ROI as a new Location'''
+        return self.frame.locationFromNED(self.predicted[0], self.predicted[1], -self.predictedAlt + self.frame.alt)
+
+    def velocity(self):
+        '''Returns the ROI velocity as (north, east, up) in m/s'''
+        return (float(self.filter.velocity[0]), float(self.filter.velocity[1]), self.climbRate)
@@ -0,0 +1,141 @@
+#  roiJitterBuffer.py
+#  shotmanager
+#
+#  Reorders and time-aligns timestamped ROIs from the app.
+#
+#  Copyright (c) 2016 3D Robotics.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import bisect
+import collections
+
+# most ROIs held waiting for their playout time
+ROI_JITTER_CAPACITY = 16
+# number of recent packets the clock offset is taken over
+ROI_JITTER_WINDOW = 64
+# weight of each new packet in the mean jitter
+ROI_JITTER_MEAN_GAIN = 0.05
+# a packet this many sequence numbers behind the newest starts a new stream
+# (the app restarted it, or the sequence wrapped) rather than being late
+ROI_JITTER_RESTART_GAP = 256
+
+
+class ROIJitterBuffer():
+    '''Holds timestamped ROIs for a short playout delay so they come out in
+    order and evenly spaced.
+
+    The sender's clock is aligned to ours with the smallest (arrival - capture)
+    seen over the last ROI_JITTER_WINDOW packets, i.e. the offset of a packet
+    that met no queueing. Anything slower than that is jitter. A packet is
+    released delay seconds after its aligned capture time; packets older than
+    one already released are dropped as late, unless they are so far behind
+    that the sender must have restarted its sequence, which starts over.
+    '''
+
+    def __init__(self, delay):
+        self.delay = delay
+
+        # (sequence, captureTime, lat, lon, alt), sorted by sequence
+        self.pending = []
+        self.delays = collections.deque(maxlen = ROI_JITTER_WINDOW)
+        self.offset = None
+        self.lastReleased = None
+
+        # statistics
+        self.firstSequence = None
+        self.highestSequence = None
+        # sequence numbers spanned by earlier streams
+        self.spanBefore = 0
+        self.restarts = 0
+        self.received = 0
+        self.duplicates = 0
+        self.late = 0
+        self.reordered = 0
+        self.overflows = 0
+        self.meanJitter = 0.0
+        self.maxJitter = 0.0
+
+    def lost(self):
+        '''Packets never seen between the first and the highest sequence number'''
+        if self.firstSequence is None:
+            return 0
+        span = self.spanBefore + self.highestSequence - self.firstSequence + 1
+        return max(0, span - (self.received - self.duplicates))
+
+    def restart(self):
+        '''Forgets the old stream and its clock alignment'''
+        self.spanBefore += self.highestSequence - self.firstSequence + 1
+        self.firstSequence = None
+        self.highestSequence = None
+        self.pending = []
+        self.delays.clear()
+        self.offset = None
+        self.lastReleased = None
+        self.restarts += 1
+
+    def push(self, sequence, captureTime, arrivalTime, lat, lon, alt):
+        '''Adds a packet captured at captureTime on the sender's clock and
+        received at arrivalTime on ours. Returns False if it was dropped.'''
+        self.received += 1
+
+        if self.highestSequence is not None and self.highestSequence - sequence > ROI_JITTER_RESTART_GAP:
+            self.restart()
+
+        # too late to be played out (or a copy of one that already was)
+        if self.lastReleased is not None and sequence <= self.lastReleased:
+            self.late += 1
+            return False
+
+        index = bisect.bisect_left(self.pending, (sequence,))
+        if index < len(self.pending) and self.pending[index][0] == sequence:
+            self.duplicates += 1
+            return False
+
+        if self.firstSequence is None:
+            self.firstSequence = sequence
+            self.highestSequence = sequence
+        elif sequence > self.highestSequence:
+            self.highestSequence = sequence
+        else:
+            self.reordered += 1
+
+        self.delays.append(arrivalTime - captureTime)
+        self.offset = min(self.delays)
+        jitter = arrivalTime - captureTime - self.offset
+        self.meanJitter += ROI_JITTER_MEAN_GAIN * (jitter - self.meanJitter)
+        self.maxJitter = max(self.maxJitter, jitter)
+
+        self.pending.insert(index, (sequence, captureTime, lat, lon, alt))
+        if len(self.pending) > ROI_JITTER_CAPACITY:
+            self.lastReleased = self.pending.pop(0)[0]
+            self.overflows += 1
+        return True
+
+    def pop(self, now):
+        '''Returns the newest ROI due by now as (alignedTime, lat, lon, alt),
+        where alignedTime is its capture time on our clock, or None. Older due
+        ROIs are superseded by it and dropped.'''
+        released = None
+        while self.pending and self.pending[0][1] + self.offset + self.delay <= now:
+            released = self.pending.pop(0)
+
+        if released is None:
+            return None
+
+        (sequence, captureTime, lat, lon, alt) = released
+        self.lastReleased = sequence
+        return (captureTime + self.offset, lat, lon, alt)
+
+    def summary(self):
+        return "%d received, %d lost, %d late, %d reordered, %d duplicate, %d restarts, jitter %.3f s mean %.3f s max" % \
+            (self.received, self.lost(), self.late, self.reordered, self.duplicates, self.restarts, self.meanJitter, self.maxJitter)
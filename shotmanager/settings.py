@@ -1,10 +1,14 @@
 #
 # This file handles reading/writing settings from shotmanager.conf
 #
+import atexit
+import hashlib
 import os
 import threading
+import time
 import shotLogger
 import ConfigParser
+import StringIO
 logger = shotLogger.logger
 
 settingsLock = threading.Lock()
@@ -17,47 +21,147 @@ else:
     CONFIG_FILE_BACKUP = "/etc/shotmanager.back"
     CONFIG_FILE_EXT = "/usr/bin/extSettings.conf"
 
-def writeSettingsThread(name, value):
-    settingsLock.acquire()
+# changes are held this long so a burst of them becomes one write, seconds
+SETTINGS_WRITE_DELAY = 0.5
+
+# settings waiting to be written, name -> value
+pendingSettings = {}
+pendingLock = threading.Lock()
+# thread that will write them out, if one has been started
+writerThread = None
+
+# parsed config files, path -> ((mtime, size), parser)
+configCache = {}
 
-    # write to the config file
-    config = ConfigParser.SafeConfigParser()
-    config.optionxform=str
 
-    config.read(CONFIG_FILE)
+# writes contents to path by way of a temp file, so path always holds either
+# the old or the new contents in full
+def writeFileAtomic(path, contents):
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(contents)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(tmp, path)
+
+# the same line md5sum writes, which is what configinit checks at boot
+def md5Line(path, contents):
+    return "%s  %s\n" % (hashlib.md5(contents).hexdigest(), path)
+
+def syncDirectory(path):
+    fd = os.open(os.path.dirname(os.path.realpath(path)), os.O_RDONLY)
     try:
-        config.set("shotManager", name, value)
-    except:
-        logger.log("Failed to write setting")
-
-    # back up the file
-    os.system("cp %s %s" % (CONFIG_FILE, CONFIG_FILE_BACKUP))
-    os.system("md5sum %s > %s.md5" % (CONFIG_FILE_BACKUP, CONFIG_FILE_BACKUP))
-    os.system("sync")
-    # modify config file and set md5
-    with open(CONFIG_FILE, 'wb') as configfile:
-        config.write(configfile)
-    os.system("md5sum %s > %s.md5" % (CONFIG_FILE, CONFIG_FILE))
-    os.system("sync")
-    os.system("rm %s %s.md5" % (CONFIG_FILE_BACKUP, CONFIG_FILE_BACKUP))
-    os.system("sync")
-
-    logger.log("wrote setting: %s: %s"%(name, value))
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
-    settingsLock.release()
+# writes values, a dict of setting names to values, to the config file
+def writeSettings(values):
+    settingsLock.acquire()
+
+    try:
+        # write to the config file
+        config = ConfigParser.SafeConfigParser()
+        config.optionxform=str
+
+        config.read(CONFIG_FILE)
+        for (name, value) in values.items():
+            try:
+                config.set("shotManager", name, value)
+            except:
+                logger.log("Failed to write setting")
+
+        contents = StringIO.StringIO()
+        config.write(contents)
+        contents = contents.getvalue()
+
+        # back up the file. The backup is a second link to the current file, which
+        # stays intact because the new file is renamed over the old name rather
+        # than written in place. If we're interrupted before the new md5 is in
+        # place, configinit restores the backup at boot.
+        if os.path.exists(CONFIG_FILE):
+            try:
+                with open(CONFIG_FILE, 'rb') as f:
+                    old = f.read()
+                if os.path.exists(CONFIG_FILE_BACKUP):
+                    os.remove(CONFIG_FILE_BACKUP)
+                os.link(CONFIG_FILE, CONFIG_FILE_BACKUP)
+                writeFileAtomic(CONFIG_FILE_BACKUP + ".md5", md5Line(CONFIG_FILE_BACKUP, old))
+            except (IOError, OSError) as e:
+                logger.log("could not back up %s: %s" % (CONFIG_FILE, e))
+
+        # modify config file and set md5
+        writeFileAtomic(CONFIG_FILE, contents)
+        writeFileAtomic(CONFIG_FILE + ".md5", md5Line(CONFIG_FILE, contents))
+        syncDirectory(CONFIG_FILE)
+        configCache.pop(CONFIG_FILE, None)
+
+        for path in (CONFIG_FILE_BACKUP, CONFIG_FILE_BACKUP + ".md5"):
+            if os.path.exists(path):
+                os.remove(path)
+
+        for (name, value) in values.items():
+            logger.log("wrote setting: %s: %s"%(name, value))
+    except (IOError, OSError) as e:
+        logger.log("failed to write %s: %s" % (CONFIG_FILE, e))
+    finally:
+        settingsLock.release()
+
+# writes out any settings waiting to be written
+def flushSettings():
+    global writerThread
+
+    pendingLock.acquire()
+    values = dict(pendingSettings)
+    writerThread = None
+    pendingLock.release()
+
+    if not values:
+        return
+    writeSettings(values)
+
+    # readers see pending values until they're in the file
+    pendingLock.acquire()
+    for (name, value) in values.items():
+        if pendingSettings.get(name) == value:
+            del pendingSettings[name]
+    pendingLock.release()
+
+
+# returns the parsed config file at path, parsing it again only if its
+# modification time or size has changed since we last did
+# call with settingsLock held
+def readConfig(path):
+    try:
+        info = os.stat(path)
+        stamp = (info.st_mtime, info.st_size)
+    except OSError:
+        stamp = None
 
+    cached = configCache.get(path)
+    if cached is not None and stamp is not None and cached[0] == stamp:
+        return cached[1]
+
+    # if the config file is not found, an empty config is returned and the "get"
+    # operations that follow fail
+    config = ConfigParser.SafeConfigParser()
+    config.read(path)
+    configCache[path] = (stamp, config)
+    return config
 
 # reads and returns setting of the given name
-# perhaps we shouldn't read the file for each setting, but that's something we can address
-# when we have more settings
 def readSetting(name):
-    # get our saved button mappings
-    config = ConfigParser.SafeConfigParser()
+    # a setting that hasn't been written out yet is still current
+    pendingLock.acquire()
+    try:
+        if name in pendingSettings:
+            return pendingSettings[name]
+    finally:
+        pendingLock.release()
 
+    # get our saved button mappings
     settingsLock.acquire()
-    # if the config file is not found, an empty list is returned and the "get"
-    # operations below fail
-    config.read(CONFIG_FILE)
+    config = readConfig(CONFIG_FILE)
     settingsLock.release()
 
     try:
@@ -67,14 +171,29 @@ def readSetting(name):
         raise
         return 0
 
+# reads and returns all our settings as a dict of name -> value
+# names are lowercase, as readSetting looks them up
+def readSettings():
+    settingsLock.acquire()
+    config = readConfig(CONFIG_FILE)
+    settingsLock.release()
+
+    try:
+        values = dict(config.items("shotManager"))
+    except:
+        logger.log("error reading %s"%(CONFIG_FILE,))
+        raise
+
+    pendingLock.acquire()
+    for (name, value) in pendingSettings.items():
+        values[config.optionxform(name)] = value
+    pendingLock.release()
+    return values
+
 def readSettingExt(name):
     # get our saved button mappings for extended button functions
-    config = ConfigParser.SafeConfigParser()
-
     settingsLock.acquire()
-    # if the config file is not found, an empty list is returned and the "get"
-    # operations below fail
-    config.read(CONFIG_FILE_EXT)
+    config = readConfig(CONFIG_FILE_EXT)
     settingsLock.release()
 
     try:
@@ -84,10 +203,26 @@ def readSettingExt(name):
         return 0
 
 
-# starts our thread which writes out our setting
+# queues our setting to be written out, along with any others that change
+# within SETTINGS_WRITE_DELAY
 # note both name and value should be strings
 def writeSetting(name, value):
-    thread = threading.Thread(name = "writeSettingsThread", target = writeSettingsThread, args = (name, value))
-    thread.daemon = True
-    thread.start()
+    global writerThread
 
+    pendingLock.acquire()
+    try:
+        pendingSettings[name] = value
+        if writerThread is None:
+            thread = threading.Thread(name = "writeSettingsThread", target = writeSettingsThread)
+            thread.daemon = True
+            thread.start()
+            writerThread = thread
+    finally:
+        pendingLock.release()
+
+def writeSettingsThread():
+    time.sleep(SETTINGS_WRITE_DELAY)
+    flushSettings()
+
+# the writer thread is a daemon, so write out anything it hasn't got to yet
+atexit.register(flushSettings)
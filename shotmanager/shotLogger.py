@@ -1,18 +1,137 @@
 #!/usr/bin/env python
 
+import atexit
 import os
 import logging
 import logging.config
+import monotonic
+import Queue
+import sys
+import threading
+import time
+
+# most messages waiting for the writer thread before new ones are dropped
+LOG_QUEUE_SIZE = 1024
+# window over which each call site is rate limited, seconds
+LOG_RATE_PERIOD = 1.0
+# most messages one call site may log in a window
+LOG_RATE_LIMIT = 20
+# seconds to wait for queued messages to be written at exit
+LOG_EXIT_TIMEOUT = 1.0
 
 class Logger():
-    def __init__(self):
+    '''Logs through the "shot" logger on a background thread.
+
+    log() only queues the message, so a slow write to flash can't hold up
+    the caller. If the writer falls LOG_QUEUE_SIZE messages behind, new ones
+    are dropped and counted. Each call site may log LOG_RATE_LIMIT messages
+    per LOG_RATE_PERIOD; the rest are counted and the site's next message
+    says how many were suppressed.
+    '''
+
+    def __init__(self, threaded = True):
         if 'SOLOLINK_SANDBOX' in os.environ:
             logging.config.fileConfig(os.path.join(os.path.dirname(__file__), 'sim/shotmanager.sandbox.conf'))
         else:
             logging.config.fileConfig("/etc/shotmanager.conf")
         self.xlog = logging.getLogger("shot")
 
+        self.queue = Queue.Queue(LOG_QUEUE_SIZE)
+        self.lock = threading.Lock()
+        # (file, line) -> [start of window, messages logged, messages suppressed]
+        self.sites = {}
+
+        # statistics
+        self.dropped = 0
+        self.droppedReported = 0
+        self.suppressed = 0
+
+        self.thread = None
+        if threaded:
+            self.thread = threading.Thread(name = "shotLogger", target = self.writeThread)
+            self.thread.daemon = True
+            self.thread.start()
+            atexit.register(self.stop)
+
     def log(self, data):
-        self.xlog.info(str(data).replace("\0", ""))
+        if not self.xlog.isEnabledFor(logging.INFO):
+            return
+
+        caller = sys._getframe(1)
+        site = (caller.f_code.co_filename, caller.f_lineno)
+        now = monotonic.monotonic()
+
+        self.lock.acquire()
+        try:
+            window = self.sites.get(site)
+            suppressed = 0
+            if window is None or now - window[0] >= LOG_RATE_PERIOD:
+                if window is not None:
+                    suppressed = window[2]
+                window = [now, 0, 0]
+                self.sites[site] = window
+
+            if window[1] >= LOG_RATE_LIMIT:
+                window[2] += 1
+                self.suppressed += 1
+                return
+            window[1] += 1
+        finally:
+            self.lock.release()
+
+        message = str(data)
+        if suppressed > 0:
+            message += " (%d suppressed)" % suppressed
+
+        try:
+            self.queue.put_nowait((time.time(), site[0], site[1], message))
+        except Queue.Full:
+            self.lock.acquire()
+            self.dropped += 1
+            self.lock.release()
+
+    def writeThread(self):
+        while True:
+            entry = self.queue.get()
+            if entry is None:
+                return
+            self.write(entry)
+
+    # writes everything queued on the calling thread
+    def drain(self):
+        while True:
+            try:
+                entry = self.queue.get_nowait()
+            except Queue.Empty:
+                return
+            if entry is not None:
+                self.write(entry)
+
+    # lets the writer thread finish what's queued
+    def stop(self):
+        if self.thread is None:
+            return
+        try:
+            self.queue.put(None, timeout = LOG_EXIT_TIMEOUT)
+        except Queue.Full:
+            return
+        self.thread.join(LOG_EXIT_TIMEOUT)
+
+    def write(self, entry):
+        (created, pathname, lineno, message) = entry
+
+        dropped = self.dropped
+        if dropped != self.droppedReported:
+            self.emit(created, pathname, lineno, "[log]: queue full, dropped %d messages" % (dropped - self.droppedReported))
+            self.droppedReported = dropped
+
+        self.emit(created, pathname, lineno, message.replace("\0", ""))
+
+    # hands a message to the logging handlers, stamped with the time it was logged
+    def emit(self, created, pathname, lineno, message):
+        record = self.xlog.makeRecord(self.xlog.name, logging.INFO, pathname, lineno, message, None, None)
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        self.xlog.handle(record)
 
 logger = Logger()
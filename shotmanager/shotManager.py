@@ -28,6 +28,7 @@ import extFunctions
 
 # Loggers imports
 import shotLogger
+import flightJournal
 
 # Constants imports
 from shotManagerConstants import *
@@ -73,6 +74,9 @@ class ShotManager():
         ### initialize dronekit vehicle ###
         self.vehicle = vehicle
 
+        ### start a new flight journal ###
+        self.journal = flightJournal.FlightJournal()
+
         ### switch vehicle to loiter mode ###
         self.vehicle.mode = VehicleMode("LOITER")
 
@@ -125,6 +129,11 @@ class ShotManager():
         # check for In-Air start from Shotmanager crash
         if self.vehicle.system_status == 'ACTIVE':
             logger.log("[shot]: Restart in air.")
+            # pick up the breadcrumbs and home from before the restart
+            self.rewindManager.restore()
+            # dronekit only reports armed when it changes, so record that we're
+            # already armed rather than resetting the restored trail on arming
+            self.last_armed = self.vehicle.armed
             # load vehicle home    
             self.rewindManager.loadHomeLocation()
             # not yet enabled until this check proves effective
@@ -154,6 +163,9 @@ class ShotManager():
                     elif s is self.buttonManager.client: # if read is from buttons
                         self.buttonManager.parse()
 
+                    elif self.currentShot == shots.APP_SHOT_FOLLOW and s is self.curController.socket: # if read is a follow ROI
+                        self.curController.checkSocket()
+
                 # now handle writes (sololink.btn_msg handles all button writes)
                 for s in wl:
                     if s is self.appMgr.client: # if write is for app
@@ -260,10 +272,18 @@ class ShotManager():
         if self.currentShot != shot:
 
             logger.log('[shot]: Entering shot %s.' % shots.SHOT_NAMES[shot])
+            self.journal.shot(self.currentShot, shot)
 
             if self.currentShot == shots.APP_SHOT_REWIND:
                 # we are exiting Rewind
                 self.rewindManager.resetSpline()
+
+            if self.currentShot == shots.APP_SHOT_FOLLOW:
+                # we are exiting Follow, stop listening for ROIs
+                self.curController.closeSocket()
+
+            # make sure the geotags of any photos taken in the shot are on disk
+            self.goproManager.syncPhotoLog()
             
             # APP_SHOT_NONE
             if shot == shots.APP_SHOT_NONE:
@@ -311,6 +331,7 @@ class ShotManager():
         try:
             if mode.name != self.lastMode:
                 logger.log("[callback]: Mode changed from %s -> %s"%(self.lastMode, mode.name))
+                self.journal.mode(mode.name)
 
                 self.lastMode = mode.name
                 
@@ -339,6 +360,8 @@ class ShotManager():
         # If we were in a smart shot, log that we bailed out out due to a mode change
         if self.currentShot != shots.APP_SHOT_NONE:
             logger.log("[callback]: Detected that we are not in the correct apm mode for this shot. Exiting shot!")
+            if self.currentShot == shots.APP_SHOT_FOLLOW:
+                self.curController.closeSocket()
             self.currentShot = shots.APP_SHOT_NONE
 
         # mark curController for garbage collection
@@ -388,8 +411,8 @@ class ShotManager():
                 logger.log("[callback]: armed status changed to %d"%(armed))
                 self.buttonManager.setButtonMappings()
 
-                # clear Rewind manager cache
-                self.rewindManager.resetSpline()
+                # clear Rewind manager cache, from the main loop since it owns the trail
+                self.rewindManager.requestReset()
 
                 if not armed and self.currentShot not in shots.CAN_START_BEFORE_ARMING:
                     self.enterShot(shots.APP_SHOT_NONE)
@@ -472,10 +495,16 @@ class ShotManager():
         # update rewind manager        
         if (self.currentShot == shots.APP_SHOT_REWIND or self.currentShot == shots.APP_SHOT_RTL or self.vehicle.mode.name == 'RTL') is False:
             self.rewindManager.updateLocation()
+        else:
+            self.rewindManager.discardSamples()
 
+        # resend or drop GoPro requests that went unanswered
+        self.goproManager.Tick()
 
         # Always call remap
         channels = self.rcMgr.remap()            
+        self.journal.rc(self.rcMgr.remappingSticks, self.rcMgr.channels)
+        self.journal.poll(monotonic.monotonic())
         
         if self.curController:
             self.curController.handleRCs(channels)
@@ -510,6 +539,9 @@ class ShotManager():
         # ARMED
         self.vehicle.add_attribute_listener('armed', self.armed_callback) #register with vehicle class (dronekit)
 
+        # LOCATION (defined in rewind manager)
+        self.vehicle.add_attribute_listener('location.global_relative_frame', self.rewindManager.location_callback)
+
         # CAMERA FEEDBACK
         self.vehicle.add_message_listener('CAMERA_FEEDBACK', self.camera_feedback_callback) #register with vehicle class (dronekit)
 
@@ -520,6 +552,12 @@ class ShotManager():
 
         self.vehicle.add_message_listener('BATTERY_STATUS', self.battery_status_callback) #register with vehicle class (dronekit)
 
+        # journal the commands we send. dronekit has no listener for outgoing messages,
+        # so hook the mavlink connection underneath it
+        master = getattr(self.vehicle, '_master', None)
+        if master is not None:
+            master.mav.set_send_callback(self.journal.sent)
+
     def checkBatteryHealth(self):
 
         if self.appMgr.isAppConnected():
@@ -20,12 +20,20 @@
 import math
 
 
-class Vector2:
+class Vector2(object):
+    # no per-instance __dict__; these get created every tick
+    __slots__ = ('x', 'y')
 
     def __init__(self, x, y):
         self.x = x
         self.y = y
 
+    # sets both components in place and returns self
+    def set(self, x, y):
+        self.x = x
+        self.y = y
+        return self
+
     # normalizes self and returns the length
     def normalize(self):
         length2 = self.x * self.x + self.y * self.y
@@ -39,6 +47,10 @@ class Vector2:
         length2 = self.x * self.x + self.y * self.y
         return math.sqrt(length2)
 
+    # cheaper than length() when only comparing magnitudes
+    def lengthSquared(self):
+        return self.x * self.x + self.y * self.y
+
     def dot(a, b):
         return a.x * b.x + a.y * b.y
 
@@ -54,6 +66,22 @@ class Vector2:
     def __rmul__(self, scalar):
         return Vector2(scalar * self.x, scalar * self.y)
 
+    # in-place operators modify self rather than allocating a new Vector2
+    def __iadd__(self, vector):
+        self.x += vector.x
+        self.y += vector.y
+        return self
+
+    def __isub__(self, vector):
+        self.x -= vector.x
+        self.y -= vector.y
+        return self
+
+    def __imul__(self, scalar):
+        self.x *= scalar
+        self.y *= scalar
+        return self
+
     def __repr__(self):
         return "<%f,%f>" % (self.x, self.y)
 
@@ -61,4 +89,4 @@ class Vector2:
         return "<%f,%f>" % (self.x, self.y)
 
     def __iter__(self):
-        return iter([self.x, self.y])
+        return iter((self.x, self.y))
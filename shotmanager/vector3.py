@@ -3,12 +3,22 @@
 # Vector3 class - super minimal; just adding things as I need them
 import math
 
-class Vector3:
+class Vector3(object):
+	# no per-instance __dict__; these get created every tick
+	__slots__ = ('x', 'y', 'z')
+
 	def __init__(self, x=0, y=0, z=0):
 		self.x = x
 		self.y = y
 		self.z = z
 
+	# sets all components in place and returns self
+	def set(self, x, y, z):
+		self.x = x
+		self.y = y
+		self.z = z
+		return self
+
 	# normalizes self and returns the length
 	def normalize(self):
 		length2 = self.x * self.x + self.y * self.y + self.z * self.z
@@ -23,6 +33,10 @@ class Vector3:
 		length2 = self.x * self.x + self.y * self.y + self.z * self.z
 		return math.sqrt(length2)
 
+	# cheaper than length() when only comparing magnitudes
+	def lengthSquared(self):
+		return self.x * self.x + self.y * self.y + self.z * self.z
+
 	def cross(a,b):
 		return Vector3(a.y*b.z - a.z*b.y, a.z*b.x - a.x*b.z, a.x*b.y-a.y*b.x)
 
@@ -53,6 +67,31 @@ class Vector3:
 	def __div__(self, scalar):
 		return Vector3(self.x/scalar, self.y/scalar, self.z/scalar)
 
+	# in-place operators modify self rather than allocating a new Vector3
+	def __iadd__(self, vector):
+		self.x += vector.x
+		self.y += vector.y
+		self.z += vector.z
+		return self
+
+	def __isub__(self, vector):
+		self.x -= vector.x
+		self.y -= vector.y
+		self.z -= vector.z
+		return self
+
+	def __imul__(self, scalar):
+		self.x *= scalar
+		self.y *= scalar
+		self.z *= scalar
+		return self
+
+	def __idiv__(self, scalar):
+		self.x /= scalar
+		self.y /= scalar
+		self.z /= scalar
+		return self
+
 	def __repr__(self):
 		return "<%f,%f,%f>" % (self.x,self.y,self.z)
 
@@ -60,4 +99,4 @@ class Vector3:
 		return "<%f,%f,%f>" % (self.x,self.y,self.z)
 
 	def __iter__(self):
-		return iter([self.x,self.y,self.z])
\ No newline at end of file
+		return iter((self.x,self.y,self.z))
@@ -30,6 +30,7 @@ class VectorPathHandler(PathHandler):
 
         # the initial reference position
         self.initialLocation = vehicle.location.global_relative_frame
+        self.initialFrame = location_helpers.LocalFrame(self.initialLocation)
         self.heading = heading
 
         # creates a unit vector from telemetry data
@@ -130,14 +131,14 @@ class VectorPathHandler(PathHandler):
         # Convert NEU to NED velocity
         #velVector.z = -velVector.z
 
-        # generate a new Location from our offset vector and initial location
-        loc = location_helpers.addVectorToLocation(self.initialLocation, offsetVector)
+        # generate a new position from our offset vector (NEU) and initial location
+        (lat, lon, alt) = self.initialFrame.fromNED(offsetVector.x, offsetVector.y, -offsetVector.z)
 
         # calc dot product so we can assign a sign to the distance
-        vectorToTarget = location_helpers.getVectorFromPoints( self.initialLocation, self.vehicle.location.global_relative_frame)
-        dp =  self.unitVector.x * vectorToTarget.x
-        dp += self.unitVector.y * vectorToTarget.y
-        dp += self.unitVector.z * vectorToTarget.z
+        (north, east, down) = self.initialFrame.toNED(self.vehicle.location.global_relative_frame)
+        dp =  self.unitVector.x * north
+        dp += self.unitVector.y * east
+        dp -= self.unitVector.z * down
         
         self.actualDistance = location_helpers.getDistanceFromPoints3d(self.initialLocation, self.vehicle.location.global_relative_frame)
 
@@ -153,9 +154,9 @@ class VectorPathHandler(PathHandler):
             0, 1,    # target system, target component
             mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT,  # frame
             0b0000110111000000,  # type_mask - enable pos/vel
-            int(loc.lat * 10000000),  # latitude (degrees*1.0e7)
-            int(loc.lon * 10000000),  # longitude (degrees*1.0e7)
-            loc.alt,  # altitude (meters)
+            int(lat * 10000000),  # latitude (degrees*1.0e7)
+            int(lon * 10000000),  # longitude (degrees*1.0e7)
+            alt,  # altitude (meters)
             velVector.x, velVector.y, velVector.z,  # North, East, Down velocity (m/s)
             0, 0, 0,  # x, y, z acceleration (not used)
             0, 0)    # yaw, yaw_rate (not used)
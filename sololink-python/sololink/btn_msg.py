@@ -1,5 +1,7 @@
 
 import struct
+import weakref
+import msg_framer
 
 """
 Button Message as received from the controller's button message server.
@@ -66,59 +68,40 @@ ARTOO_BITMASK_ENABLED = 1
 ARTOO_BITMASK_HIGHLIGHTED = 2
 
 
+# struct format of one message
+FORMAT = "<QBBH"
+
+
 # Returns tuple:
 #   (timestamp_us, button_id, button_event, pressed_mask)
 def unpack(s):
     if len(s) != LENGTH:
         return None
-    return struct.unpack("<QBBH", s)
+    return struct.unpack(FORMAT, s)
+
+
+# Returns a framer reading messages from 's', which is expected to be a
+# stream-oriented socket. framer.read() returns every message that has
+# arrived (it has been observed that we can get multiple events in the same
+# socket read); framer.recv() returns one at a time. Messages are tuples:
+#   (timestamp_us, button_id, button_event, pressed_mask)
+def framer(s):
+    return msg_framer.MsgFramer(s, FORMAT)
+
 
+# Framers used by recv(), one per socket
+framers = weakref.WeakKeyDictionary()
 
 # Reads message from stream and returns it.
 #   's' is expected to be a stream-oriented socket
 #   returned message is tuple:
 #     (timestamp_us, button_id, button_event, pressed_mask)
-
-# Buffer for accumulated data. It has been observed that we can get multiple
-# events in the same socket read. It is possible that we could get a message
-# split across two socket reads (although that has not been observed).
-msg_buf = ""
-
-# Debug flags
-msg_buf_short = 0   # if nonzero, have seen msg_buf with this many bytes
-msg_buf_long = 0    # if nonzero, have seen msg_buf with this many bytes
-
 def recv(s):
-    global msg_buf
-    global msg_buf_short
-    global msg_buf_long
-    while True:
-        # debug
-        if len(msg_buf) > 0 and len(msg_buf) < 12:
-            msg_buf_short = len(msg_buf)
-        elif len(msg_buf) > 12:
-            msg_buf_long = len(msg_buf)
-        # got enough data yet?
-        if len(msg_buf) >= 12:
-            # return the first 12 bytes in the buffer
-            msg = msg_buf[:12]
-            msg_buf = msg_buf[12:]
-            return struct.unpack("<QBBH", msg)
-        else:
-            # not enough yet; wait for more
-            data = s.recv(1024)
-            if data is None:
-                # this case has not been observed to happen
-                continue
-            elif data == "":
-                # this happens if the other end closes
-                return None
-            else:
-                # append it to what we have then loop back and check for
-                # complete message
-                msg_buf = msg_buf + data
-        # end if
-    # end while
+    f = framers.get(s)
+    if f is None:
+        f = framer(s)
+        framers[s] = f
+    return f.recv()
 
 # Sends a button string to Artoo
 # in the format (little-endian):
@@ -132,11 +115,14 @@ def recv(s):
 #       2nd lowest bit is "lit up"
 # string descriptor:  n bytes
 def sendArtooString(s, button_id, shot, mask, artooStr):
+    s.send(packArtooString(button_id, shot, mask, artooStr))
+
+# Returns the packet sendArtooString sends, so several can go in one write
+def packArtooString(button_id, shot, mask, artooStr):
     length = 4 + len(artooStr)
     packstr = "<IIBBbb%ds"%(len(artooStr),)
-    pkt = struct.pack(packstr, ARTOO_MSG_SET_BUTTON_STRING, length, button_id, 
+    return struct.pack(packstr, ARTOO_MSG_SET_BUTTON_STRING, length, button_id, 
             Press, shot, mask, artooStr)
-    s.send(pkt)
 
 # Sends a shot string to Artoo 
 # in the format (little-endian):
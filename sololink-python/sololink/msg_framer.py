@@ -0,0 +1,80 @@
+import errno
+import socket
+import struct
+
+"""
+Splits a stream socket into fixed-size records.
+
+Each framer owns the receive buffer for one socket, so any number of sockets
+can be read at once. Data is received straight into a preallocated bytearray
+and every complete record in it is unpacked on each wakeup; only a partial
+record (if any) is moved back to the front of the buffer.
+
+Python 2 has no Struct.iter_unpack, so records are unpacked with
+Struct.unpack_from at increasing offsets instead.
+"""
+
+# bytes asked of the socket per read
+RECV_SIZE = 1024
+
+
+class MsgFramer(object):
+
+    # 's' is expected to be a stream-oriented socket
+    # 'fmt' is the struct format of one record
+    def __init__(self, s, fmt):
+        self.sock = s
+        self.struct = struct.Struct(fmt)
+        self.size = self.struct.size
+        # room for a partial record plus one full read
+        self.buf = bytearray(self.size + RECV_SIZE)
+        self.view = memoryview(self.buf)
+        self.length = 0
+        # records read but not yet returned by recv()
+        self.pending = []
+        # Debug flags
+        self.short = 0  # if nonzero, have seen a partial record this many bytes long
+        self.long = 0   # if nonzero, have seen this many records in one read
+
+    # Reads once from the socket and returns a list of every complete record
+    # (as tuples), which may be empty if only part of a record has arrived or
+    # a non-blocking socket has nothing to read. Returns None if the other end
+    # has closed.
+    def read(self):
+        records = self.pending
+        self.pending = []
+        try:
+            n = self.sock.recv_into(self.view[self.length:])
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return records
+            raise
+        if n == 0:
+            # this happens if the other end closes
+            return None
+        self.length += n
+
+        offset = 0
+        while self.length - offset >= self.size:
+            records.append(self.struct.unpack_from(self.buf, offset))
+            offset += self.size
+
+        # keep any partial record for next time
+        remainder = self.length - offset
+        if remainder > 0:
+            self.buf[:remainder] = self.buf[offset:self.length]
+            self.short = remainder
+        self.length = remainder
+        if offset > self.size:
+            self.long = offset / self.size
+        return records
+
+    # Returns the next record, reading from the socket as needed, or None if
+    # the other end has closed.
+    def recv(self):
+        while not self.pending:
+            records = self.read()
+            if records is None:
+                return None
+            self.pending = records
+        return self.pending.pop(0)
@@ -4,10 +4,12 @@
 # busybox 'pidof' can find this process by name.
 
 import ConfigParser
+import errno
 import logging
 import logging.config
 import optparse
 import os
+import select
 import socket
 import struct
 import sys
@@ -22,73 +24,190 @@ app_address_file = ""
 
 
 
-def get_request(sock):
-    """get one request from socket
+# bytes asked of the socket per read
+RECV_SIZE = 1024
+
+# longest request accepted; anything longer is treated as a broken connection
+MAX_REQUEST_SIZE = 65536
+
+# connections waiting to be accepted
+LISTEN_BACKLOG = 5
+
+
+
+class RequestReader(object):
+    """reads requests from one connection
 
     A request is a 32-bit byte count followed by opaque data. The byte count
-    includes itself, i.e. the minimum byte count is four. The request is
-    returned as a string, with the initial byte count still included. The
+    includes itself, i.e. the minimum byte count is four. Requests are
+    returned as strings, with the initial byte count still included. The
     purpose of "requests" at this level is really to just provide for reliable
     datagrams over TCP.
+
+    Each read() does one bulk recv_into a buffer owned by the connection, so
+    bytes beyond the end of one request are kept for the next.
     """
 
-    # Read byte count
-    # XXX This is inefficient but simple; we never want to read beyond the end
-    # of the request we are receiving, to avoid needing to save state between
-    # calls to get_request.
-    pkt = ""
-    while len(pkt) < 4:
+    def __init__(self, sock):
+        self.sock = sock
+        self.buf = bytearray(RECV_SIZE)
+        self.length = 0
+
+    def read(self):
+        """read once from the socket
+
+        Returns a list of the complete requests received, which may be empty,
+        or None if the connection is closed or broken.
+        """
+        view = memoryview(self.buf)
         try:
-            b = sock.recv(1)
+            n = self.sock.recv_into(view[self.length:])
+        except socket.timeout as st:
+            # Has not been observed to happen.
+            logger.info("socket.timeout: %s", str(st))
+            return None
         except socket.error as se:
+            if se.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
             # Android app: disconnect wifi without closing app and you get:
             # socket.error: [Errno 110] Connection timed out
             logger.info("socket.error: %s", str(se))
             return None
-        except socket.timeout as st:
-            # Has not been observed to happen.
-            logger.info("socket.timeout: %s", str(st))
+        finally:
+            # the buffer can't be resized while it is viewed
+            del view
+        if n == 0:
             return None
-        if not b:
-            return None
-        pkt += b
+        self.length += n
+
+        requests = []
+        offset = 0
+        # length of the incomplete request at the end of the buffer, if known
+        partial_len = 0
+        while self.length - offset >= 4:
+            (pkt_len, ) = struct.unpack_from("!I", self.buf, offset)
+            logger.debug("packet length %d", pkt_len)
+            if pkt_len < 4 or pkt_len > MAX_REQUEST_SIZE:
+                logger.info("bad packet length %d", pkt_len)
+                return None
+            if self.length - offset < pkt_len:
+                partial_len = pkt_len
+                break
+            requests.append(str(self.buf[offset:offset + pkt_len]))
+            offset += pkt_len
 
-    (pkt_len, ) = struct.unpack("!I", pkt)
+        # keep the start of the next request, and make room for all of it
+        self.length -= offset
+        self.buf[:self.length] = self.buf[offset:offset + self.length]
+        if partial_len + RECV_SIZE > len(self.buf):
+            self.buf.extend(bytearray(partial_len + RECV_SIZE - len(self.buf)))
 
-    logger.debug("packet length %d", pkt_len)
+        return requests
 
-    # Read the rest of the packet
-    # XXX Super-inefficient. Don't read beyond the end of the current packet.
-    while len(pkt) < pkt_len:
-        try:
-            b = sock.recv(1)
-        except socket.error as se:
-            logger.info("socket.error: %s", str(se))
-            return None
-        except socket.timeout as st:
-            logger.info("socket.timeout: %s", str(st))
-            return None
-        if not b:
-            return None
-        pkt += b
 
-    return pkt
 
+# IP of each connected app, in the order they connected; an IP is here once
+# for each of its connections
+app_ips = []
 
 
-def set_app_ip(app_ip):
-    f = open(app_address_file, "w")
-    f.write(app_ip + "\n")
+
+def write_app_ips():
+    """write the connected apps' IPs to app_address_file, one per line
+
+    Readers that only want one app (e.g. the video streamer) use the first
+    line, which is the app that has been connected longest. The file is
+    removed when no app is connected.
+    """
+    ips = []
+    for ip in app_ips:
+        if ip not in ips:
+            ips.append(ip)
+
+    if not ips:
+        # allow it to not exist (unlink fails)
+        try:
+            os.unlink(app_address_file)
+        except:
+            pass
+        return
+
+    # write a new file and rename it over the old one, so a reader never
+    # sees a partial list
+    tmp_file = app_address_file + ".tmp"
+    f = open(tmp_file, "w")
+    f.write("".join(ip + "\n" for ip in ips))
     f.close()
+    os.rename(tmp_file, app_address_file)
+
+
+
+def set_app_ip(app_ip):
+    app_ips.append(app_ip)
+    write_app_ips()
+
+
+
+def unset_app_ip(app_ip):
+    if app_ip in app_ips:
+        app_ips.remove(app_ip)
+    write_app_ips()
 
 
 
-def unset_app_ip():
-    # allow it to not exist (unlink fails)
+class AppClient(object):
+    """one connected app"""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.reader = RequestReader(sock)
+
+
+
+def accept_client(listen_sock, clients):
+    """accept a new connection and add it to clients"""
     try:
-        os.unlink(app_address_file)
-    except:
-        pass
+        (sock, address) = listen_sock.accept()
+    except socket.error as se:
+        # the connection can go away between select and accept
+        logger.info("socket.error: %s", str(se))
+        return
+
+    logger.info("connection from %s", str(address))
+
+    sock.setblocking(0)
+    clients[sock] = AppClient(sock, address)
+
+    set_app_ip(address[0])
+    logger.info("app IP is %s (%d connected)", address[0], len(clients))
+
+    app_connected_msg.send_connected()
+
+
+
+def close_client(client, clients):
+    """close a connection and remove it from clients"""
+    del clients[client.sock]
+
+    unset_app_ip(client.address[0])
+    logger.info("closing connection from %s (%d connected)",
+                str(client.address), len(clients))
+
+    # stm32 only knows whether any app is connected
+    if not clients:
+        app_connected_msg.send_disconnected()
+
+    try:
+        client.sock.shutdown(socket.SHUT_RDWR)
+    except socket.error as se:
+        # Android app: disconnect wifi without closing app and you get:
+        # socket.error: [Errno 107] Transport endpoint is not connected
+        logger.info("socket.error: %s", str(se))
+    except socket.timeout as st:
+        # Has not been observed to happen.
+        logger.info("socket.timeout: %s", str(st))
+    client.sock.close()
 
 
 
@@ -107,49 +226,41 @@ def app_server():
     listen_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 5)
     listen_sock.bind(("", app_server_port))
 
-    # only allow one connection
-    listen_sock.listen(0)
+    # several apps (e.g. a phone and a tablet) may be connected at once
+    listen_sock.listen(LISTEN_BACKLOG)
+    listen_sock.setblocking(0)
 
-    while True:
+    # socket -> AppClient
+    clients = {}
 
-        logger.info("waiting for connection")
+    logger.info("waiting for connections")
 
-        # wait for connection
-        (sock, address) = listen_sock.accept()
-
-        logger.info("connection from %s", str(address))
-
-        set_app_ip(address[0])
-        logger.info("app IP is %s", address[0])
-
-        app_connected_msg.send_connected()
-
-        # process requests from the client
-        while True:
-            # Get one request. We don't yet use these; it is the existence of
-            # the connection that is meaningful.
-            pkt = get_request(sock)
-            if not pkt:
-                # Remote end closed the connection
-                break
-            logger.info("received request: %s", str([hex(ord(x)) for x in pkt]))
-        ### end while True
-
-        app_connected_msg.send_disconnected()
-
-        unset_app_ip()
+    while True:
 
-        logger.info("closing connection")
         try:
-            sock.shutdown(socket.SHUT_RDWR)
-        except socket.error as se:
-            # Android app: disconnect wifi without closing app and you get:
-            # socket.error: [Errno 107] Transport endpoint is not connected
-            logger.info("socket.error: %s", str(se))
-        except socket.timeout as st:
-            # Has not been observed to happen.
-            logger.info("socket.timeout: %s", str(st))
-        sock.close()
+            (readable, writable, errored) = \
+                select.select([listen_sock] + clients.keys(), [], [])
+        except select.error as se:
+            if se.args[0] == errno.EINTR:
+                continue
+            raise
+
+        for sock in readable:
+            if sock is listen_sock:
+                accept_client(listen_sock, clients)
+                continue
+
+            client = clients[sock]
+            # Get the requests that have arrived. We don't yet use these; it
+            # is the existence of the connection that is meaningful.
+            pkts = client.reader.read()
+            if pkts is None:
+                # Remote end closed the connection
+                close_client(client, clients)
+                continue
+            for pkt in pkts:
+                logger.info("received request from %s: %s", client.address[0],
+                            str([hex(ord(x)) for x in pkt]))
 
     ### end while True
 
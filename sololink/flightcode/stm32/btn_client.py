@@ -14,8 +14,9 @@ s.connect((HOST, PORT))
 print "OK"
 
 def in_thread(s):
+    framer = btn_msg.framer(s)
     while True:
-        msg = btn_msg.recv(s)
+        msg = framer.recv()
         if msg is None:
             print "received \"None\""
             break
@@ -25,12 +26,12 @@ def in_thread(s):
             print "received:", msg[0], \
                   btn_msg.ButtonName[msg[1]], \
                   btn_msg.EventName[msg[2]], msg[3]
-        if btn_msg.msg_buf_long != 0:
-            print "btn_msg.msg_buf_long=%d!" % btn_msg.msg_buf_long
-            btn_msg.msg_buf_long = 0
-        if btn_msg.msg_buf_short != 0:
-            print "btn_msg.msg_buf_short=%d!" % btn_msg.msg_buf_short
-            btn_msg.msg_buf_short = 0
+        if framer.long != 0:
+            print "framer.long=%d!" % framer.long
+            framer.long = 0
+        if framer.short != 0:
+            print "framer.short=%d!" % framer.short
+            framer.short = 0
 
 in_id = threading.Thread(target=in_thread, args=(s,))
 in_id.daemon = True
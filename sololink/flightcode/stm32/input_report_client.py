@@ -15,12 +15,16 @@ print "connecting to", HOST, ":", PORT, "...",
 s.connect((HOST, PORT))
 print "OK"
 
+framer = input_report_msg.framer(s)
+
 next_print_time = datetime.datetime.now()
 print_interval = datetime.timedelta(seconds=1.0/RATE)
 
 while True:
 
-    msg = input_report_msg.recv(s)
+    msg = framer.recv()
+    if msg is not None:
+        msg = input_report_msg.fields(msg)
 
     now = datetime.datetime.now()
 
@@ -35,10 +39,10 @@ while True:
         print "received:", str(msg)
         next_print_time += print_interval
 
-    if input_report_msg.msg_buf_long != 0:
-        print "input_report_msg.msg_buf_long=%d!" % input_report_msg.msg_buf_long
-        input_report_msg.msg_buf_long = 0
+    if framer.long != 0:
+        print "framer.long=%d!" % framer.long
+        framer.long = 0
 
-    if input_report_msg.msg_buf_short != 0:
-        print "input_report_msg.msg_buf_short=%d!" % input_report_msg.msg_buf_short
-        input_report_msg.msg_buf_short = 0
+    if framer.short != 0:
+        print "framer.short=%d!" % framer.short
+        framer.short = 0
@@ -1,5 +1,7 @@
 
 import struct
+import weakref
+from sololink import msg_framer
 
 """
 Input Report message as received from the controller's input report message
@@ -27,56 +29,46 @@ SOLO_MESSAGE_INPUT_REPORT = 2003
 LENGTH = 24
 
 
+# struct format of one message
+FORMAT = "<IIQHHHH"
+
+
+# Returns tuple:
+#   (msg_id, timestamp, gimbal_y, gimbal_rate, battery)
 def unpack(s):
     if len(s) != LENGTH:
         return None
-    (msg_id, length, timestamp, gimbal_y, gimbal_rate, battery, spare) = \
-            struct.unpack("<IIQHHHH", s)
+    return fields(struct.unpack(FORMAT, s))
+
+
+# Drops the length and spare fields from an unpacked message
+def fields(msg):
+    (msg_id, length, timestamp, gimbal_y, gimbal_rate, battery, spare) = msg
     return (msg_id, timestamp, gimbal_y, gimbal_rate, battery)
 
 
+# Returns a framer reading messages from 's', which is expected to be a
+# stream-oriented socket. It has been observed that we can get multiple
+# messages in the same socket read; framer.read() returns all of them,
+# framer.recv() one at a time. Messages are the full unpacked tuples; pass
+# them through fields() for the tuple unpack() returns.
+def framer(s):
+    return msg_framer.MsgFramer(s, FORMAT)
+
+
+# Framers used by recv(), one per socket
+framers = weakref.WeakKeyDictionary()
+
 # Reads message from stream and returns it.
 #   's' is expected to be a stream-oriented socket
 #   returned message is tuple:
 #     (msg_id, timestamp, gimbal_y, gimbal_rate, battery)
-
-# Buffer for accumulated data. It has been observed that we can get multiple
-# events in the same socket read. It is possible that we could get a message
-# split across two socket reads (although that has not been observed).
-msg_buf = ""
-
-# Debug flags
-msg_buf_short = 0   # if nonzero, have seen msg_buf with this many bytes
-msg_buf_long = 0    # if nonzero, have seen msg_buf with this many bytes
-
 def recv(s):
-    global msg_buf
-    global msg_buf_short
-    global msg_buf_long
-    while True:
-        # debug
-        if len(msg_buf) > 0 and len(msg_buf) < LENGTH:
-            msg_buf_short = len(msg_buf)
-        elif len(msg_buf) > LENGTH:
-            msg_buf_long = len(msg_buf)
-        # got enough data yet?
-        if len(msg_buf) >= LENGTH:
-            # use the first LENGTH bytes in the buffer
-            msg = msg_buf[:LENGTH]
-            msg_buf = msg_buf[LENGTH:]
-            return unpack(msg)
-        else:
-            # not enough yet; wait for more
-            data = s.recv(1024)
-            if data is None:
-                # this case has not been observed to happen
-                continue
-            elif data == "":
-                # this happens if the other end closes
-                return None
-            else:
-                # append it to what we have then loop back and check for
-                # complete message
-                msg_buf = msg_buf + data
-        # end if
-    # end while
+    f = framers.get(s)
+    if f is None:
+        f = framer(s)
+        framers[s] = f
+    msg = f.recv()
+    if msg is None:
+        return None
+    return fields(msg)